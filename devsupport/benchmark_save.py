@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Compare the time it takes to save PO files of different sizes after a
+number of edits, for fully parsed and for lazily parsed files.
+
+Usage: python devsupport/benchmark_save.py [units...]"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from translate.storage import pypo
+
+from virtaal.support.atomicsave import save_atomically
+from virtaal.support.lazypo import LazyPOFile
+
+HEADER = r'''msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=UTF-8\n"
+"Plural-Forms: nplurals=2; plural=(n != 1);\n"
+'''
+
+UNIT = r'''
+#: src/file%(i)d.c:%(i)d
+#, c-format
+msgid "Open the file number %(i)d, called \"%%s\", for reading"
+msgstr "Maak lêer nommer %(i)d, genaamd \"%%s\", oop om te lees"
+'''
+
+
+def make_po(nunits):
+    return HEADER + ''.join([UNIT % {'i': i} for i in xrange(nunits)])
+
+def edit(store, nedits):
+    """Change C{nedits} random units, parsing only those (like Virtaal would
+        with a lazily parsed store)."""
+    indexes = random.sample(xrange(1, len(store.units)), nedits)
+    for i in indexes:
+        store.units[i].target = u'Verander %d' % (i)
+    return indexes
+
+def time_save(store, filename):
+    start = time.time()
+    save_atomically(filename, str(store))
+    return time.time() - start
+
+def main(argv):
+    sizes = [int(arg) for arg in argv[1:]] or [1000, 10000, 100000]
+    tempdir = tempfile.mkdtemp()
+    filename = os.path.join(tempdir, 'bench.po')
+    try:
+        print '%8s %8s %10s %12s %12s' % ('units', 'edits', 'size (KB)', 'full (ms)', 'lazy (ms)')
+        for nunits in sizes:
+            data = make_po(nunits)
+            for nedits in (1, 10, 100, 1000):
+                if nedits >= nunits:
+                    continue
+                full = pypo.pofile(data)
+                edit(full, nedits)
+                full_time = time_save(full, filename)
+
+                lazy = LazyPOFile(data)
+                edit(lazy, nedits)
+                lazy_time = time_save(lazy, filename)
+
+                print '%8d %8d %10d %12.1f %12.1f' % (
+                    nunits, nedits, len(data) / 1024, full_time * 1000, lazy_time * 1000
+                )
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
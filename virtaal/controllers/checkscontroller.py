@@ -83,11 +83,16 @@ class ChecksController(BaseController):
     __gtype_name__ = 'ChecksController'
     __gsignals__ = {
         'checker-set':  (SIGNAL_RUN_FIRST, None, (object,)),
-        'unit-checked': (SIGNAL_RUN_FIRST, None, (object, object, object))
+        'unit-checked': (SIGNAL_RUN_FIRST, None, (object, object, object)),
+        'store-check-progress': (SIGNAL_RUN_FIRST, None, (int, int)),
+        'store-checked': (SIGNAL_RUN_FIRST, None, (object,)),
     }
 
     CHECK_TIMEOUT = 500
     """Time to wait before performing checks on the current unit."""
+    PARALLEL_THRESHOLD = 2000
+    """Check stores in worker processes if at least this many units need to
+        be checked."""
 
     # INITIALIZERS #
     def __init__(self, main_controller):
@@ -98,6 +103,7 @@ class ChecksController(BaseController):
         self.store_controller = main_controller.store_controller
 
         main_controller.store_controller.connect('store-loaded', self._on_store_loaded)
+        main_controller.store_controller.connect('store-closed', self._on_store_closed)
         main_controller.unit_controller.connect('unit-modified', self._on_unit_modified)
         if main_controller.lang_controller:
             main_controller.lang_controller.connect('target-lang-changed', self._on_target_lang_changed)
@@ -107,6 +113,7 @@ class ChecksController(BaseController):
         self.code = None
         self._checker = None
         self._check_timer_active = False
+        self._check_job = None
         self._checker_code_to_name = {
               "default": _('Default'),
               "openoffice":  _('OpenOffice.org'),
@@ -196,6 +203,57 @@ class ChecksController(BaseController):
         self.emit('unit-checked', unit, checker, self.last_failures)
         return self.last_failures
 
+    def check_store(self):
+        """Bring the quality check results of all units in the current store
+            up to date with the current checker.
+
+            If many units need to be checked, they are checked in worker
+            processes in the background. "store-check-progress" is emitted
+            while that happens, and "store-checked" once all results are in.
+            @returns: The check results (see C{StoreModel.update_checks()}),
+                or C{None} if they are still being calculated."""
+        store = self.store_controller.get_store()
+        checker = self.get_checker()
+        if store is None or checker is None:
+            return None
+
+        job = self._check_job
+        if job is not None:
+            if job.is_running() and job.store is store and job.checker is checker:
+                return None
+            self._cancel_check_job()
+
+        units = store.take_unchecked_units(checker)
+        if len(units) >= self.PARALLEL_THRESHOLD:
+            from virtaal.support.checkpool import CheckJob
+            try:
+                job = CheckJob(checker.__class__, checker.config.targetlanguage, units)
+            except Exception, exc:
+                logging.warning('Could not start worker processes for quality checks: %s' % (exc))
+            else:
+                job.store = store
+                job.checker = checker
+                job.connect('chunk-checked', self._on_chunk_checked)
+                job.connect('progress', self._on_check_progress)
+                job.connect('finished', self._on_check_finished)
+                self._check_job = job
+                return None
+
+        from virtaal.support.storechecks import get_failures
+        return store.set_check_results(checker, [
+            (index, unit_key, get_failures(checker, unit))
+            for index, unit_key, unit in units
+        ])
+
+    def is_checking_store(self):
+        """Whether a store is being checked in the background."""
+        return self._check_job is not None and self._check_job.is_running()
+
+    def _cancel_check_job(self):
+        if self._check_job is not None:
+            self._check_job.cancel()
+            self._check_job = None
+
     def _check_timer_expired(self, unit):
         self._check_timer_active = False
         if unit is not self.last_unit:
@@ -220,6 +278,16 @@ class ChecksController(BaseController):
 
 
     # EVENT HANDLERS #
+    def _on_check_finished(self, job):
+        self._check_job = None
+        self.emit('store-checked', job.store.checks)
+
+    def _on_check_progress(self, job, done, total):
+        self.emit('store-check-progress', done, total)
+
+    def _on_chunk_checked(self, job, results):
+        job.store.set_check_results(job.checker, results)
+
     def _on_controller_registered(self, main_controller, controller):
         if controller is main_controller.lang_controller:
             controller.connect('target-lang-changed', self._on_target_lang_changed)
@@ -231,12 +299,18 @@ class ChecksController(BaseController):
     def _on_target_lang_changed(self, lang_controller, langcode):
         current_checker = self.get_checker()
         if current_checker:
+           # Results for the old language are of no use any more
+           self._cancel_check_job()
            current_checker.config.updatetargetlanguage(langcode)
            self.emit('checker-set', current_checker)
            if self.last_unit:
                self.check_unit(self.last_unit)
 
+    def _on_store_closed(self, store_controller):
+        self._cancel_check_job()
+
     def _on_store_loaded(self, store_controller):
+        self._cancel_check_job()
         self.set_checker_by_code(store_controller.store._trans_store.getprojectstyle())
         if self._cursor_connection:
             widget, connect_id = self._cursor_connection
@@ -23,6 +23,7 @@ from gobject import SIGNAL_RUN_FIRST
 from bisect import bisect_left
 
 from virtaal.common import GObjectWrapper
+from virtaal.support.indexset import IndexSet
 
 
 class Cursor(GObjectWrapper):
@@ -47,11 +48,13 @@ class Cursor(GObjectWrapper):
             @type  model: anything
             @param model: The model (usually a collection) to which the cursor is applicable.
             @type  indices: ordered collection
-            @param indices: The valid values for C{self.index}."""
+            @param indices: The valid values for C{self.index}. An
+                L{IndexSet} is not copied until it or the cursor's copy of
+                it changes."""
         GObjectWrapper.__init__(self)
 
         self.model = model
-        self._indices = indices
+        self._indices = IndexSet(indices)
         self.circular = circular
 
         self._pos = 0
@@ -92,7 +95,9 @@ class Cursor(GObjectWrapper):
         oldindex = self.index
         oldpos = self.pos
 
-        self._indices = list(value)
+        # The given set might still be changed by its owner, but copying an
+        # IndexSet is cheap: the copy shares the data until one of them changes
+        self._indices = IndexSet(value)
 
         self.index = oldindex
         if len(self._indices) == 0:
@@ -119,27 +124,23 @@ class Cursor(GObjectWrapper):
             This should only be used when absolutely necessary. Be prepared to
             deal with the consequences of using this method."""
         oldindex = self.index
-        if index not in self.indices:
-            newindices = list(self.indices)
-            insert_pos = bisect_left(self.indices, index)
-            if insert_pos == len(self.indices):
-                newindices.append(index)
-            else:
-                newindices.insert(insert_pos, index)
-            self.indices = newindices
+        oldpos = self._pos
+        self._indices.add(index)
         self.index = index
+        if oldpos == self._pos and oldindex != index:
+            self.emit('cursor-changed')
 
     def move(self, offset):
-        """Move the cursor C{offset} positions down.
+        """Move the cursor C{offset} positions down, emitting
+            "cursor-changed" only once.
             The cursor will wrap around to the beginning if C{circular=True}
             was given when the cursor was created."""
-        # FIXME: Possibly contains off-by-one bug(s)
-        if 0 <= self.pos + offset < len(self._indices):
-            self.pos += offset
-        elif self.circular:
-            if self.pos + offset >= 0:
-                self.pos = self.pos + offset - len(self._indices)
-            elif self.pos + offset < 0:
-                self.pos = self.pos + offset + len(self._indices)
-        else:
-            raise IndexError()
+        l_indices = len(self._indices)
+        if l_indices < 1:
+            return
+        newpos = self._pos + offset
+        if not 0 <= newpos < l_indices:
+            if not self.circular:
+                raise IndexError()
+            newpos %= l_indices
+        self.pos = newpos
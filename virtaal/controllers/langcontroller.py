@@ -135,8 +135,11 @@ class LanguageController(BaseController):
         if not self.lang_identifier:
             from translate.lang.identify import LanguageIdentifier
             self.lang_identifier = LanguageIdentifier()
-        srccode = self.lang_identifier.identify_source_lang(store.get_units())
-        tgtcode = self.lang_identifier.identify_target_lang(store.get_units())
+        # The identifier only looks at the first few units, so don't let big
+        # (lazily loaded) stores build the whole list of units.
+        units = [store.get_unit(i) for i in xrange(min(len(store), 50))]
+        srccode = self.lang_identifier.identify_source_lang(units)
+        tgtcode = self.lang_identifier.identify_target_lang(units)
         srclang = tgtlang = None
         if srccode:
             srclang = LanguageModel(srccode)
@@ -53,6 +53,7 @@ class MainController(BaseController):
         self._undo_controller = None
         self._unit_controller = None
         self._welcomescreen_controller = None
+        self._opening_file = None
         self.view = MainView(self)
 
     def load_plugins(self):
@@ -148,6 +149,10 @@ class MainController(BaseController):
         return self._store_controller
     def _set_store_controller(self, value):
         self._store_controller = value
+        # Modes are refreshed after everything else handled the new store
+        value.connect_after('store-loaded', self._on_store_loaded)
+        value.connect('store-load-failed', self._on_store_load_failed)
+        value.connect('store-load-cancelled', self._on_store_load_cancelled)
         self.emit('controller-registered', self._store_controller)
     store_controller = property(_get_store_controller, _set_store_controller)
 
@@ -201,16 +206,14 @@ class MainController(BaseController):
             if not self.show_prompt(msg=promptmsg):
                 return False
 
+        # The file is loaded in the background; see _on_store_load_*()
+        self._opening_file = filename
         try:
-            self.store_controller.open_file(filename, uri, forget_dir=forget_dir)
-            self.mode_controller.refresh_mode()
+            self.store_controller.open_file_async(filename, uri, forget_dir=forget_dir)
             return True
         except Exception, exc:
             logging.exception('MainController.open_file(filename="%s", uri="%s")' % (filename, uri))
-            self.show_error(
-                filename + ":\n" + _("Could not open file.\n\n%(error_message)s\n\nTry opening a different file.") % {'error_message': str(exc)}
-            )
-            self.close_file()
+            self._on_store_load_failed(self.store_controller, exc)
             return False
 
     def open_tutorial(self):
@@ -254,6 +257,10 @@ class MainController(BaseController):
             )
         return False
 
+    def cancel_open(self):
+        """Stop opening the file that is being opened in the background."""
+        self.store_controller.cancel_open()
+
     def close_file(self):
         if self.store_controller.is_modified():
             response = self.view.show_save_confirm_dialog()
@@ -344,3 +351,20 @@ class MainController(BaseController):
 
     def run(self):
         self.view.show()
+
+
+    # EVENT HANDLERS #
+    def _on_store_load_cancelled(self, store_controller):
+        self._opening_file = None
+
+    def _on_store_load_failed(self, store_controller, exc):
+        filename, self._opening_file = self._opening_file, None
+        self.show_error(
+            filename + ":\n" + _("Could not open file.\n\n%(error_message)s\n\nTry opening a different file.") % {'error_message': str(exc)}
+        )
+        self.close_file()
+
+    def _on_store_loaded(self, store_controller):
+        if self._opening_file is not None:
+            self._opening_file = None
+            self.mode_controller.refresh_mode()
@@ -27,9 +27,33 @@ from translate.convert import factory as convert_factory
 
 from virtaal.common import GObjectWrapper
 from virtaal.models.storemodel import StoreModel
+from virtaal.support.editjournal import EditJournal
 from basecontroller import BaseController
 
 
+class _OpenedFile(object):
+    """A file loaded by L{StoreController}, but not yet put to use."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.archivetemp = None
+        self.force_saveas = False
+        self.project = None
+        self.real_filename = None
+        self.store = None
+        self.targetfname = None
+
+    def discard(self):
+        """Clean up after a file that will not be used."""
+        self.project = None
+        self.store = None
+        if self.archivetemp and os.path.isfile(self.archivetemp):
+            try:
+                os.unlink(self.archivetemp)
+            except Exception:
+                logging.exception('Unable to delete file %s' % (self.archivetemp))
+
+
 # TODO: Create an event that is emitted when a cursor is created
 class StoreController(BaseController):
     """The controller for all store-level activities."""
@@ -39,6 +63,9 @@ class StoreController(BaseController):
         'store-loaded': (gobject.SIGNAL_RUN_FIRST, gobject.TYPE_NONE, ()),
         'store-saved':  (gobject.SIGNAL_RUN_FIRST, gobject.TYPE_NONE, ()),
         'store-closed': (gobject.SIGNAL_RUN_FIRST, gobject.TYPE_NONE, ()),
+        'store-load-progress': (gobject.SIGNAL_RUN_FIRST, gobject.TYPE_NONE, (float, object)),
+        'store-load-failed':   (gobject.SIGNAL_RUN_FIRST, gobject.TYPE_NONE, (object,)),
+        'store-load-cancelled': (gobject.SIGNAL_RUN_FIRST, gobject.TYPE_NONE, ()),
     }
 
     # INITIALIZERS #
@@ -50,6 +77,8 @@ class StoreController(BaseController):
         self._unit_controller = None # This is set by UnitController itself when it is created
 
         self._archivetemp = None
+        self._journal = None
+        self._load_job = None
         self.cursor = None
         self.handler_ids = {}
         self._modified = False
@@ -61,6 +90,9 @@ class StoreController(BaseController):
         self._controller_register_id = self.main_controller.connect('controller-registered', self._on_controller_registered)
 
     def destroy(self):
+        self.cancel_open()
+        # Unsaved changes were saved or deliberately discarded before quitting
+        self._close_journal()
         if self.project:
             del self.project
         if self._archivetemp and os.path.isfile(self._archivetemp):
@@ -152,8 +184,10 @@ class StoreController(BaseController):
         """@type unitcont: UnitController"""
         if self.unit_controller and 'unitview.unit-modified' in self.handler_ids:
             self.unit_controller.disconnect(self.handler_ids['unitview.unit-modified'])
+            self.unit_controller.disconnect(self.handler_ids['unitview.unit-done'])
         self._unit_controller = unitcont
         self.handler_ids['unitview.unit-modified'] = self.unit_controller.connect('unit-modified', self._unit_modified)
+        self.handler_ids['unitview.unit-done'] = self.unit_controller.connect('unit-done', self._unit_done)
     unit_controller = property(_get_unitcontroller, _set_unitcontroller)
 
 
@@ -168,8 +202,8 @@ class StoreController(BaseController):
 
         i = 0
         try:
-            i = self.store.get_units().index(unit)
-        except Exception, exc:
+            i = self.store.get_unit_index(unit)
+        except ValueError, exc:
             logging.debug('Unit not found:\n%s' % (exc))
 
         if force:
@@ -178,53 +212,169 @@ class StoreController(BaseController):
             self.cursor.index = i
 
     def open_file(self, filename, uri='', forget_dir=False):
-        force_saveas = False
+        """Open the file given by C{filename}, blocking until it is loaded.
+            See L{open_file_async()} to open files without blocking."""
+        self.cancel_open()
+        opened = self._prepare_open(filename)
+        try:
+            self._load_file(opened)
+        except Exception:
+            opened.discard()
+            raise
+        self._use_opened_file(opened, forget_dir)
+
+    def open_file_async(self, filename, uri='', forget_dir=False):
+        """Open the file given by C{filename} without blocking the main loop.
+
+            The file is converted (if needed) and loaded on a worker thread.
+            "store-load-progress" is emitted while that happens and
+            "store-loaded" only once the store is ready to use. If the file
+            can not be opened, "store-load-failed" is emitted with the
+            exception instead. Opening can be abandoned with
+            L{cancel_open()}.
+
+            The current store can not be edited until loading is done,
+            since the changes would be lost when the new store replaces
+            it."""
+        from virtaal.support.backgroundjob import BackgroundJob
+        self.cancel_open()
+        opened = self._prepare_open(filename)
+
+        def load(job):
+            return self._load_file(opened, job)
+        def on_finished(job, opened):
+            self._load_job = None
+            try:
+                self._use_opened_file(opened, forget_dir)
+            except Exception, exc:
+                logging.exception('Unable to use opened file %s' % (filename))
+                opened.discard()
+                self._set_view_sensitive(True)
+                self.emit('store-load-failed', exc)
+        def on_failed(job, exc):
+            self._load_job = None
+            opened.discard()
+            self._set_view_sensitive(True)
+            self.emit('store-load-failed', exc)
+        def on_progress(job, fraction, message):
+            self.emit('store-load-progress', fraction, message)
+        def on_cancelled(result):
+            opened.discard()
+
+        self._load_job = BackgroundJob(load, cleanup=on_cancelled)
+        self._load_job.connect('finished', on_finished)
+        self._load_job.connect('failed', on_failed)
+        self._load_job.connect('progress', on_progress)
+        self._set_view_sensitive(False)
+        self._load_job.start()
+
+    def cancel_open(self):
+        """Abandon the file being opened by L{open_file_async()}, if any, and
+            emit "store-load-cancelled"."""
+        if self._load_job is not None:
+            self._load_job.cancel()
+            self._load_job = None
+            self._set_view_sensitive(True)
+            self.emit('store-load-cancelled')
+
+    def is_loading(self):
+        """Whether a file is being opened by L{open_file_async()}."""
+        return self._load_job is not None
+
+    def _set_view_sensitive(self, sensitive):
+        """Prevent (or allow again) changes to the current store while
+            another one is being loaded."""
+        if self.store is not None:
+            self.view.set_sensitive(sensitive)
+
+    def _prepare_open(self, filename):
+        """Collect everything needed from other controllers to open
+            C{filename}, so that L{_load_file()} can run on another thread."""
+        opened = _OpenedFile(filename)
+        extension = filename.split(os.extsep)[-1]
+        if extension != 'zip' and extension in convert_factory.converters:
+            # Use temporary file name for bundle archive
+            opened.targetfname = self._get_new_bundle_filename(filename)
+            opened.archivetemp = self._get_new_bundle_filename(filename, force_temp=True)
+        return opened
+
+    def _load_file(self, opened, job=None):
+        """Convert and load the file described by C{opened}. This does not
+            touch the GUI or the state of this controller, so it is safe to
+            call on any thread.
+            @type  job: virtaal.support.backgroundjob.BackgroundJob
+            @param job: The job to report progress to, if any."""
+        def progress(fraction, message):
+            if job is not None:
+                job.check_cancelled()
+                job.report_progress(fraction, message)
+
+        filename = opened.filename
         extension = filename.split(os.extsep)[-1]
         if extension == 'zip':
+            progress(0.0, _('Opening project bundle...'))
             from translate.storage import bundleprojstore
             try:
                 from translate.storage.project import Project
-                self.project = Project(bundleprojstore.BundleProjectStore(filename))
+                opened.project = Project(bundleprojstore.BundleProjectStore(filename))
             except bundleprojstore.InvalidBundleError, err:
                 logging.exception('Unable to load project bundle')
 
-            if not len(self.project.store.transfiles):
+            if not len(opened.project.store.transfiles):
                 # FIXME: Ask the user to select a source file to convert?
-                if not len(self.project.store.sourcefiles):
+                if not len(opened.project.store.sourcefiles):
                     raise bundleprojstore.InvalidBundleError(_('No source or translatable files in bundle'))
-                self.project.convert_forward(self.project.store.sourcefiles[0])
+                progress(0.1, _('Converting document...'))
+                opened.project.convert_forward(opened.project.store.sourcefiles[0])
 
             # FIXME: Ask the user which translatable file to open?
-            transfile = self.project.get_file(self.project.store.transfiles[0])
-            self.real_filename = transfile.name
+            transfile = opened.project.get_file(opened.project.store.transfiles[0])
+            opened.real_filename = transfile.name
             logging.info(
                 'Editing translation file %s:%s' %
-                (filename, self.project.store.transfiles[0])
+                (filename, opened.project.store.transfiles[0])
             )
-            self.store = StoreModel(transfile, self)
-        elif extension in convert_factory.converters:
-            # Use temporary file name for bundle archive
-            self._targetfname = self._get_new_bundle_filename(filename)
-            tempfname = self._get_new_bundle_filename(filename, force_temp=True)
-            self._archivetemp = tempfname
+        elif opened.archivetemp:
+            progress(0.0, _('Converting document...'))
             from translate.storage import bundleprojstore
             from translate.storage.project import Project
-            self.project = Project(projstore=bundleprojstore.BundleProjectStore(tempfname))
-            srcfile, srcfilename, transfile, transfilename = self.project.add_source_convert(filename)
-            self.real_filename = transfile.name
+            opened.project = Project(projstore=bundleprojstore.BundleProjectStore(opened.archivetemp))
+            srcfile, srcfilename, transfile, transfilename = opened.project.add_source_convert(filename)
+            opened.real_filename = transfile.name
 
-            logging.info('Converted document %s to translatable file %s' % (srcfilename, self.real_filename))
-            self.store = StoreModel(transfile, self)
-            force_saveas = True
+            logging.info('Converted document %s to translatable file %s' % (srcfilename, opened.real_filename))
+            opened.force_saveas = True
         else:
-            self.store = StoreModel(filename, self)
+            transfile = filename
 
-        if len(self.store.get_units()) < 1:
-            # clean up, otherwise self.store still contains the store
-            self.close_file()
+        progress(0.5, _('Loading translations...'))
+        def load_progress(fraction):
+            progress(0.5 + fraction / 2, _('Loading translations...'))
+        opened.store = StoreModel(transfile, self, load_progress)
+        if len(opened.store) < 1:
             raise ValueError(_('The file contains nothing to translate.'))
+        progress(1.0, u'')
+        return opened
+
+    def _use_opened_file(self, opened, forget_dir=False):
+        """Make the store loaded by L{_load_file()} the current store."""
+        filename = opened.filename
+        force_saveas = opened.force_saveas
+        if self._archivetemp and os.path.isfile(self._archivetemp):
+            os.unlink(self._archivetemp)
+        self.project = opened.project
+        self.real_filename = opened.real_filename
+        self._archivetemp = opened.archivetemp
+        self._targetfname = opened.targetfname
+        if self.store is not None:
+            self.store.stop_indexing()
+        self.store = opened.store
+        self.store.start_indexing()
 
         self._modified = False
+        self._close_journal()
+        if self.project is None:
+            self._open_journal(filename)
 
         # if file is a template, force saveas
         import re
@@ -244,6 +394,7 @@ class StoreController(BaseController):
         from cursor import Cursor
         self.cursor = Cursor(self.store, self.store.stats['total'])
 
+        self.view.set_sensitive(True)
         self.view.load_store(self.store)
         self.view.show()
 
@@ -251,8 +402,13 @@ class StoreController(BaseController):
 
     def save_file(self, filename=None):
         self.unit_controller.prepare_for_save()
+        if self.unit_controller.current_unit:
+            self.store.update_unit_stats(self.unit_controller.current_unit)
         if self.project is None:
             self.store.save_file(filename) # store.save_file() will raise an appropriate exception if necessary
+            # Start a new journal for the saved file
+            self._close_journal()
+            self._journal = EditJournal(self.store.get_filename())
         else:
             # XXX: filename is the name that the bundle archive should be saved
             #      as, seeing as self.store is opened from a temporary file
@@ -279,20 +435,38 @@ class StoreController(BaseController):
                     self._archivetemp = None
 
                     cursor_pos = self.cursor.pos
+                    def disconnect_post_load(sender, *args):
+                        for handler_id in self._proj_file_load_ids:
+                            self.disconnect(handler_id)
+                        self._proj_file_load_ids = []
+                    def post_load(sender):
+                        disconnect_post_load(sender)
+                        self.cursor.pos = cursor_pos
                     def post_save(sender):
                         if not hasattr(self, '_proj_file_saved_id'):
                             return
                         self.disconnect(self._proj_file_saved_id)
+                        # The file is opened in the background
+                        self._proj_file_load_ids = [
+                            self.connect('store-loaded', post_load),
+                            self.connect('store-load-failed', disconnect_post_load),
+                            self.connect('store-load-cancelled', disconnect_post_load),
+                        ]
                         self.main_controller.open_file(filename)
-                        self.cursor.pos = cursor_pos
+                        if not self.is_loading():
+                            # Opening failed before loading started
+                            disconnect_post_load(self)
                     self._proj_file_saved_id = self.connect('store-saved', post_save)
         self._modified = False
         self.main_controller.set_saveable(False)
         self.emit('store-saved')
 
     def close_file(self):
+        self._close_journal()
         del self.project
         self.project = None
+        if self.store is not None:
+            self.store.stop_indexing()
         self.store = None
         self._modified = False
         self.main_controller.set_saveable(False)
@@ -397,6 +571,48 @@ class StoreController(BaseController):
 
         self.emit('store-loaded')
 
+    def set_unit_targets(self, targets):
+        """Change the targets of many units at once, directly in the model
+            and without loading the units in the editor. The statistics,
+            checks and search index of the units are updated, and the store
+            view is refreshed once all units were changed.
+
+            The unit that is loaded in the editor should not be changed this
+            way, since the editor would not show the change.
+            @param targets: C{(unit, target)} pairs, where C{target} is a
+                list of strings for units with plurals, or C{(unit, target,
+                fuzzy)} triples to also mark the units as fuzzy (or not).
+            @returns: The C{(unit, target, fuzzy)} triples that would undo
+                the change."""
+        old_targets = []
+        indexes = []
+        for item in targets:
+            unit, target = item[:2]
+            if unit.hasplural():
+                old_targets.append((unit, list(unit.target.strings), unit.isfuzzy()))
+            else:
+                old_targets.append((unit, unicode(unit.target or u''), unit.isfuzzy()))
+            unit.target = target
+            if len(item) > 2:
+                unit.markfuzzy(item[2])
+            self.store.update_unit_stats(unit)
+            try:
+                index = self.store.get_unit_index(unit)
+            except ValueError:
+                continue
+            indexes.append(index)
+            if self._journal is not None:
+                try:
+                    self._journal.record(index, unit)
+                except (IOError, OSError), exc:
+                    logging.warning('Unable to journal unit: %s' % (exc))
+
+        if old_targets:
+            self._modified = True
+            self.main_controller.set_saveable(self._modified)
+            self.view.update_units(indexes)
+        return old_targets
+
     def update_store_checks(self, **kwargs):
         """Shortcut to C{StoreModel.update_stats()}"""
         store = self.get_store()
@@ -496,6 +712,35 @@ class StoreController(BaseController):
             os.unlink(outfname)
         return outfname
 
+    def _close_journal(self):
+        """Stop journaling edits and delete the journal. This should only be
+            done when all edits were saved or deliberately discarded."""
+        if self._journal is not None:
+            self._journal.close(discard=True)
+            self._journal = None
+
+    def _open_journal(self, filename):
+        """Start journaling edits to the store loaded from C{filename}, after
+            recovering the edits of a previous session that didn't end
+            properly."""
+        self._journal = EditJournal(filename)
+        try:
+            recovered = self._journal.replay(self.store)
+        except Exception, exc:
+            logging.exception('Unable to recover edits from %s' % (self._journal.journal_filename))
+            recovered = []
+        if not recovered:
+            return
+
+        for index in recovered:
+            self.store.update_unit_stats(self.store.get_unit(index))
+        self._modified = True
+        logging.info('Recovered %d unsaved units of %s' % (len(recovered), filename))
+        self.main_controller.show_info(
+            _('Unsaved changes recovered'),
+            _('Virtaal was not closed properly the last time this file was edited. Unsaved changes to %(count)d units were recovered.') % {'count': len(recovered)}
+        )
+
     def _guess_export_filename(self, projfname):
         guess = projfname.split('/')[-1]
         bundle_fname = self.get_bundle_filename()
@@ -528,6 +773,15 @@ class StoreController(BaseController):
     def _on_target_lang_changed(self, _sender, langcode):
         self.store.set_target_language(langcode)
 
+    def _unit_done(self, emitter, unit, modified):
+        if modified and self.store:
+            self.store.update_unit_stats(unit)
+            if self._journal is not None:
+                try:
+                    self._journal.record(self.store.get_unit_index(unit), unit)
+                except (ValueError, IOError, OSError), exc:
+                    logging.warning('Unable to journal unit: %s' % (exc))
+
     def _unit_modified(self, emitter, unit):
         self._modified = True
         self.main_controller.set_saveable(self._modified)
@@ -26,6 +26,8 @@
 
 
 import gobject
+# Files are opened on a worker thread (see StoreController.open_file_async())
+gobject.threads_init()
 
 
 class _Deferer:
@@ -68,10 +70,10 @@ class Virtaal(object):
         self.main_controller = main_controller
 
         if startupfile:
-            # Just call the open plainly - we want it done before we start the
-            # event loop.
+            # Start opening the file right away; it is loaded in the
+            # background once the event loop runs.
             if self._open_with_file(startupfile):
-                self.defer(WelcomeScreenController, main_controller)
+                self.defer(self._load_welcome_screen)
             else:
                 # Something went wrong, and we have to show the welcome screen
                 wc = WelcomeScreenController(main_controller)
@@ -106,6 +108,14 @@ class Virtaal(object):
 
         return main_controller.open_file(startupfile)
 
+    def _load_welcome_screen(self):
+        from virtaal.controllers.welcomescreencontroller import WelcomeScreenController
+        wc = WelcomeScreenController(self.main_controller)
+        store_controller = self.main_controller.store_controller
+        # The startup file might have failed to load in the mean time
+        if not store_controller.get_store() and not store_controller.is_loading():
+            wc.activate()
+
     def _open_with_welcome(self):
         from virtaal.controllers.unitcontroller import UnitController
         from virtaal.controllers.modecontroller import ModeController
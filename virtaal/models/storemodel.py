@@ -18,33 +18,16 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, see <http://www.gnu.org/licenses/>.
 
+import gobject
 import os
 import logging
 
 from virtaal.common import pan_app
+from virtaal.support.indexset import IndexSet
 
 from basemodel import BaseModel
 
 
-def fix_indexes(stats, valid_units=None):
-    """convert statsdb array to use model index instead of storage class index"""
-    if valid_units is None:
-        valid_units = stats['total']
-
-    new_stats = {}
-    if valid_units:
-        valid_unit_indexes = dict([(uindex, index) for (index, uindex) in enumerate(valid_units)])
-        # Adjust stats
-        for key in stats:
-            if key == 'extended':
-                new_stats['extended'] = {}
-                for estate in stats['extended']:
-                    new_stats['extended'][estate] = [valid_unit_indexes[i] for i in stats['extended'][estate]]
-                continue
-            new_stats[key] = [valid_unit_indexes[i] for i in stats[key]]
-    return new_stats
-
-
 class StoreModel(BaseModel):
     """
     This model represents a translation store/file. It is basically a wrapper
@@ -54,11 +37,31 @@ class StoreModel(BaseModel):
 
     __gtype_name__ = "StoreModel"
 
+    LAZY_LOAD_THRESHOLD = 2 * 1024 * 1024
+    """PO files bigger than this (in bytes) are only indexed when loaded, and
+        their units are parsed as they are needed. Only these files are saved
+        incrementally (see L{save_file()}). Keep the "Large files" section of
+        the README in sync when changing this."""
+    INDEX_CHUNK_SIZE = 200
+    """The number of units to add to the text (or similarity) index in one
+        go while the main loop is idle."""
+
     # INITIALIZERS #
-    def __init__(self, fileobj, controller):
+    def __init__(self, fileobj, controller, progress=None):
+        """Constructor.
+            @param progress: See L{load_file()}."""
         super(StoreModel, self).__init__()
         self.controller = controller
-        self.load_file(fileobj)
+        self._text_index = None
+        self._similarity_index = None
+        self._indexing = False
+        self._index_iter = None
+        self._index_id = 0
+        self._changed_while_indexing = set()
+        self._similarity_iter = None
+        self._similarity_id = 0
+        self._changed_while_similarity = set()
+        self.load_file(fileobj, progress)
 
 
     # SPECIAL METHODS #
@@ -105,17 +108,129 @@ class StoreModel(BaseModel):
 
     def get_unit(self, index):
         """Get a specific unit by index."""
-        return self._trans_store.units[self._valid_units[index]]
+        if self._units is not None:
+            return self._units[index]
+        unit = self._trans_store.units[self._valid_units[index]]
+        # Lazily loaded stores only have the units that were requested so far
+        self._unit_indexes[id(unit)] = index
+        return unit
 
     def get_units(self):
-        # TODO: Add caching
         """Return the current store's (filtered) units."""
-        return [self._trans_store.units[i] for i in self._valid_units]
+        if self._units is None:
+            units = self._trans_store.units
+            self._units = [units[i] for i in self._valid_units]
+            self._unit_indexes = dict([(id(unit), index) for (index, unit) in enumerate(self._units)])
+        return self._units
+
+    def get_unit_index(self, unit):
+        """Get the index of the given unit in constant time.
+            @raises ValueError: If the unit is not in this store."""
+        index = self._unit_indexes.get(id(unit), None)
+        if index is None and self._units is None:
+            self.get_units()
+            index = self._unit_indexes.get(id(unit), None)
+        # Make sure that the unit wasn't replaced by another object with the same id()
+        if index is None or self.get_unit(index) is not unit:
+            raise ValueError('Unit not in store')
+        return index
+
+    def get_text_index(self):
+        """Return the L{TrigramIndex} of the units' text, which is kept up
+            to date by L{update_unit_stats()}.
+            @returns: The index, or C{None} if it is not built (yet): see
+                L{start_indexing()}."""
+        return self._text_index
+
+    def get_similarity_index(self):
+        """Return the L{SimilarityIndex} of the units' strings, which is
+            kept up to date by L{update_unit_stats()}. It is only built in
+            the background (like the text index) once it is asked for.
+            @returns: The index, or C{None} if it is not built yet."""
+        if self._similarity_index is None and self._similarity_iter is None:
+            self._changed_while_similarity = set()
+            self._similarity_iter = self._build_similarity_index()
+            self._similarity_id = gobject.idle_add(self._on_similarity_idle, priority=gobject.PRIORITY_LOW)
+        return self._similarity_index
+
+    def get_unit_category(self, category):
+        """Return the indexes of the units in the given category.
+            @param category: A statsdb state name (like C{'fuzzy'}), a
+                workflow state id (a key of C{self.stats['extended']}), the
+                name of a failing quality check (a key of C{self.checks}) or
+                an L{IndexSet}, like the results of a search, which is
+                returned as it is.
+            @rtype: L{IndexSet}"""
+        if isinstance(category, IndexSet):
+            return category
+        stats = self.stats or {}
+        if category in stats and category != 'extended':
+            return stats[category]
+        if category in stats.get('extended', {}):
+            return stats['extended'][category]
+        checks = getattr(self, 'checks', None) or {}
+        if category in checks:
+            return checks[category]
+        return IndexSet()
+
+    def select_units(self, any_of=(), all_of=(), none_of=()):
+        """Return the indexes of the units that are in at least one of the
+            categories in C{any_of} (or all units if it is empty), in all of
+            the categories in C{all_of} and in none of those in C{none_of}.
+
+            Filters can be combined this way without going over all units:
+            C{select_units(all_of=['fuzzy', 'check-printf'])} gives the fuzzy
+            units that fail the printf check. See L{get_unit_category()} for
+            the possible categories.
+            @rtype: L{IndexSet}"""
+        get_category = self.get_unit_category
+        if any_of:
+            selected = IndexSet().union(*[get_category(category) for category in any_of])
+        else:
+            selected = self.stats['total']
+        if all_of:
+            selected = selected.intersection(*[get_category(category) for category in all_of])
+        if none_of:
+            selected = selected.difference(*[get_category(category) for category in none_of])
+        return selected
 
 
     # METHODS #
-    def load_file(self, fileobj):
+    def start_indexing(self):
+        """Build the text index (see L{get_text_index()}) in the background,
+            a chunk of units at a time while the main loop is idle. Units of
+            lazily loaded stores are only parsed as they are indexed. The
+            index is rebuilt whenever the statistics are recalculated, until
+            L{stop_indexing()} is called."""
+        self._indexing = True
+        self._cancel_indexing()
+        self._text_index = None
+        self._changed_while_indexing = set()
+        self._index_iter = self._build_text_index()
+        self._index_id = gobject.idle_add(self._on_index_idle, priority=gobject.PRIORITY_LOW)
+
+    def stop_indexing(self):
+        """Stop building (and rebuilding) the text and similarity indexes in
+            the background."""
+        self._indexing = False
+        self._cancel_indexing()
+        self._cancel_similarity_index()
+
+    def load_file(self, fileobj, progress=None):
+        """Load the store from C{fileobj} (a file name or file object).
+            @param progress: A function that is called now and then with the
+                fraction (from 0 to 1) of the loading that is done. Only big
+                PO files (see L{LAZY_LOAD_THRESHOLD}) report their progress
+                while they are read; for other files, progress is reported
+                once the file is parsed, while the statistics are
+                calculated."""
         # Adapted from Document.__init__()
+        def report(offset):
+            # Reading the file is the first half of the work
+            if progress is None:
+                return None
+            return lambda fraction: progress(offset + fraction / 2)
+        self._invalidate_units()
         filename = fileobj
         if isinstance(filename, basestring):
             if not os.path.exists(filename):
@@ -130,76 +245,146 @@ class StoreModel(BaseModel):
             if filename is None:
                 filename = '<projectfile>'
         logging.info('Loading file %s' % (filename))
-        from translate.storage import factory
-        self._trans_store = factory.getobject(fileobj)
+        self._trans_store = self._load_lazy(fileobj, report(0.0))
+        if self._trans_store is None:
+            from translate.storage import factory
+            self._trans_store = factory.getobject(fileobj)
         self.filename = filename
-        self.update_stats(filename=filename)
+        self.update_stats(progress=report(0.5))
         #self._correct_header(self._trans_store)
         self.nplurals = self._compute_nplurals(self._trans_store)
 
+    def is_lazy(self):
+        """Whether the store still contains units that were not parsed."""
+        is_lazy = getattr(self._trans_store, 'is_lazy', None)
+        return bool(is_lazy and is_lazy())
+
+    def get_dirty_units(self):
+        """Return the sorted indexes of the units that were changed since
+            the file was loaded or last saved."""
+        return sorted(self._dirty_units)
+
     def save_file(self, filename=None):
+        """Save the store to C{filename} (or the file it was loaded from).
+
+            Only lazily loaded PO files (see L{LAZY_LOAD_THRESHOLD}) write out
+            just the units that changed; the units of all other stores are
+            all serialized again. Uncompressed files are written to a
+            temporary file that then replaces the original."""
         self._update_header()
         if filename is None:
             filename = self.filename
-        if filename == self.filename:
-            self._trans_store.save()
+        store = self._trans_store
+
+        # Stores that only write out changed units need to know about changes
+        # they can't detect themselves
+        mark_changed = getattr(store, 'mark_changed', None)
+        if mark_changed is not None:
+            for index in self._dirty_units:
+                mark_changed(self._valid_units[index])
+
+        if isinstance(filename, basestring) and not filename.endswith(('.gz', '.bz2')):
+            from virtaal.support.atomicsave import save_atomically
+            save_atomically(filename, str(store), store._binary and 'wb' or 'w')
+            store.filename = filename
+            store.fileobj = None
+        elif filename == self.filename:
+            store.save()
         else:
-            self._trans_store.savefile(filename)
-        self.update_stats(filename=filename)
-
-    def update_stats(self, filename=None):
+            store.savefile(filename)
+        self._dirty_units.clear()
+
+    def update_stats(self, filename=None, progress=None):
+        """Recalculate the statistics of all units in the store.
+            This is only necessary if the store changed in some other way than
+            through L{update_unit_stats()}.
+            @param progress: See L{StoreStats.compute()}."""
         self.stats = None
         if self._trans_store is None:
             return
 
-        if filename is None:
-            filename = self.filename
-
-        from translate.storage import statsdb
-        stats = statsdb.StatsCache().filestatestats(filename,  self._trans_store, extended=True)
-        self._valid_units = stats['total']
-        self.stats = fix_indexes(stats)
+        from virtaal.support.storechecks import StoreChecks
+        from virtaal.support.storestats import StoreStats
+        self._stats_engine = StoreStats(self._trans_store, progress)
+        self._valid_units = self._stats_engine.valid_units
+        self._checks_cache = StoreChecks(len(self._valid_units))
+        self._dirty_units = set()
+        self._text_index = None
+        self._similarity_index = None
+        self._cancel_similarity_index()
+        self._invalidate_units()
+        self.stats = self._stats_engine.stats
+        if self._indexing:
+            self.start_indexing()
         return self.stats
 
+    def update_unit_stats(self, unit):
+        """Update the statistics and forget the cached check results after
+            C{unit} changed, and remember that it has to be saved.
+            @returns: Whether the state of the unit changed."""
+        try:
+            index = self.get_unit_index(unit)
+        except ValueError:
+            return False
+        self._dirty_units.add(index)
+        self._checks_cache.invalidate_unit(index)
+        if self._text_index is not None:
+            self._text_index.update_unit(index, unit)
+        elif self._index_iter is not None:
+            self._changed_while_indexing.add(index)
+        if self._similarity_index is not None:
+            self._similarity_index.update_unit(index, unit)
+        elif self._similarity_iter is not None:
+            self._changed_while_similarity.add(index)
+        return self._stats_engine.update_unit(index, unit)
+
     def update_checks(self, checker=None, filename=None):
+        """Return the quality check failures of all units. Only units that
+            changed since the last time the same checker was used are checked
+            again."""
         self.checks = None
         if self._trans_store is None:
             return
 
-        if filename is None:
-            filename = self.filename
-
         if checker is None:
             checker = self._checker
         else:
             self._checker = checker
 
-        from translate.storage import statsdb
-        errors = statsdb.StatsCache().filechecks(filename, checker, self._trans_store)
-        self.checks = fix_indexes(errors, self._valid_units)
+        self.checks = self._checks_cache.update(self.get_units(), checker)
+        return self.checks
+
+    def take_unchecked_units(self, checker):
+        """Return the units that have to be checked (again) with C{checker}
+            to bring C{self.checks} up to date. This is for checking units
+            elsewhere, like in other processes, instead of with
+            L{update_checks()}.
+            @returns: A list of C{(index, unit_key, unit)} tuples, of which
+                the results must be reported with L{set_check_results()}."""
+        units = self.get_units()
+        return [(index, unit_key, units[index]) for index, unit_key in self._checks_cache.take_pending(units, checker)]
+
+    def set_check_results(self, checker, results):
+        """Record the results of checking some of the units returned by
+            L{take_unchecked_units()}.
+            @param results: C{(index, unit_key, failures)} tuples."""
+        self._checker = checker
+        self._checks_cache.set_results(checker, results)
+        self.checks = self._checks_cache.get_checks(checker)
         return self.checks
 
     def update_file(self, filename):
         # Adapted from Document.__init__()
-        from translate.storage import factory, statsdb
+        from translate.storage import factory
         newstore = factory.getobject(filename)
         oldfilename = self._trans_store.filename
 
         #get a copy of old stats before we convert
-        from translate.filters import checks
-        oldstats = statsdb.StatsCache().filestats(oldfilename, checks.UnitChecker(), self._trans_store)
+        oldstats = dict([(key, list(self.stats[key])) for key in ('translated', 'fuzzy', 'untranslated')])
 
         from translate.convert import pot2po
         self._trans_store = pot2po.convert_stores(newstore, self._trans_store, fuzzymatching=False)
-
-        #FIXME: ugly tempfile hack, can we please have a pure store implementation of statsdb
-        import tempfile
-        import os
-        tempfd, tempfilename = tempfile.mkstemp()
-        os.write(tempfd, str(self._trans_store))
-        self.update_stats(filename=tempfilename)
-        os.close(tempfd)
-        os.remove(tempfilename)
+        self.update_stats()
 
         self.controller.compare_stats(oldstats, self.stats)
 
@@ -208,6 +393,76 @@ class StoreModel(BaseModel):
         self._correct_header(self._trans_store)
         self.nplurals = self._compute_nplurals(self._trans_store)
 
+    def _build_text_index(self):
+        """Index the units a chunk at a time, yielding after every chunk."""
+        from virtaal.support.textindex import TrigramIndex
+        index = TrigramIndex()
+        unit_count = len(self._valid_units)
+        chunk_size = self.INDEX_CHUNK_SIZE
+        for start in xrange(0, unit_count, chunk_size):
+            end = min(start + chunk_size, unit_count)
+            index.add_units(start, [self.get_unit(i) for i in xrange(start, end)])
+            yield None
+        index.finish()
+        # Units that were indexed before they changed
+        for i in self._changed_while_indexing:
+            index.update_unit(i, self.get_unit(i))
+        self._changed_while_indexing = set()
+        self._text_index = index
+
+    def _build_similarity_index(self):
+        """Add the units to a L{SimilarityIndex} a chunk at a time, yielding
+            after every chunk."""
+        from virtaal.support.bktree import SimilarityIndex
+        index = SimilarityIndex()
+        unit_count = len(self._valid_units)
+        chunk_size = self.INDEX_CHUNK_SIZE
+        for start in xrange(0, unit_count, chunk_size):
+            end = min(start + chunk_size, unit_count)
+            index.add_units(start, [self.get_unit(i) for i in xrange(start, end)])
+            yield None
+        for i in self._changed_while_similarity:
+            index.update_unit(i, self.get_unit(i))
+        self._changed_while_similarity = set()
+        self._similarity_index = index
+
+    def _cancel_similarity_index(self):
+        if self._similarity_id:
+            gobject.source_remove(self._similarity_id)
+            self._similarity_id = 0
+        self._similarity_iter = None
+
+    def _cancel_indexing(self):
+        if self._index_id:
+            gobject.source_remove(self._index_id)
+            self._index_id = 0
+        self._index_iter = None
+
+    def _invalidate_units(self):
+        """Forget the cached list of units and their indexes. This must be
+            called whenever the store or C{self._valid_units} changes."""
+        self._units = None
+        self._unit_indexes = {}
+
+    def _load_lazy(self, fileobj, progress=None):
+        """Index big PO files with L{LazyPOFile} instead of parsing them.
+            @param progress: See L{index_po()}.
+            @returns: The lazy store, or C{None} if the file should be loaded
+                normally."""
+        if not isinstance(fileobj, basestring) or not fileobj.endswith(('.po', '.pot')):
+            return None
+        if os.path.getsize(fileobj) < self.LAZY_LOAD_THRESHOLD:
+            return None
+
+        from virtaal.support.lazypo import LazyPOFile
+        try:
+            store = LazyPOFile()
+            store.parse(open(fileobj, 'rb'), progress)
+            return store
+        except ValueError, exc:
+            logging.info('Unable to index %s, loading it normally: %s' % (fileobj, exc))
+            return None
+
     def _compute_nplurals(self, store):
         # Copied as-is from Document._compute_nplurals()
         # FIXME this needs to be pushed back into the stores, we don't want to import each format
@@ -229,10 +484,8 @@ class StoreModel(BaseModel):
         from translate.storage.poheader import poheader
         if isinstance(store, poheader) and not store.header():
             store.updateheader(add=True)
-            new_stats = {}
-            for key, values in self.stats.iteritems():
-                new_stats[key] = [value+1 for value in values]
-            self.stats = new_stats
+            # All units moved one position down in the store
+            self.update_stats()
 
     def _update_header(self):
         """Make sure that headers are complete and update with current time (if applicable)."""
@@ -270,3 +523,23 @@ class StoreModel(BaseModel):
             if plural:
                 self._trans_store.updateheaderplural(nplurals, plural)
             self._trans_store.updateheader(add=True, **header_updates)
+
+
+    # EVENT HANDLERS #
+    def _on_index_idle(self):
+        try:
+            self._index_iter.next()
+        except StopIteration:
+            self._index_id = 0
+            self._index_iter = None
+            return False
+        return True
+
+    def _on_similarity_idle(self):
+        try:
+            self._similarity_iter.next()
+        except StopIteration:
+            self._similarity_id = 0
+            self._similarity_iter = None
+            return False
+        return True
@@ -21,6 +21,7 @@
 import locale
 import gtk
 
+from virtaal.support.indexset import IndexSet
 from virtaal.views.widgets.popupmenubutton import PopupMenuButton, POS_NW_SW
 
 from basemode import BaseMode
@@ -42,6 +43,7 @@ class QualityCheckMode(BaseMode):
         self.store_controller = controller.main_controller.store_controller
         self.main_controller = controller.main_controller
         self._checker_set_id = None
+        self._check_signal_ids = []
         self.filter_checks = []
         # a way to map menuitems to their check names, and signal ids:
         self._menuitem_checks = {}
@@ -50,8 +52,11 @@ class QualityCheckMode(BaseMode):
 
     # METHODS #
     def _prepare_stats(self):
-        self.store_controller.update_store_checks(checker=self.main_controller.checks_controller.get_checker())
-        self.stats = self.store_controller.get_store_checks()
+        self.stats = self.main_controller.checks_controller.check_store()
+        if self.stats is None:
+            # Still checking in the background: _on_checker_set() will
+            # call us again when "store-checked" is emitted.
+            self.stats = {}
         # A currently selected check might disappear if the style changes:
         self.filter_checks = [check for check in self.filter_checks if check in self.stats]
         self.storecursor = self.store_controller.cursor
@@ -65,6 +70,11 @@ class QualityCheckMode(BaseMode):
         self._checker_set_id = self.main_controller.checks_controller.connect('checker-set', self._on_checker_set)
         # redo stats on save to refresh navigation controls
         self._store_saved_id = self.store_controller.connect('store-saved', self._on_checker_set)
+        checks_controller = self.main_controller.checks_controller
+        self._check_signal_ids = [
+            checks_controller.connect('store-check-progress', self._on_store_check_progress),
+            checks_controller.connect('store-checked', self._on_checker_set),
+        ]
 
         self._add_widgets()
         self._update_button_label()
@@ -76,18 +86,22 @@ class QualityCheckMode(BaseMode):
             self._checker_set_id = None
             self.store_controller.disconnect(self._store_saved_id)
             self.store_saved_id = None
+            for signal_id in self._check_signal_ids:
+                self.main_controller.checks_controller.disconnect(signal_id)
+            self._check_signal_ids = []
 
     def update_indices(self):
         if not self.storecursor or not self.storecursor.model:
             return
 
-        indices = []
-        for check in self.filter_checks:
-            indices.extend(self.stats[check])
-
+        # Pass our own results, which might not be the model's latest ones
+        # while the whole file is being checked
+        indices = IndexSet()
+        if self.filter_checks:
+            model = self.storecursor.model
+            indices = model.select_units(any_of=[self.stats[check] for check in self.filter_checks])
         if not indices:
-            indices = range(len(self.storecursor.model))
-        indices.sort()
+            indices = IndexSet.range(len(self.storecursor.model))
 
         self.storecursor.indices = indices
 
@@ -125,7 +139,10 @@ class QualityCheckMode(BaseMode):
     def _update_button_label(self):
         check_labels = [mi.child.get_label() for mi in self.btn_popup.menu if mi.get_active()]
         btn_label = u''
-        if not check_labels:
+        if self.main_controller.checks_controller.is_checking_store():
+            #l10n: This is shown while checking all units of a big file
+            btn_label = _(u'Checking...')
+        elif not check_labels:
             #l10n: This is the button where the user can select units by failing quality checks
             btn_label = _(u'Select Checks')
         elif len(check_labels) == len(self.checks_names):
@@ -145,6 +162,10 @@ class QualityCheckMode(BaseMode):
         self._update_button_label()
         self.update_indices()
 
+    def _on_store_check_progress(self, checkscontroller, done, total):
+        #l10n: This is shown while checking all units of a big file. %d is the percentage done
+        self.btn_popup.set_label(_(u'Checking (%d%%)...') % (done * 100 / total))
+
     def _on_check_menuitem_toggled(self, checkmenuitem):
         self.filter_checks = []
         for menuitem in self.btn_popup.menu:
@@ -18,9 +18,6 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, see <http://www.gnu.org/licenses/>.
 
-from virtaal.support.set_enumerator import UnionSetEnumerator
-from virtaal.support.sorted_set import SortedSet
-
 from basemode import BaseMode
 
 
@@ -45,10 +42,7 @@ class QuickTranslateMode(BaseMode):
         if not cursor or not cursor.model:
             return
 
-        indices = list(UnionSetEnumerator(
-            SortedSet(cursor.model.stats['untranslated']),
-            SortedSet(cursor.model.stats['fuzzy'])
-        ).set)
+        indices = cursor.model.select_units(any_of=['untranslated', 'fuzzy'])
 
         if not indices:
             self.controller.select_default_mode()
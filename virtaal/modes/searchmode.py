@@ -22,8 +22,17 @@ import gobject
 import gtk
 import gtk.gdk
 import logging
+import re
+import time
+from array import array
+from itertools import izip
+from operator import itemgetter
 
 from virtaal.controllers.cursor import Cursor
+from virtaal.support.bktree import find_similar, get_similarity
+from virtaal.support.indexset import IndexSet
+from virtaal.support.regexsearch import RegexSearcher, get_search_flags, get_unit_strings
+from virtaal.support.textindex import get_literals
 
 from basemode import BaseMode
 from virtaal.views.theme import current_theme
@@ -38,6 +47,15 @@ class SearchMode(BaseMode):
 
     MAX_RESULTS = 100000
     SEARCH_DELAY = 500
+    SEARCH_CHUNK_SIZE = 500
+    """The number of units to search in one go while the main loop is idle."""
+    REGEX_TIME_BUDGET = 5.0
+    """The number of seconds that a regular expression search may take before
+        it is stopped."""
+    REGEX_POLL_INTERVAL = 0.02
+    MIN_SIMILARITY = 75
+    """How similar (in percent) a string must be to the search string to be
+        found by a "similar to" search."""
 
     # INITIALIZERS #
     def __init__(self, controller):
@@ -57,7 +75,22 @@ class SearchMode(BaseMode):
         self.matches = []
         self.select_first_match = True
         self._search_timeout = 0
+        self._search_id = 0
+        self._search_iter = None
+        self._search_pos = -1
+        self._search_options = None
+        self._match_indexes = IndexSet()
+        self._match_units = array('i')
+        self._unit_matches = {}
         self._unit_modified_id = 0
+        self._previous_search = None
+        self._search_truncated = False
+        self._regex_searcher = RegexSearcher()
+        self._regex_timed_out = False
+        self._research_jobs = []
+        self._research_id = 0
+        self._similar_search = False
+        self._similar_found = []
         self.unescape = None
 
     def _create_widgets(self):
@@ -73,6 +106,10 @@ class SearchMode(BaseMode):
         # http://en.wikipedia.org/wiki/Regular_expression
         self.chk_regex = gtk.CheckButton(_("_Regular expression"))
         self.chk_regex.connect('toggled', self._refresh_proxy)
+        # l10n: Check box to find strings that are similar to the search text,
+        # instead of strings that contain it
+        self.chk_similar = gtk.CheckButton(_("_Similar"))
+        self.chk_similar.connect('toggled', self._refresh_proxy)
 
         # Widgets for replace (second row)
         # l10n: This text label shows in front of the text box where the replacement
@@ -88,7 +125,7 @@ class SearchMode(BaseMode):
         self.chk_replace_all = gtk.CheckButton(_('Replace _All'))
 
         self.widgets = [
-            self.ent_search, self.btn_search, self.chk_casesensitive, self.chk_regex,
+            self.ent_search, self.btn_search, self.chk_casesensitive, self.chk_regex, self.chk_similar,
             self.lbl_replace, self.ent_replace, self.btn_replace, self.chk_replace_all
         ]
 
@@ -115,6 +152,7 @@ class SearchMode(BaseMode):
         if not self.storecursor or not self.storecursor.model:
             return
 
+        self._previous_search = None
         self._add_widgets()
         self._connect_highlighting()
         self._connect_textboxes()
@@ -189,53 +227,44 @@ class SearchMode(BaseMode):
             rstring = unit_controller.get_unit_target(match.part_n)
             unit_controller.set_unit_target(match.part_n, rstring[:match.start] + replace_str + rstring[match.end:])
 
-    def update_search(self):
+    def update_search(self, progressive=True):
+        """Start a new search with the current search options, cancelling
+            the one that is still running (if any).
+            @param progressive: Search a chunk of units at a time while the
+                main loop is idle, showing matches as they are found. If
+                C{False}, the search is finished before this returns."""
+        self._cancel_search()
+        self._search_options = self._get_search_options()
+        self._similar_search = self.chk_similar.get_active()
         from translate.tools.pogrep import GrepFilter
         self.filter = GrepFilter(
             searchstring=unicode(self.ent_search.get_text()),
             searchparts=('source', 'target'),
             ignorecase=not self.chk_casesensitive.get_active(),
-            useregexp=self.chk_regex.get_active(),
-            max_matches=self.MAX_RESULTS
+            useregexp=self.chk_regex.get_active() and not self._similar_search
         )
-        store_units = self.storecursor.model.get_units()
-        self.matches, indexes = self.filter.getmatches(store_units)
-        self.matchcursor = Cursor(self.matches, range(len(self.matches)))
-
-        logging.debug('Search text: %s (%d matches)' % (self.ent_search.get_text(), len(indexes)))
-
-        if indexes:
-            self.ent_search.modify_base(gtk.STATE_NORMAL, self.default_base)
-            self.ent_search.modify_text(gtk.STATE_NORMAL, self.default_text)
-
-            self.storecursor.indices = indexes
-            # Select initial match for in the current unit.
-            match_index = 0
-            selected_unit = self.storecursor.model[self.storecursor.index]
-            for match in self.matches:
-                if match.unit is selected_unit:
-                    break
-                match_index += 1
-            self.matchcursor.index = match_index
+        if (self.filter.useregexp or self._similar_search) and self.filter.searchstring:
+            # The search itself does not use the filter, but highlighting and
+            # replacing check for the compiled expression
+            searchstring = self.filter.searchstring
+            if self._similar_search:
+                searchstring = re.escape(searchstring)
+            self.filter.re_search = re.compile(
+                u'(%s)' % (searchstring), get_search_flags(self.filter.ignorecase)
+            )
+        self._set_search_warning(None)
+        self.matches = []
+        self.matchcursor = Cursor(self.matches, [])
+        self._match_indexes = IndexSet()
+        self._match_units = array('i')
+        self._unit_matches = {}
+        self._search_truncated = False
+        self._regex_timed_out = False
+        self._search_iter = self._search_units(self._get_candidates())
+        if progressive:
+            self._search_id = gobject.idle_add(self._on_search_idle)
         else:
-            if self.ent_search.get_text():
-                self.ent_search.modify_base(gtk.STATE_NORMAL, gtk.gdk.color_parse(current_theme['warning_bg']))
-                self.ent_search.modify_text(gtk.STATE_NORMAL, gtk.gdk.color_parse('#fff'))
-            else:
-                self.ent_search.modify_base(gtk.STATE_NORMAL, self.default_base)
-                self.ent_search.modify_text(gtk.STATE_NORMAL, self.default_text)
-
-            self.filter.re_search = None
-            # Act like the "Default" mode...
-            self.storecursor.indices = self.storecursor.model.stats['total']
-        self._highlight_matches()
-
-        curpos = self.ent_search.props.cursor_position
-        def grabfocus():
-            self.ent_search.grab_focus()
-            self.ent_search.set_position(curpos)
-            return False
-        gobject.idle_add(grabfocus)
+            self._finish_search()
 
     def unselected(self):
         # TODO: Unhightlight the previously selected unit
@@ -250,7 +279,12 @@ class SearchMode(BaseMode):
             self.controller.main_controller.unit_controller.disconnect(self._unit_modified_id)
             self._unit_modified_id = 0
 
+        self._cancel_search()
+        self._search_options = None
         self.matches = []
+        self._match_units = array('i')
+        self._unit_matches = {}
+        self._previous_search = None
 
     def _add_widgets(self):
         table = self.controller.view.mode_box
@@ -260,6 +294,7 @@ class SearchMode(BaseMode):
         table.attach(self.btn_search, 3, 4, 0, 1, xoptions=xoptions)
         table.attach(self.chk_casesensitive, 4, 5, 0, 1, xoptions=xoptions)
         table.attach(self.chk_regex, 5, 6, 0, 1, xoptions=xoptions)
+        table.attach(self.chk_similar, 6, 7, 0, 1, xoptions=xoptions)
 
         table.attach(self.lbl_replace, 1, 2, 1, 2, xoptions=xoptions)
         table.attach(self.ent_replace, 2, 3, 1, 2, xoptions=xoptions)
@@ -268,6 +303,287 @@ class SearchMode(BaseMode):
 
         table.show_all()
 
+    def _cancel_search(self):
+        if self._search_id:
+            gobject.source_remove(self._search_id)
+            self._search_id = 0
+        if self._research_id:
+            gobject.source_remove(self._research_id)
+            self._research_id = 0
+        if (self._search_iter is not None or self._research_jobs) and self.filter.useregexp:
+            # Don't wait for an expression that might never finish
+            self._regex_searcher.kill()
+        self._research_jobs = []
+        self._search_iter = None
+        self._search_pos = -1
+        self._similar_found = []
+
+    def _finish_search(self):
+        """Search the rest of the units of the running search (if any)
+            right away."""
+        if self._search_id:
+            gobject.source_remove(self._search_id)
+            self._search_id = 0
+        if self._search_iter is not None:
+            for _chunk in self._search_iter:
+                pass
+
+    def _search_units(self, candidates):
+        """Search the given units (or all units) with C{self.filter}, one
+            chunk of units at a time, yielding after every chunk."""
+        store_units = self.storecursor.model.get_units()
+        if not self.filter.searchstring:
+            candidates = IndexSet()
+        elif candidates is None:
+            candidates = IndexSet.range(len(store_units))
+        chunk_size = self.SEARCH_CHUNK_SIZE
+        deadline = time.time() + self.REGEX_TIME_BUDGET
+        # Similar strings are only shown once all of them are found, so that
+        # they can be ranked. Until then, they are kept as (unit index, match)
+        # tuples in self._similar_found.
+        self._similar_found = []
+        for start in xrange(0, len(candidates), chunk_size):
+            chunk = candidates[start:start+chunk_size]
+            units = [store_units[i] for i in chunk]
+            if self.filter.useregexp:
+                pending = self._search_regex(units)
+                while not pending.ready() and time.time() < deadline and not self._regex_timed_out:
+                    yield None
+                    pending.wait(self.REGEX_POLL_INTERVAL)
+                if not pending.ready():
+                    if not self._regex_timed_out:
+                        self._stop_regex_search()
+                    break
+                matches, indexes = self._make_matches(units, pending.get())
+            elif self._similar_search:
+                matches, _indexes = self._get_similar_matches(units)
+                unit_indexes = dict([(id(unit), index) for index, unit in zip(chunk, units)])
+                self._similar_found.extend([(unit_indexes[id(match.unit)], match) for match in matches])
+                matches = None
+                if len(self._similar_found) > self.MAX_RESULTS:
+                    logging.info('Stopped search after %d matches' % (len(self._similar_found)))
+                    self._search_truncated = True
+                    break
+            else:
+                matches, indexes = self.filter.getmatches(units)
+            self._search_pos = chunk[-1]
+            if matches:
+                self._add_matches(matches, [chunk[i] for i in indexes])
+                if len(self.matches) > self.MAX_RESULTS:
+                    logging.info('Stopped search after %d matches' % (len(self.matches)))
+                    self._search_truncated = True
+                    break
+            yield None
+        if self._similar_found:
+            found, self._similar_found = self._similar_found, []
+            self._add_matches(
+                self._rank_similar_matches([match for _index, match in found]),
+                [index for index, _match in found]
+            )
+        self._search_iter = None
+        self._search_id = 0
+        self._search_pos = -1
+        self._on_search_finished()
+
+    def _add_matches(self, matches, indexes):
+        """Show the matches found in a chunk of units. The first of them is
+            selected straight away."""
+        first_matches = not self.matches
+        get_unit_index = self.storecursor.model.get_unit_index
+        self.matches.extend(matches)
+        self._match_units.extend([get_unit_index(match.unit) for match in matches])
+        self._index_matches(matches)
+        self.matchcursor.indices = IndexSet.range(len(self.matches))
+        for index in indexes:
+            self._match_indexes.add(index)
+        self.storecursor.indices = self._match_indexes
+
+        if first_matches:
+            self._set_search_found(True)
+            # Select initial match for in the current unit.
+            match_index = 0
+            selected_unit = self.storecursor.model[self.storecursor.index]
+            for match in self.matches:
+                if match.unit is selected_unit:
+                    break
+                match_index += 1
+            self.matchcursor.index = match_index
+        self._highlight_matches()
+
+    def _get_similar_matches(self, units):
+        """Find the strings in C{units} that are similar to the search
+            string, like C{GrepFilter.getmatches()} finds the strings that
+            contain it."""
+        results = find_similar(
+            self.filter.searchstring,
+            [get_unit_strings(unit) for unit in units],
+            self.MIN_SIMILARITY,
+            self.filter.ignorecase
+        )
+        return self._make_matches(units, results)
+
+    def _rank_similar_matches(self, matches):
+        """Sort the matches of a "similar to" search, most similar first."""
+        searchstring = self.filter.searchstring
+        ignorecase = self.filter.ignorecase
+        scored = [
+            (-get_similarity(searchstring, match.get_getter()(), ignorecase), i, match)
+            for i, match in enumerate(matches)
+        ]
+        scored.sort()
+        return [match for _score, _i, match in scored]
+
+    def _make_matches(self, units, results):
+        """Turn the results of a L{RegexSearcher} (or L{find_similar()})
+            search of C{units} into the C{(matches, indexes)} that
+            C{GrepFilter.getmatches()} would have returned."""
+        from translate.tools.pogrep import GrepMatch
+        matches = []
+        indexes = []
+        for i, part, part_n, start, end in results:
+            matches.append(GrepMatch(units[i], part=part, part_n=part_n, start=start, end=end))
+            if not indexes or indexes[-1] != i:
+                indexes.append(i)
+        return matches, indexes
+
+    def _get_search_options(self):
+        return (
+            self.ent_search.get_text(), self.chk_casesensitive.get_active(),
+            self.chk_regex.get_active(), self.chk_similar.get_active()
+        )
+
+    def _index_matches(self, matches):
+        """Add C{matches} to C{self._unit_matches}, which groups the matches
+            by unit (C{id()}), part and part number."""
+        for match in matches:
+            parts = self._unit_matches.setdefault(id(match.unit), {})
+            parts.setdefault((match.part, match.part_n), []).append(match)
+
+    def _research_units(self, units):
+        """Search C{units} again after they changed, and replace their
+            matches in C{self.matches} with the new ones. All units are
+            searched in one go, and the matches are updated once."""
+        if self.filter is None or not self.filter.searchstring:
+            return
+        # The units might match searches that the previous results exclude
+        self._previous_search = None
+        get_unit_index = self.storecursor.model.get_unit_index
+        changed = []
+        for unit in units:
+            try:
+                index = get_unit_index(unit)
+            except ValueError:
+                continue
+            if self._search_iter is not None and index > self._search_pos:
+                continue # The running search will still get to it
+            changed.append((index, unit))
+        if not changed:
+            return
+        changed.sort(key=itemgetter(0))
+        units = [unit for _index, unit in changed]
+
+        if self.filter.useregexp:
+            if self._regex_timed_out:
+                # This expression already took too long once: don't make
+                # every keystroke wait for it
+                return
+            # Search in the worker process, and pick up the result later
+            deadline = time.time() + self.REGEX_TIME_BUDGET
+            self._research_jobs.append((units, self._search_regex(units), deadline))
+            if not self._research_id:
+                self._research_id = gobject.timeout_add(
+                    int(self.REGEX_POLL_INTERVAL * 1000), self._on_research_timer
+                )
+            return
+        if self._similar_search:
+            matches, _indexes = self._get_similar_matches(units)
+            if self._search_iter is not None:
+                # The matches found so far are not shown yet
+                changed_indexes = set([index for index, _unit in changed])
+                unit_indexes = dict([(id(unit), index) for index, unit in changed])
+                self._similar_found = [
+                    (index, match) for index, match in self._similar_found
+                    if index not in changed_indexes
+                ] + [(unit_indexes[id(match.unit)], match) for match in matches]
+                return
+        else:
+            matches, _indexes = self.filter.getmatches(units)
+        self._replace_matches(changed, matches)
+
+    def _replace_matches(self, changed, matches):
+        """Replace all matches of the units in C{changed} (a list of
+            C{(index, unit)} tuples) with C{matches}, and update the match
+            cursor once."""
+        changed_indexes = set([index for index, _unit in changed])
+        unit_indexes = dict([(id(unit), index) for index, unit in changed])
+        new = [(unit_indexes[id(match.unit)], match) for match in matches]
+        current = izip(self._match_units, self.matches)
+        if self._similar_search:
+            # The matches are ranked, not sorted by unit: the new matches of a
+            # unit take the place of its first old match
+            new_by_unit = {}
+            for index, match in new:
+                new_by_unit.setdefault(index, []).append(match)
+            merged = []
+            for index, match in current:
+                if index not in changed_indexes:
+                    merged.append((index, match))
+                elif index in new_by_unit:
+                    merged.extend([(index, new_match) for new_match in new_by_unit.pop(index)])
+            for index in sorted(new_by_unit):
+                merged.extend([(index, new_match) for new_match in new_by_unit[index]])
+        else:
+            merged = [(index, match) for index, match in current if index not in changed_indexes]
+            merged.extend(new)
+            # The sort is stable, so the matches of a unit stay in order
+            merged.sort(key=itemgetter(0))
+
+        # The match cursor refers to this list
+        self.matches[:] = [match for _index, match in merged]
+        self._match_units = array('i', [index for index, _match in merged])
+        for _index, unit in changed:
+            self._unit_matches.pop(id(unit), None)
+        self._index_matches(matches)
+        for index in changed_indexes:
+            self._match_indexes.discard(index)
+        for index, _match in new:
+            self._match_indexes.add(index)
+        self.matchcursor.indices = IndexSet.range(len(self.matches))
+
+    def _search_regex(self, units):
+        """Start searching C{units} for the current regular expression in
+            the worker process."""
+        return self._regex_searcher.search(
+            self.filter.searchstring,
+            get_search_flags(self.filter.ignorecase),
+            [get_unit_strings(unit) for unit in units]
+        )
+
+    def _stop_regex_search(self):
+        """Kill a regular expression search that ran out of time, and warn
+            that the matches found so far are all there is."""
+        self._regex_searcher.kill()
+        self._regex_timed_out = True
+        self._research_jobs = []
+        logging.info('Stopped regular expression search after %.1f seconds' % (self.REGEX_TIME_BUDGET))
+        self._set_search_warning(_('The search took too long and was stopped. Not all matches are shown.'))
+
+    def _set_search_warning(self, warning):
+        """Show C{warning} (or nothing, if it is C{None}) as the tooltip
+            of the search entry, in the warning colours."""
+        self.ent_search.set_tooltip_text(warning or u'')
+        if warning:
+            self.ent_search.modify_base(gtk.STATE_NORMAL, gtk.gdk.color_parse(current_theme['warning_bg']))
+            self.ent_search.modify_text(gtk.STATE_NORMAL, gtk.gdk.color_parse('#fff'))
+
+    def _set_search_found(self, found):
+        if found or not self.ent_search.get_text():
+            self.ent_search.modify_base(gtk.STATE_NORMAL, self.default_base)
+            self.ent_search.modify_text(gtk.STATE_NORMAL, self.default_text)
+        else:
+            self.ent_search.modify_base(gtk.STATE_NORMAL, gtk.gdk.color_parse(current_theme['warning_bg']))
+            self.ent_search.modify_text(gtk.STATE_NORMAL, gtk.gdk.color_parse('#fff'))
+
     def _connect_highlighting(self):
         self._signalid_cursor_changed = self.storecursor.connect('cursor-changed', self._on_cursor_changed)
 
@@ -278,8 +594,57 @@ class SearchMode(BaseMode):
                 'refreshed', self._on_textbox_refreshed
             )
 
-    def _get_matches_for_unit(self, unit):
-        return [match for match in self.matches if match.unit is unit]
+    def _get_candidates(self):
+        """Use the results of the previous search or the store's text index
+            to find the units that could match the current search.
+            @returns: The sorted indexes of the units to search, or C{None}
+                to search all of them."""
+        searchstring = self.filter.searchstring
+        if not searchstring:
+            return None
+        model = self.storecursor.model
+        if self._similar_search:
+            candidates = None
+            similarity_index = model.get_similarity_index()
+            if similarity_index is not None:
+                candidates = similarity_index.get_candidates(searchstring, self.MIN_SIMILARITY)
+        else:
+            if self.filter.useregexp:
+                literals = get_literals(searchstring)
+            else:
+                literals = [searchstring]
+            candidates = self._get_refined_candidates()
+            text_index = model.get_text_index()
+            if candidates is None and text_index is not None:
+                # Until the index is built in the background, all units are
+                # searched
+                candidates = text_index.get_candidates(literals)
+        if candidates is None:
+            return None
+        # The current unit might have changes that were not indexed yet
+        if self.storecursor.index >= 0:
+            candidates = IndexSet(candidates)
+            candidates.add(self.storecursor.index)
+        return candidates
+
+    def _get_refined_candidates(self):
+        """If the current search can only match units that matched the
+            previous one (if a literal search string was only extended),
+            return the units that matched the previous search."""
+        if self._previous_search is None or self.filter.useregexp or self._similar_search:
+            return None
+        searchstring = self.filter.searchstring
+        prev_searchstring, prev_ignorecase, prev_indexes = self._previous_search
+        if not prev_searchstring:
+            return None
+        if prev_ignorecase:
+            # Case insensitive results include those of a case sensitive search
+            searchstring = searchstring.lower()
+        elif self.filter.ignorecase:
+            return None
+        if prev_searchstring not in searchstring:
+            return None
+        return prev_indexes
 
     def _get_unit_matches_dict(self):
         d = {}
@@ -315,12 +680,8 @@ class SearchMode(BaseMode):
             textbox_n = self.unitview.targets.index(textbox)
         else:
             raise ValueError('Could not find text box in sources or targets: %s' % (textbox))
-        return [
-            m for m in self.matches
-            if m.unit is self.unitview.unit and \
-                m.part == textbox.role and \
-                m.part_n == textbox_n
-        ]
+        parts = self._unit_matches.get(id(self.unitview.unit), {})
+        return parts.get((textbox.role, textbox_n), [])
 
     def _highlight_textbox_matches(self, textbox, select_match=True):
         buff = textbox.buffer
@@ -364,10 +725,11 @@ class SearchMode(BaseMode):
             return
 
         if getattr(self, 'matchcursor', None) is None:
-            self.update_search()
+            self.update_search(progressive=False)
             self._move_match(offset)
             return
 
+        self._finish_search()
         old_match_index = self.matchcursor.index
         if not self.matches or old_match_index != self.matchcursor.index:
             self.update_search()
@@ -377,17 +739,65 @@ class SearchMode(BaseMode):
         self.select_match(self.matches[self.matchcursor.index])
 
     def _replace_all(self):
-        self.controller.main_controller.undo_controller.record_start()
-
-        repl_str = self.ent_replace.get_text()
-        unit_matches = self._get_unit_matches_dict()
-
-        for unit, matches in unit_matches.items():
-            for match in reversed(matches):
-                self.replace_match(match, repl_str)
+        """Replace all matches in targets. Only the current unit is changed
+            through the editor: all other units are changed directly in the
+            store, with a single undo action for all of them."""
+        main_controller = self.controller.main_controller
+        store_controller = main_controller.store_controller
+        undo_controller = main_controller.undo_controller
+
+        repl_str = unicode(self.ent_replace.get_text())
+        current_unit = self.storecursor.deref()
+        current_matches = []
+        new_targets = []
+        for unit, matches in self._get_unit_matches_dict().items():
+            matches = [match for match in matches if match.part == 'target']
+            if not matches:
+                continue
+            if unit is current_unit:
+                current_matches = matches
+            else:
+                new_targets.append((unit, self._get_replaced_target(unit, matches, repl_str)))
+
+        undo_controller.record_start()
+        for match in reversed(current_matches):
+            self.replace_match(match, repl_str)
+        if new_targets:
+            old_targets = store_controller.set_unit_targets(new_targets)
+            def undo_replace_all(unit):
+                store_controller.set_unit_targets(old_targets)
+                if self.controller.current_mode is self:
+                    self._research_units([unit for unit, _target, _fuzzy in old_targets])
+            undo_controller.model.push({
+                'action': undo_replace_all,
+                'cursorpos': 0,
+                'desc': 'Replace all in %d units' % (len(old_targets)),
+                'targetn': 0,
+                'unit': current_unit or new_targets[0][0],
+            })
+        undo_controller.record_stop()
+
+        changed_units = [unit for unit, _target in new_targets]
+        if current_matches:
+            changed_units.append(current_unit)
+        self._research_units(changed_units)
+        self._highlight_matches()
 
-        self.controller.main_controller.undo_controller.record_stop()
-        self.update_search()
+    def _get_replaced_target(self, unit, matches, replace_str):
+        """Return the target of C{unit} with C{replace_str} instead of the
+            text of every match in C{matches}."""
+        if unit.hasplural():
+            strings = list(unit.target.strings)
+        else:
+            strings = [unicode(unit.target)]
+        # Replace from the end, so that the offsets of the other matches
+        # stay valid
+        for match in sorted(matches, key=lambda m: (m.part_n, m.start), reverse=True):
+            string = strings[match.part_n]
+            strings[match.part_n] = string[:match.start] + replace_str + string[match.end:]
+        if unit.hasplural():
+            return strings
+        return strings[0]
 
 
     # EVENT HANDLERS #
@@ -407,31 +817,93 @@ class SearchMode(BaseMode):
     def _on_replace_clicked(self, btn):
         if not self.storecursor or not self.ent_search.get_text() or not self.ent_replace.get_text():
             return
-        self.update_search()
+        if self._search_options == self._get_search_options():
+            self._finish_search()
+        else:
+            self.update_search(progressive=False)
 
         if self.chk_replace_all.get_active():
             self._replace_all()
         else:
             current_unit = self.storecursor.deref()
             # Find matches in the current unit.
-            unit_matches = [match for match in self.matches if match.unit is current_unit and match.part == 'target']
+            parts = self._unit_matches.get(id(current_unit), {})
+            unit_matches = []
+            for (part, part_n), matches in sorted(parts.items()):
+                if part == 'target':
+                    unit_matches.extend(matches)
             if len(unit_matches) > 0:
-                i = self.matches.index(unit_matches[0])
                 self.controller.main_controller.undo_controller.record_start()
                 self.replace_match(unit_matches[0], self.ent_replace.get_text())
                 self.controller.main_controller.undo_controller.record_stop()
-                # FIXME: The following is necessary to avoid an IndexError in
-                # del in certain circumstances. I'm not sure why it happens,
-                # but I suspect it has something to do with self.matches not
-                # being updated as expected after an undo.
-                if 0 <= i < len(self.matches):
-                    del self.matches[i]
+                self._research_units([current_unit])
             elif self.filter.re_search:
                 # If there is no current search, we don't want to advance and
                 # give the impression that we replaced something (bug 1636)
                 self.storecursor.move(1)
 
-        self.update_search()
+    def _on_research_timer(self):
+        """Pick up the results of regular expression searches of changed
+            units, in the order they were started."""
+        get_unit_index = self.storecursor.model.get_unit_index
+        while self._research_jobs:
+            units, pending, deadline = self._research_jobs[0]
+            if not pending.ready():
+                if time.time() < deadline:
+                    return True
+                self._stop_regex_search()
+                break
+            self._research_jobs.pop(0)
+            matches, _indexes = self._make_matches(units, pending.get())
+            changed = []
+            for unit in units:
+                try:
+                    changed.append((get_unit_index(unit), unit))
+                except ValueError:
+                    pass
+            if len(changed) < len(units):
+                # Drop the matches of units that are not in the store any more
+                present = set([id(unit) for _index, unit in changed])
+                matches = [match for match in matches if id(match.unit) in present]
+            self._replace_matches(changed, matches)
+            current_unit = self.unitview.unit
+            if [unit for unit in units if unit is current_unit] and self.filter.re_search is not None:
+                # Don't move the selection while the user is typing
+                for textbox in self.unitview.sources + self.unitview.targets:
+                    self._highlight_textbox_matches(textbox, select_match=False)
+        self._research_id = 0
+        return False
+
+    def _on_search_finished(self):
+        logging.debug('Search text: %s (%d matches)' % (self.ent_search.get_text(), len(self.matches)))
+        if self.filter.useregexp or self._similar_search or self._search_truncated:
+            # The matches of a truncated search can't narrow down the next one
+            self._previous_search = None
+        else:
+            self._previous_search = (self.filter.searchstring, self.filter.ignorecase, self._match_indexes)
+
+        if not self.matches:
+            self._set_search_found(False)
+            self.filter.re_search = None
+            # Act like the "Default" mode...
+            self.storecursor.indices = self.storecursor.model.stats['total']
+            self._highlight_matches()
+
+        curpos = self.ent_search.props.cursor_position
+        def grabfocus():
+            self.ent_search.grab_focus()
+            self.ent_search.set_position(curpos)
+            return False
+        gobject.idle_add(grabfocus)
+
+    def _on_search_idle(self):
+        if self._search_iter is None:
+            return False
+        try:
+            self._search_iter.next()
+        except StopIteration:
+            return False
+        return self._search_iter is not None
 
     def _on_search_clicked(self, btn):
         self._move_match(1)
@@ -449,6 +921,7 @@ class SearchMode(BaseMode):
         self._move_match(-1)
 
     def _on_search_text_changed(self, entry):
+        self._cancel_search()
         if self._search_timeout:
             gobject.source_remove(self._search_timeout)
             self._search_timeout = 0
@@ -476,12 +949,7 @@ class SearchMode(BaseMode):
         self._highlight_textbox_matches(textbox, select_match=False)
 
     def _on_unit_modified(self, unit_controller, current_unit):
-        unit_matches = self._get_matches_for_unit(current_unit)
-        for match in unit_matches:
-            if not self.filter.re_search.match(match.get_getter()()[match.start:match.end]):
-                logging.debug('Match to remove: %s' % (match))
-                self.matches.remove(match)
-                self.matchcursor.indices = range(len(self.matches))
+        self._research_units([current_unit])
 
     def _refresh_proxy(self, *args):
         self.update_search()
@@ -69,14 +69,10 @@ class WorkflowMode(BaseMode):
         if not self.storecursor or not self.storecursor.model:
             return
 
-        indices = []
-        for state in self.filter_states:
-            indices.extend(self.storecursor.model.stats['extended'][state])
-
+        model = self.storecursor.model
+        indices = model.select_units(any_of=self.filter_states)
         if not indices:
-            indices.extend(self.storecursor.model.stats['total'])
-        else:
-            indices.sort()
+            indices = model.stats['total']
 
         self.storecursor.indices = indices
 
@@ -90,7 +90,8 @@ class AutoCompletor(object):
 
             @type  units: list
             @param units: The translation units to collect words from.
-            """
+            @returns: Whether more words can be added (C{MAX_WORDS} was not
+                reached)."""
         for unit in units:
             target = unit.target
             if not target:
@@ -100,6 +101,7 @@ class AutoCompletor(object):
                 break
 
         self._update_word_list()
+        return len(self._word_freq) <= self.MAX_WORDS
 
     def autocomplete(self, word):
         for w in self._word_list:
@@ -217,6 +219,10 @@ class Plugin(BasePlugin):
     display_name = _('AutoCompletor')
     version = 0.1
 
+    UNIT_CHUNK_SIZE = 200
+    """The number of units to collect words from in one go while the main
+        loop is idle."""
+
     # INITIALIZERS #
     def __init__(self, internal_name, main_controller):
         self.internal_name = internal_name
@@ -227,6 +233,8 @@ class Plugin(BasePlugin):
     def _init_plugin(self):
         from virtaal.common import pan_app
         self.autocomp = AutoCompletor(self.main_controller)
+        self._collect_iter = None
+        self._collect_id = 0
 
         self._store_loaded_id = self.main_controller.store_controller.connect('store-loaded', self._on_store_loaded)
 
@@ -248,6 +256,7 @@ class Plugin(BasePlugin):
     # METHDOS #
     def destroy(self):
         """Remove all signal-connections."""
+        self._cancel_collecting()
         self.autocomp.clear_words()
         self.autocomp.clear_widgets()
         self.main_controller.store_controller.disconnect(self._store_loaded_id)
@@ -256,6 +265,24 @@ class Plugin(BasePlugin):
         if self._unitview_id:
             self.main_controller.unit_controller.view.disconnect(self._unitview_id)
 
+    def _cancel_collecting(self):
+        if self._collect_id:
+            gobject.source_remove(self._collect_id)
+            self._collect_id = 0
+        self._collect_iter = None
+
+    def _collect_words(self, store):
+        """Collect the words of the units of C{store} a chunk at a time,
+            yielding after every chunk, so that lazily loaded stores are not
+            parsed all at once."""
+        unit_count = len(store)
+        chunk_size = self.UNIT_CHUNK_SIZE
+        for start in xrange(0, unit_count, chunk_size):
+            units = [store.get_unit(i) for i in xrange(start, min(start + chunk_size, unit_count))]
+            if not self.autocomp.add_words_from_units(units):
+                return
+            yield None
+
 
     # EVENT HANDLERS #
     def _on_cursor_change(self, cursor):
@@ -273,8 +300,19 @@ class Plugin(BasePlugin):
             self.lastunit = cursor.deref()
         gobject.idle_add(add_widgets)
 
+    def _on_collect_idle(self):
+        try:
+            self._collect_iter.next()
+        except StopIteration:
+            self._collect_id = 0
+            self._collect_iter = None
+            return False
+        return True
+
     def _on_store_loaded(self, storecontroller):
-        self.autocomp.add_words_from_units(storecontroller.get_store().get_units())
+        self._cancel_collecting()
+        self._collect_iter = self._collect_words(storecontroller.get_store())
+        self._collect_id = gobject.idle_add(self._on_collect_idle, priority=gobject.PRIORITY_LOW)
 
         if hasattr(self, '_cursor_changed_id'):
             self.store_cursor.disconnect(self._cursor_changed_id)
@@ -34,6 +34,7 @@ class TMModel(remotetm.TMModel):
         "host" : "amagama.locamotion.org",
         "port" : "80",
     }
+    cache_ttl = 7 * 24 * 60 * 60
 
     def push_store(self, store_controller):
         pass
@@ -31,7 +31,7 @@ try:
 except ImportError:
     import json #available since Python 2.6
 
-from basetmmodel import BaseTMModel, unescape_html_entities
+from basetmmodel import BaseTMModel, cached_query, unescape_html_entities
 
 from virtaal.support.httpclient import HTTPClient, RESTRequest
 
@@ -47,6 +47,9 @@ class TMModel(BaseTMModel):
     default_config = {
         "appid" : "",
     }
+    cache_ttl = 30 * 24 * 60 * 60
+    synchronous = False
+    query_timeout = 30
 
     # INITIALISERS #
     def __init__(self, internal_name, controller):
@@ -69,31 +72,31 @@ class TMModel(BaseTMModel):
 
 
     # METHODS #
+    @cached_query
     def query(self, tmcontroller, unit):
         """Send the query to the web service. The response is handled by means
         of a call-back because it happens asynchronously."""
         pair = (self.source_lang, self.target_lang)
         if pair not in self.language_pairs:
+            self._emit_unanswered(unit.source)
             return
 
         query_str = unit.source
-        if self.cache.has_key(query_str):
-            self.emit('match-found', query_str, self.cache[query_str])
-        else:
-            values = {
-                'appId': self.appid,
-                'q': query_str,
-                'langpair': "%s|%s" % (self.source_lang, self.target_lang),
-                'markUnknown': "no",
-                'format': 'html',
-            }
-            req = RESTRequest(self.url_translate + "?" + urllib.urlencode(values), '', method='GET', \
-                    data=urllib.urlencode(''), headers=None)
-            self.client.add(req)
-            req.connect(
-                'http-success',
-                lambda req, response: self.got_translation(response, query_str)
-            )
+        values = {
+            'appId': self.appid,
+            'q': query_str,
+            'langpair': "%s|%s" % (self.source_lang, self.target_lang),
+            'markUnknown': "no",
+            'format': 'html',
+        }
+        req = RESTRequest(self.url_translate + "?" + urllib.urlencode(values), '', method='GET', \
+                data=urllib.urlencode(''), headers=None)
+        self.client.add(req)
+        req.connect(
+            'http-success',
+            lambda req, response: self.got_translation(response, query_str)
+        )
+        self._emit_empty_on_error(req, query_str)
 
     def got_language_pairs(self, val):
         """Handle the response from the web service to set up language pairs."""
@@ -110,6 +113,7 @@ class TMModel(BaseTMModel):
 
         if data['responseStatus'] != 200:
             logging.debug("Failed to translate '%s':\n%s", (query_str, data['responseDetails']))
+            self._emit_unanswered(query_str)
             return
 
         target = data['responseData']['translatedText']
@@ -124,6 +128,4 @@ class TMModel(BaseTMModel):
             #l10n: Try to keep this as short as possible. Feel free to transliterate in CJK languages for optimal vertical display.
             'tmsource': _('Apertium'),
         }
-        self.cache[query_str] = [match]
-
         self.emit('match-found', query_str, [match])
@@ -22,6 +22,7 @@ import os
 import gobject
 import htmlentitydefs
 import re
+from translate.lang.data import forceunicode
 
 from virtaal.models.basemodel import BaseModel
 from virtaal.common import pan_app
@@ -42,6 +43,34 @@ def unescape_html_entities(text):
             return unicode(entity, "iso-8859-1")
     return re.sub("&(#[0-9]+|\w+);", fixup, text)
 
+def cached_query(query):
+    """Decorate the C{query()} method of a TM model to answer queries from
+        the persistent suggestion cache (C{TMController.tmcache}) when it can.
+
+        The model's C{cache_ttl} says how long cached suggestions are valid.
+        Suggestions are added to the cache when the model emits them with
+        "match-found" (see L{BaseTMModel}), so the model itself does not have
+        to do anything else."""
+    def cached(self, tmcontroller, unit):
+        tmcache = self.controller.tmcache
+        if tmcache is not None:
+            matches = tmcache.get(
+                self.internal_name, self.source_lang, self.target_lang, unit.source, self.cache_ttl
+            )
+            if matches is not None:
+                self._emitting_cached = True
+                try:
+                    self.emit('match-found', unit.source, matches)
+                finally:
+                    self._emitting_cached = False
+                return
+        return query(self, tmcontroller, unit)
+    cached.__name__ = query.__name__
+    cached.__doc__ = query.__doc__
+    cached.is_cached = True
+    cached.uncached = query
+    return cached
+
 
 class BaseTMModel(BaseModel):
     """The base interface to be implemented by all TM backend models."""
@@ -60,6 +89,20 @@ class BaseTMModel(BaseModel):
     """A function that starts the configuration, if available."""
     default_config = {}
     """Default configuration shared by all TM model plug-ins."""
+    cache_ttl = 7 * 24 * 60 * 60
+    """How long (in seconds) the suggestions of a model with a
+        L{cached_query()} are kept in the persistent cache."""
+    batch_lookups = False
+    """Whether L{query_units()} and L{prefetch()} look up many units with one
+        request, instead of querying the back-end for every unit."""
+    synchronous = True
+    """Whether L{query()} emits its suggestions (if any) before it returns.
+        Models that answer later must also emit "match-found" with an empty
+        list when they have no suggestions or the query failed, so that
+        L{query_units()} callers know that there is nothing to wait for."""
+    query_timeout = 5
+    """How many seconds L{query_units()} callers wait for the answers of a
+        model. Models that use web services should allow more."""
 
     # INITIALIZERS #
     def __init__(self, controller):
@@ -73,9 +116,10 @@ class BaseTMModel(BaseModel):
         self._connect_ids = []
         self._connect_ids.append((self.controller.connect('start-query', self.query), self.controller))
 
-        #static suggestion cache for slow TM queries
-        #TODO: cache invalidation, maybe decorate query to automate cache handling?
-        self.cache = {}
+        self._emitting_cached = False
+        self._emitting_unanswered = False
+        if getattr(self.query, 'is_cached', False):
+            self._connect_ids.append((self.connect('match-found', self._on_match_found), self))
 
         self.source_lang = None
         self.target_lang = None
@@ -92,6 +136,51 @@ class BaseTMModel(BaseModel):
         #disconnect all signals
         [widget.disconnect(cid) for (cid, widget) in self._connect_ids]
 
+    def get_uncached_units(self, units):
+        """Return the units in C{units} for which no suggestions from this
+            model are in the persistent cache. This is empty for models
+            without a L{cached_query()}, since there is no point in looking up
+            suggestions in advance for them."""
+        tmcache = self.controller.tmcache
+        if tmcache is None or not getattr(self.query, 'is_cached', False):
+            return []
+        return [
+            unit for unit in units if not tmcache.contains(
+                self.internal_name, self.source_lang, self.target_lang, unit.source, self.cache_ttl
+            )
+        ]
+
+    def prefetch(self, units):
+        """Query the back-end for C{units} in the background, only to add
+            their suggestions to the persistent cache.
+            @returns: The sources that were looked up (nothing for units with
+                cached suggestions)."""
+        units = self.get_uncached_units(units)
+        for unit in units:
+            self.query.uncached(self, self.controller, unit)
+        return [unit.source for unit in units]
+
+    def query_units(self, units):
+        """Query the back-end for all C{units}, like L{query()} does for a
+            single unit: the suggestions for every unit are emitted with
+            "match-found", and an empty list for units without suggestions."""
+        if not self.synchronous:
+            for unit in units:
+                self.query(self.controller, unit)
+            return
+        answered = set()
+        def on_match_found(model, query_str, matches):
+            answered.add(forceunicode(query_str))
+        signal_id = self.connect('match-found', on_match_found)
+        try:
+            for unit in units:
+                self.query(self.controller, unit)
+                source = forceunicode(unit.source)
+                if source not in answered:
+                    self.emit('match-found', source, [])
+        finally:
+            self.disconnect(signal_id)
+
     def query(self, tmcontroller, unit):
         """Attempt to give suggestions applicable to query_str.
 
@@ -99,6 +188,12 @@ class BaseTMModel(BaseModel):
         suggested translations for unit, emit "match-found" on success."""
         pass
 
+    def clear_cache(self):
+        """Forget this model's suggestions in the persistent cache, for
+            example when the TM it uses changed."""
+        if self.controller.tmcache is not None:
+            self.controller.tmcache.clear(self.internal_name)
+
     def load_config(self):
         """load TM backend config from default location"""
         self.config = {}
@@ -121,17 +216,43 @@ class BaseTMModel(BaseModel):
         target-lang-changed event handlers"""
         pass
 
+    def _emit_empty_on_error(self, request, query_str):
+        """Emit an empty list of suggestions for C{query_str} if the HTTP
+            C{request} fails (see L{synchronous})."""
+        def on_error(request, result):
+            self._emit_unanswered(query_str)
+        for signal in ('http-client-error', 'http-server-error', 'http-failed'):
+            request.connect(signal, on_error)
+
+    def _emit_unanswered(self, query_str):
+        """Emit an empty list of suggestions for C{query_str} because the
+            back-end could not be asked (for example because of an error, or
+            because it doesn't support the languages). Unlike a real answer
+            without suggestions, this is not cached."""
+        self._emitting_unanswered = True
+        try:
+            self.emit('match-found', query_str, [])
+        finally:
+            self._emitting_unanswered = False
+
     def _set_source_lang(self, controller, language):
         """private method for baseline handling of source language
         change events"""
         if (language != self.source_lang):
             self.source_lang = language
-            self.cache = {}
             self.set_source_lang(language)
 
     def _set_target_lang(self, controller, language):
         """private method for baseline handling of target language change events"""
         if (language != self.target_lang):
             self.target_lang = language
-            self.cache = {}
             self.set_target_lang(language)
+
+
+    # EVENT HANDLERS #
+    def _on_match_found(self, model, query_str, matches):
+        if self._emitting_cached or self._emitting_unanswered or self.controller.tmcache is None:
+            return
+        # An empty list is cached too, so that units without suggestions are
+        # not looked up again and again (see TMCache)
+        self.controller.tmcache.put(self.internal_name, self.source_lang, self.target_lang, query_str, matches)
@@ -18,6 +18,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, see <http://www.gnu.org/licenses/>.
 
+import gobject
 import re
 import logging
 from translate.search import match
@@ -33,12 +34,18 @@ class TMModel(BaseTMModel):
     description = _('Translated units from the currently open file')
 
     default_config = { 'max_length': 1000 }
+    UNIT_CHUNK_SIZE = 200
+    """The number of units to add to the matcher in one go while the main
+        loop is idle."""
 
     # INITIALIZERS #
     def __init__(self, internal_name, controller):
         super(TMModel, self).__init__(controller)
 
         self.matcher = None
+        self.cache = {}
+        self._extend_iter = None
+        self._extend_id = 0
         self.internal_name = internal_name
         self.load_config()
 
@@ -56,20 +63,25 @@ class TMModel(BaseTMModel):
 
 
     # METHODS #
+    def destroy(self):
+        self._cancel_extending()
+        super(TMModel, self).destroy()
+
     def recreate_matcher(self, storecontroller):
-        store = storecontroller.get_store()._trans_store
+        """Add the translated units of the newly loaded store to the matcher,
+            a chunk of units at a time while the main loop is idle, so that
+            lazily loaded stores are not parsed all at once."""
         if self.matcher is None:
             options = {
                 'max_length': int(self.config['max_length']),
                 'max_candidates': self.controller.max_matches,
                 'min_similarity': self.controller.min_quality
             }
-            self.matcher = match.matcher(store, **options)
-        else:
-            for unit in store.units:
-                if unit.istranslatable() and unit.istranslated():
-                    self.matcher.extendtm(unit)
+            self.matcher = match.matcher([], **options)
         self.cache = {}
+        self._cancel_extending()
+        self._extend_iter = self._extend_matcher(storecontroller.get_store())
+        self._extend_id = gobject.idle_add(self._on_extend_idle, priority=gobject.PRIORITY_LOW)
 
     def query(self, tmcontroller, unit):
         query_str = unit.source
@@ -82,6 +94,25 @@ class TMModel(BaseTMModel):
                 self.cache[query_str] = matches
                 self.emit('match-found', query_str, self.cache[query_str])
 
+    def _cancel_extending(self):
+        if self._extend_id:
+            gobject.source_remove(self._extend_id)
+            self._extend_id = 0
+        self._extend_iter = None
+
+    def _extend_matcher(self, store):
+        """Add the translated units of C{store} to the matcher a chunk at a
+            time, yielding after every chunk."""
+        unit_count = len(store)
+        chunk_size = self.UNIT_CHUNK_SIZE
+        for start in xrange(0, unit_count, chunk_size):
+            units = [store.get_unit(i) for i in xrange(start, min(start + chunk_size, unit_count))]
+            units = [unit for unit in units if unit.istranslatable() and unit.istranslated()]
+            if units:
+                self.matcher.extendtm(units)
+                self.cache = {}
+            yield None
+
     def _check_other_units(self, unit):
         matches = []
 
@@ -143,6 +174,15 @@ class TMModel(BaseTMModel):
 
 
     # EVENT HANDLERS #
+    def _on_extend_idle(self):
+        try:
+            self._extend_iter.next()
+        except StopIteration:
+            self._extend_id = 0
+            self._extend_iter = None
+            return False
+        return True
+
     def _on_unit_modified(self, widget, new_unit, modified):
         """Add the new translation unit to the TM."""
         if modified and new_unit.istranslated():
@@ -27,7 +27,7 @@ try:
 except ImportError:
     import json #available since Python 2.6
 
-from basetmmodel import BaseTMModel, unescape_html_entities
+from basetmmodel import BaseTMModel, cached_query, unescape_html_entities
 from virtaal.support.httpclient import HTTPClient, RESTRequest
 
 # We should ideally be obtaining a list from them, or use their API to see if
@@ -113,6 +113,9 @@ class TMModel(BaseTMModel):
     description = _("Unreviewed machine translations from Google's translation service")
 
     translate_url = "http://ajax.googleapis.com/ajax/services/language/translate?v=1.0&q=%(message)s&langpair=%(from)s%%7C%(to)s"
+    cache_ttl = 30 * 24 * 60 * 60
+    synchronous = False
+    query_timeout = 30
 
     # INITIALIZERS #
     def __init__(self, internal_name, controller):
@@ -121,6 +124,7 @@ class TMModel(BaseTMModel):
         self.client = HTTPClient()
 
     # METHODS #
+    @cached_query
     def query(self, tmcontroller, unit):
         query_str = unit.source
         # Google's Terms of Service says no more than 5000 characters
@@ -129,25 +133,24 @@ class TMModel(BaseTMModel):
         target_lang = code_translation.get(self.target_lang, self.target_lang).replace('_', '-')
         if source_lang not in _languages or target_lang not in _languages:
             logging.debug('language pair not supported: %s => %s' % (source_lang, target_lang))
+            self._emit_unanswered(query_str)
             return
 
-        if self.cache.has_key(query_str):
-            self.emit('match-found', query_str, self.cache[query_str])
-        else:
-            real_url = self.translate_url % {
-                'message': urllib.quote_plus(query_str.encode('utf-8')),
-                'from':    source_lang,
-                'to':      target_lang,
-            }
-
-            req = RESTRequest(real_url, '', method='GET', data=urllib.urlencode(''), headers=None)
-            self.client.add(req)
-            # Google's Terms of Service says we need a proper HTTP referrer
-            req.curl.setopt(pycurl.REFERER, virtaal_referrer)
-            req.connect(
-                'http-success',
-                lambda req, response: self.got_translation(response, query_str)
-            )
+        real_url = self.translate_url % {
+            'message': urllib.quote_plus(query_str.encode('utf-8')),
+            'from':    source_lang,
+            'to':      target_lang,
+        }
+
+        req = RESTRequest(real_url, '', method='GET', data=urllib.urlencode(''), headers=None)
+        self.client.add(req)
+        # Google's Terms of Service says we need a proper HTTP referrer
+        req.curl.setopt(pycurl.REFERER, virtaal_referrer)
+        req.connect(
+            'http-success',
+            lambda req, response: self.got_translation(response, query_str)
+        )
+        self._emit_empty_on_error(req, query_str)
 
     def got_translation(self, val, query_str):
         """Handle the response from the web service now that it came in."""
@@ -155,6 +158,7 @@ class TMModel(BaseTMModel):
 
         if data['responseStatus'] != 200:
             logging.debug("Failed to translate '%s':\n%s" % (query_str, data['responseDetails']))
+            self._emit_unanswered(query_str)
             return
 
         target_unescaped = unescape_html_entities(data['responseData']['translatedText'])
@@ -166,5 +170,4 @@ class TMModel(BaseTMModel):
             #l10n: Try to keep this as short as possible. Feel free to transliterate.
             'tmsource': _('Google')
         }
-        self.cache[query_str] = [match]
         self.emit('match-found', query_str, [match])
@@ -38,6 +38,7 @@ class TMModel(remotetm.TMModel):
     description = _('Previous translations you have made')
     #l10n: Try to keep this as short as possible.
     shortname = _('Local TM')
+    query_timeout = 5
 
     default_config = {
         "tmserver_bind" : "localhost",
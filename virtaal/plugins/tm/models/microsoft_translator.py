@@ -23,7 +23,7 @@ Machine Translations."""
 
 import urllib
 
-from basetmmodel import BaseTMModel
+from basetmmodel import BaseTMModel, cached_query
 
 from virtaal.support.httpclient import HTTPClient, RESTRequest
 
@@ -43,6 +43,9 @@ class TMModel(BaseTMModel):
         "url" : "http://api.microsofttranslator.com/V1/Http.svc",
         "appid" : "7286B45B8C4816BDF75DC007C1952DDC11C646C1",
     }
+    cache_ttl = 30 * 24 * 60 * 60
+    synchronous = False
+    query_timeout = 30
 
     # INITIALISERS #
     def __init__(self, internal_name, controller):
@@ -65,29 +68,29 @@ class TMModel(BaseTMModel):
 
 
     # METHODS #
+    @cached_query
     def query(self, tmcontroller, unit):
         """Send the query to the web service. The response is handled by means
         of a call-back because it happens asynchronously."""
         if self.source_lang not in self.languages or self.target_lang not in self.languages:
+            self._emit_unanswered(unit.source)
             return
 
         query_str = unit.source
-        if self.cache.has_key(query_str):
-            self.emit('match-found', query_str, self.cache[query_str])
-        else:
-            values = {
-                'appId': self.appid,
-                'text': query_str,
-                'from': self.source_lang,
-                'to': self.target_lang
-            }
-            req = RESTRequest(self.url_translate + "?" + urllib.urlencode(values), '', method='GET', \
-                    data=urllib.urlencode(''), headers=None)
-            self.client.add(req)
-            req.connect(
-                'http-success',
-                lambda req, response: self.got_translation(response, query_str)
-            )
+        values = {
+            'appId': self.appid,
+            'text': query_str,
+            'from': self.source_lang,
+            'to': self.target_lang
+        }
+        req = RESTRequest(self.url_translate + "?" + urllib.urlencode(values), '', method='GET', \
+                data=urllib.urlencode(''), headers=None)
+        self.client.add(req)
+        req.connect(
+            'http-success',
+            lambda req, response: self.got_translation(response, query_str)
+        )
+        self._emit_empty_on_error(req, query_str)
 
     def got_languages(self, val):
         """Handle the response from the web service to set up language pairs."""
@@ -105,6 +108,4 @@ class TMModel(BaseTMModel):
             #l10n: Try to keep this as short as possible. Feel free to transliterate in CJK languages for optimal vertical display.
             'tmsource': _('Microsoft'),
         }
-        self.cache[query_str] = [match]
-
         self.emit('match-found', query_str, [match])
@@ -22,7 +22,7 @@ from virtaal.support import opentranclient
 
 from virtaal.common import pan_app
 
-from basetmmodel import BaseTMModel
+from basetmmodel import BaseTMModel, cached_query
 
 # Some names are a bit too long, so let's "translate" them to something shorter
 new_names = {
@@ -36,6 +36,8 @@ class TMModel(BaseTMModel):
     __gtype_name__ = 'OpenTranTMModel'
     display_name = _('Open-Tran.eu')
     description = _('Previous translations for Free and Open Source Software')
+    synchronous = False
+    query_timeout = 30
 
     # INITIALIZERS #
     def __init__(self, internal_name, controller):
@@ -57,12 +59,14 @@ class TMModel(BaseTMModel):
     def set_target_lang(self, language):
         self.tmclient.set_target_lang(language)
 
+    @cached_query
     def query(self, tmcontroller, unit):
-        query_str = unit.source
-        if self.cache.has_key(query_str):
-            self.emit('match-found', query_str, self.cache[query_str])
+        request = self.tmclient.translate_unit(unit.source, self._handle_matches)
+        if request is None:
+            # The languages are not supported (or not known yet)
+            self._emit_unanswered(unit.source)
         else:
-            self.tmclient.translate_unit(query_str, self._handle_matches)
+            self._emit_empty_on_error(request, unit.source)
 
     def _handle_matches(self, widget, query_str, matches):
         """Handle the matches when returned from self.tmclient."""
@@ -77,5 +81,4 @@ class TMModel(BaseTMModel):
                 match['tmsource'] = _('OpenTran') + '\n' + match['tmsource']
             else:
                 match['tmsource'] = _('OpenTran')
-        self.cache[query_str] = matches
         self.emit('match-found', query_str, matches)
@@ -20,7 +20,7 @@
 
 from virtaal.support import tmclient
 
-from basetmmodel import BaseTMModel
+from basetmmodel import BaseTMModel, cached_query
 
 
 class TMModel(BaseTMModel):
@@ -36,6 +36,10 @@ class TMModel(BaseTMModel):
         "host" : "localhost",
         "port" : "55555",
     }
+    cache_ttl = 24 * 60 * 60
+    batch_lookups = True
+    synchronous = False
+    query_timeout = 30
 
     # INITIALIZERS #
     def __init__(self, internal_name, controller):
@@ -49,26 +53,50 @@ class TMModel(BaseTMModel):
 
 
     # METHODS #
+    @cached_query
     def query(self, tmcontroller, unit):
         # TODO: Figure out languages
-        query_str = unit.source
-        if query_str in self.cache:
-            _cached = self.cache[query_str]
-            if _cached:
-                # Only emit if we actually have something to offer
-                self.emit('match-found', query_str, _cached)
+        request = self.tmclient.translate_unit(unit.source, self.source_lang, self.target_lang, self._handle_matches)
+        self._emit_empty_on_error(request, unit.source)
+
+    def query_units(self, units):
+        """Query the server for all C{units} that don't have cached
+            suggestions with as few requests as the server allows (see
+            C{TMClient.translate_units()})."""
+        if self.controller.tmcache is None:
+            uncached = list(units)
         else:
-            self.tmclient.translate_unit(query_str, self.source_lang, self.target_lang, self._handle_matches)
+            uncached = self.get_uncached_units(units)
+            uncached_ids = set([id(unit) for unit in uncached])
+            for unit in units:
+                if id(unit) not in uncached_ids:
+                    self.query(self.controller, unit)
+        if uncached:
+            self.tmclient.translate_units(
+                [unit.source for unit in uncached], self.source_lang, self.target_lang, self._handle_matches
+            )
+
+    def prefetch(self, units):
+        """Look up all uncached C{units} with as few requests as the server
+            allows (see C{TMClient.translate_units()})."""
+        sources = [unit.source for unit in self.get_uncached_units(units)]
+        if sources:
+            self.tmclient.translate_units(sources, self.source_lang, self.target_lang, self._handle_matches)
+        return sources
 
     def _handle_matches(self, widget, query_str, matches):
         """Handle the matches when returned from self.tmclient."""
-        self.cache[query_str] = matches or None # None instead of empty list
-        if matches:
-            for match in matches:
-                match['tmsource'] = self.shortname
-                if not isinstance(match['target'], unicode):
-                    match['target'] = unicode(match['target'], 'utf-8')
-            self.emit('match-found', query_str, matches)
+        if matches is None:
+            # The server could not be asked
+            self._emit_unanswered(query_str)
+            return
+        for match in matches:
+            match['tmsource'] = self.shortname
+            if not isinstance(match['target'], unicode):
+                match['target'] = unicode(match['target'], 'utf-8')
+        # Also emit if nothing was found, so that those waiting for an answer
+        # (prefetching and pre-translation) know that there is none
+        self.emit('match-found', query_str, matches)
 
     def push_store(self, store_controller):
         """Add units in store to TM database on save."""
@@ -79,12 +107,12 @@ class TMModel(BaseTMModel):
         #FIXME: do we get source and target langs from
         #store_controller or from tm state?
         self.tmclient.add_store(store_controller.store.get_filename(), units, self.source_lang, self.target_lang)
-        self.cache = {}
+        self.clear_cache()
 
     def upload_store(self, store_controller):
         """Upload store to TM server."""
         self.tmclient.upload_store(store_controller.store._trans_store, self.source_lang, self.target_lang)
-        self.cache = {}
+        self.clear_cache()
 
 
 def unit2dict(unit):
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Find the best suggestion for many units at once, by querying all TM
+back-ends in the background."""
+
+import gobject
+import logging
+import time
+from translate.lang.data import forceunicode, normalize
+
+from virtaal.support.tmclient import TMClient
+
+__all__ = ['Pretranslator', 'count_by_band', 'get_quality_bands']
+
+
+def get_quality_bands(min_quality, limits=(100, 95, 85, 75)):
+    """Return the C{(lowest, highest)} quality of every band in a leverage
+        report, from the best matches to the worst ones still above
+        C{min_quality}."""
+    limits = [limit for limit in limits if limit > min_quality] + [min_quality]
+    bands = []
+    highest = 100
+    for limit in limits:
+        if limit > highest:
+            continue
+        bands.append((limit, highest))
+        highest = limit - 1
+    return bands
+
+def count_by_band(matches, min_quality):
+    """Count how many of C{matches} fall in every band of
+        L{get_quality_bands()}.
+        @returns: A list of C{((lowest, highest), count)} pairs, and the
+            number of matches without a quality (machine translations)."""
+    bands = get_quality_bands(min_quality)
+    counts = [0] * len(bands)
+    machine = 0
+    for match in matches:
+        quality = int(match.get('quality') or 0)
+        if not quality:
+            machine += 1
+            continue
+        for i, (lowest, highest) in enumerate(bands):
+            if quality >= lowest:
+                counts[i] += 1
+                break
+    return zip(bands, counts), machine
+
+
+class Pretranslator(object):
+    """Queries all TM back-ends for a list of units, and keeps the best
+        suggestion for every unit.
+
+        Matches with a quality of at least C{min_quality} are preferred.
+        Matches without a quality (machine translations) are only used for
+        units that have no such match."""
+
+    MAX_REQUESTS = 4
+    """The maximum number of requests to wait for from every back-end."""
+    INTERVAL = 100
+    """The number of milliseconds between checks for requests that timed
+        out (after the C{query_timeout} of their back-end)."""
+    TIME_SLICE = 0.05
+    """The number of seconds that querying back-ends may take at a time, so
+        that back-ends that answer straight away don't block the main loop
+        for the whole file."""
+
+    # INITIALIZERS #
+    def __init__(self, models, units, min_quality, callback):
+        """Constructor.
+            @param models: The TM models to query.
+            @param units: The units to find suggestions for.
+            @param callback: Called as C{callback(pretranslator)} when all
+                back-ends answered (or timed out)."""
+        self.min_quality = min_quality
+        self.callback = callback
+        self.best_matches = {}
+        """The best match for every (normalized) source."""
+        self.unit_count = len(units)
+
+        self._units = {}
+        for unit in units:
+            self._units.setdefault(normalize(forceunicode(unit.source)), []).append(unit)
+        # Every source only has to be looked up once
+        unique_units = [same[0] for same in self._units.itervalues()]
+
+        self._queues = {}
+        self._pending = {}
+        self._signal_ids = []
+        self._filling = set()
+        for model in models:
+            if model.batch_lookups:
+                size = TMClient.BATCH_SIZE
+            else:
+                size = 1
+            chunks = [unique_units[i:i+size] for i in xrange(0, len(unique_units), size)]
+            chunks.reverse() # The queues are used from the end
+            self._queues[model] = chunks
+            self._pending[model] = []
+            self._signal_ids.append((model, model.connect('match-found', self._on_match_found)))
+        self._timer_id = 0
+
+
+    # METHODS #
+    def cancel(self):
+        """Stop waiting for answers. The callback is not called."""
+        if self._timer_id:
+            gobject.source_remove(self._timer_id)
+            self._timer_id = 0
+        for model, signal_id in self._signal_ids:
+            model.disconnect(signal_id)
+        self._signal_ids = []
+
+    def get_matched_units(self):
+        """Return the units that have suggestions.
+            @returns: A list of C{(unit, match)} pairs."""
+        matched = []
+        for source, match in self.best_matches.iteritems():
+            matched.extend([(unit, match) for unit in self._units[source]])
+        return matched
+
+    def get_progress(self):
+        """Return the number of chunks of units that are still to be
+            queried or waited for."""
+        return sum([len(q) for q in self._queues.itervalues()]) + \
+            sum([len([r for r in p if r[1]]) for p in self._pending.itervalues()])
+
+    def start(self):
+        self._timer_id = gobject.timeout_add(self.INTERVAL, self._on_timer)
+        self._on_timer()
+
+    def _fill(self, model):
+        """Send the next chunks of units to C{model}, while it has fewer than
+            C{MAX_REQUESTS} requests that are not answered or timed out."""
+        if model in self._filling:
+            # A synchronous back-end answered while we were sending
+            return
+        self._filling.add(model)
+        try:
+            queue = self._queues[model]
+            deadline = time.time() + self.TIME_SLICE
+            while queue:
+                now = time.time()
+                pending = [
+                    request for request in self._pending[model]
+                    if request[1] and now - request[0] < model.query_timeout
+                ]
+                self._pending[model] = pending
+                if len(pending) >= self.MAX_REQUESTS or now > deadline:
+                    break
+                units = queue.pop()
+                request = (now, set([normalize(forceunicode(unit.source)) for unit in units]))
+                pending.append(request)
+                try:
+                    model.query_units(units)
+                except Exception, exc:
+                    logging.debug('Pre-translation query to %s failed: %s' % (model.internal_name, exc))
+                    request[1].clear()
+        finally:
+            self._filling.discard(model)
+
+    def _finish(self):
+        """Call the callback if all units were queried and all answers are
+            in (or timed out)."""
+        if not self._timer_id or self.get_progress():
+            return False
+        self.cancel()
+        self.callback(self)
+        return True
+
+    def _is_better(self, match, best):
+        quality = int(match.get('quality') or 0)
+        if quality:
+            if quality < self.min_quality:
+                return False
+            return best is None or quality > int(best.get('quality') or 0)
+        # A machine translation is only better than nothing
+        return best is None
+
+
+    # EVENT HANDLERS #
+    def _on_match_found(self, model, query_str, matches):
+        source = normalize(forceunicode(query_str))
+        if source not in self._units:
+            return
+        for match in matches:
+            if self._is_better(match, self.best_matches.get(source)):
+                self.best_matches[source] = match
+        done = False
+        for request in self._pending.get(model, []):
+            if source in request[1]:
+                request[1].discard(source)
+                done = done or not request[1]
+        if done and model not in self._filling:
+            # Don't wait for the timer to send the next request
+            self._fill(model)
+            self._finish()
+
+    def _on_timer(self):
+        for model in self._queues:
+            self._fill(model)
+        now = time.time()
+        for model, pending in self._pending.iteritems():
+            self._pending[model] = [
+                request for request in pending
+                if request[1] and now - request[0] < model.query_timeout
+            ]
+        if self._finish():
+            return False
+        return True
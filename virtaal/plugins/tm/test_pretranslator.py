@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import time
+from translate.storage import pypo
+
+from pretranslator import Pretranslator, count_by_band, get_quality_bands
+
+
+class StubModel(object):
+    """A TM model that answers from a dictionary, without GTK. Sources that
+        are not in C{answers} are never answered."""
+    batch_lookups = False
+    query_timeout = 5
+
+    def __init__(self, internal_name, answers):
+        self.internal_name = internal_name
+        self.answers = answers
+        self.queried = []
+        self._handlers = {}
+
+    def connect(self, signal, handler):
+        signal_id = len(self._handlers) + 1
+        self._handlers[signal_id] = handler
+        return signal_id
+
+    def disconnect(self, signal_id):
+        del self._handlers[signal_id]
+
+    def query_units(self, units):
+        for unit in units:
+            self.queried.append(unit.source)
+            if unit.source in self.answers:
+                for handler in self._handlers.values():
+                    handler(self, unit.source, self.answers[unit.source])
+
+
+def make_units(*sources):
+    return [pypo.pounit(source) for source in sources]
+
+def test_get_quality_bands():
+    assert get_quality_bands(75) == [(100, 100), (95, 99), (85, 94), (75, 84)]
+    assert get_quality_bands(90) == [(100, 100), (95, 99), (90, 94)]
+    assert get_quality_bands(95) == [(100, 100), (95, 99)]
+    assert get_quality_bands(100) == [(100, 100)]
+
+def test_count_by_band():
+    matches = [{'quality': 100}, {'quality': 97}, {'quality': 96}, {'quality': 75}, {}, {'quality': 0}]
+    counts, machine = count_by_band(matches, 75)
+    assert counts == [((100, 100), 1), ((95, 99), 2), ((85, 94), 0), ((75, 84), 1)]
+    assert machine == 2
+
+def test_is_better():
+    pretranslator = Pretranslator([], [], 75, None)
+    machine = {'target': u'Lêer'}
+    assert pretranslator._is_better(machine, None)
+    assert not pretranslator._is_better(machine, {'target': u'Ander', 'quality': 80})
+    assert not pretranslator._is_better(machine, {'target': u'Ander'})
+    # A TM match replaces a machine translation, but only if it is good enough
+    assert pretranslator._is_better({'target': u'Lêer', 'quality': 80}, machine)
+    assert not pretranslator._is_better({'target': u'Lêer', 'quality': 70}, machine)
+    assert not pretranslator._is_better({'target': u'Lêer', 'quality': 70}, None)
+    assert pretranslator._is_better({'target': u'Lêer', 'quality': 90}, {'target': u'Ander', 'quality': 80})
+    assert not pretranslator._is_better({'target': u'Lêer', 'quality': 80}, {'target': u'Ander', 'quality': 90})
+
+def test_all_answered():
+    finished = []
+    tm = StubModel('tm', {
+        u'File': [{'target': u'Lêer', 'quality': 100}],
+        u'Edit': [{'target': u'Redigeer', 'quality': 70}],
+        u'View': [],
+    })
+    mt = StubModel('mt', {
+        u'File': [{'target': u'Leer'}],
+        u'Edit': [{'target': u'Wysig'}],
+        u'View': [],
+    })
+    units = make_units(u'File', u'Edit', u'View', u'File')
+    pretranslator = Pretranslator([tm, mt], units, 75, finished.append)
+    pretranslator.start()
+    assert finished == [pretranslator]
+    # Every source is only looked up once
+    assert sorted(tm.queried) == [u'Edit', u'File', u'View']
+    matched = dict([(id(unit), match['target']) for unit, match in pretranslator.get_matched_units()])
+    assert matched == {id(units[0]): u'Lêer', id(units[1]): u'Wysig', id(units[3]): u'Lêer'}
+
+def test_timed_out():
+    finished = []
+    tm = StubModel('tm', {u'File': [{'target': u'Lêer', 'quality': 100}]})
+    silent = StubModel('silent', {})
+    silent.query_timeout = 0.05
+    pretranslator = Pretranslator([tm, silent], make_units(u'File'), 75, finished.append)
+    pretranslator.start()
+    # The silent model is waited for until it times out
+    assert not finished
+    assert pretranslator.get_progress() == 1
+    time.sleep(0.1)
+    assert not pretranslator._on_timer()
+    assert finished == [pretranslator]
+    assert [match['target'] for unit, match in pretranslator.get_matched_units()] == [u'Lêer']
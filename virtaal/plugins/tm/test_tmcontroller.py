@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import gobject
+from translate.storage import pypo
+
+from tmcontroller import TMController
+
+
+class Stub(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class StubController(object):
+    """Only the parts of L{TMController} that prefetch and report on
+        pre-translation, so that no views or plug-ins are needed."""
+    PREFETCH_COUNT = TMController.PREFETCH_COUNT
+    MAX_PREFETCHES = TMController.MAX_PREFETCHES
+    PREFETCH_TIMEOUT = TMController.PREFETCH_TIMEOUT
+    PREFETCH_INTERVAL = TMController.PREFETCH_INTERVAL
+
+    accept_response = TMController.__dict__['accept_response']
+    _get_leverage_report = TMController.__dict__['_get_leverage_report']
+    _on_prefetch_timer = TMController.__dict__['_on_prefetch_timer']
+    _on_pretranslated = TMController.__dict__['_on_pretranslated']
+    _start_prefetch = TMController.__dict__['_start_prefetch']
+
+    def __init__(self, models, storecursor=None):
+        self.min_quality = 75
+        self.current_query = None
+        self.tmcache = object()
+        self.plugin_controller = Stub(plugins=dict([(model.internal_name, model) for model in models]))
+        self.storecursor = storecursor
+        self.view = Stub(set_pretranslating=lambda pretranslating: None)
+        self._prefetch_queue = []
+        self._prefetching = {}
+        self._prefetch_id = 0
+
+
+class PrefetchModel(object):
+    def __init__(self, internal_name, batch_lookups, prefetched):
+        self.internal_name = internal_name
+        self.batch_lookups = batch_lookups
+        self._prefetched = prefetched
+
+    def prefetch(self, units):
+        sources = [unit.source for unit in units]
+        self._prefetched.append((self.internal_name, sources))
+        return sources
+
+
+class TestTMController(object):
+    def setup_method(self, method):
+        self.units = [pypo.pounit(u'Unit %d' % (i)) for i in range(8)]
+        self.units[2].target = u'Eenheid 2'
+
+    def test_prefetch(self, monkeypatch):
+        monkeypatch.setattr(gobject, 'timeout_add', lambda interval, callback: 1)
+        prefetched = []
+        models = [
+            PrefetchModel('batch', True, prefetched),
+            PrefetchModel('single', False, prefetched),
+        ]
+        cursor = Stub(pos=0, indices=range(len(self.units)), model=self.units)
+        controller = StubController(models, cursor)
+        controller._start_prefetch()
+        assert controller._prefetch_id == 1
+
+        # The batch model gets all following untranslated units at once, and
+        # only MAX_PREFETCHES sources are waited for at a time
+        assert controller._on_prefetch_timer()
+        assert prefetched == [('batch', [u'Unit 1', u'Unit 3', u'Unit 4', u'Unit 5'])]
+        assert controller._on_prefetch_timer()
+        assert len(prefetched) == 1
+
+        # Answers (even empty ones) make room for the next queries, starting
+        # with the closest unit
+        controller.accept_response(models[0], u'Unit 1', [])
+        controller.accept_response(models[0], u'Unit 3', [])
+        assert controller._on_prefetch_timer()
+        assert prefetched[1:] == [('single', [u'Unit 1']), ('single', [u'Unit 3'])]
+
+        # Queries that are not answered time out
+        controller.PREFETCH_TIMEOUT = -1
+        assert controller._on_prefetch_timer()
+        assert prefetched[3:] == [('single', [u'Unit 4']), ('single', [u'Unit 5'])]
+        assert not controller._on_prefetch_timer()
+        assert controller._prefetch_id == 0
+
+    def test_leverage_report(self):
+        controller = StubController([])
+        matched = [
+            (self.units[0], {'target': u'a', 'quality': 100}),
+            (self.units[1], {'target': u'b', 'quality': 99}),
+            (self.units[3], {'target': u'c', 'quality': 95}),
+            (self.units[4], {'target': u'd', 'quality': 80}),
+            (self.units[5], {'target': u'e'}),
+        ]
+        assert controller._get_leverage_report(matched, 8).split(u'\n') == [
+            u'100%: 1 units',
+            u'95%-99%: 2 units',
+            u'85%-94%: 0 units',
+            u'75%-84%: 1 units',
+            u'Machine translation: 1 units',
+            u'No suggestion: 3 units',
+        ]
+
+    def test_pretranslated(self):
+        reports = []
+        targets = []
+        controller = StubController([])
+        controller.main_controller = Stub(
+            store_controller=Stub(set_unit_targets=lambda new_targets: targets.extend(new_targets) or []),
+            undo_controller=Stub(
+                record_start=lambda: None,
+                record_stop=lambda: None,
+                model=Stub(push=lambda undo_info: None),
+            ),
+            show_info=lambda title, message: reports.append(message),
+        )
+        pretranslator = Stub(
+            unit_count=3,
+            get_matched_units=lambda: [
+                (self.units[1], {'target': u'Eenheid 1', 'quality': 90}),
+                # Translated in the mean time
+                (self.units[2], {'target': u'Ander', 'quality': 100}),
+            ],
+        )
+        controller._on_pretranslated(pretranslator)
+        assert targets == [(self.units[1], u'Eenheid 1', True)]
+        lines = reports[0].split(u'\n')
+        assert u'100%: 0 units' in lines
+        assert u'85%-94%: 1 units' in lines
+        assert u'No suggestion: 2 units' in lines
@@ -21,14 +21,16 @@
 import gobject
 import logging
 import os.path
+import time
 from translate.lang.data import forceunicode, normalize
 
-from virtaal.common import GObjectWrapper
+from virtaal.common import GObjectWrapper, pan_app
 from virtaal.controllers.basecontroller import BaseController
 from virtaal.controllers.plugincontroller import PluginController
 
 import models
 from models.basetmmodel import BaseTMModel
+from pretranslator import Pretranslator, count_by_band
 from tmview import TMView
 
 
@@ -43,6 +45,21 @@ class TMController(BaseController):
     QUERY_DELAY = 300
     """The delay after a unit is selected (C{Cursor}'s "cursor-changed" event)
         before the TM is queried."""
+    PREFETCH_COUNT = 5
+    """The number of units after the current one (in the order of the
+        cursor) to query in the background."""
+    MAX_PREFETCHES = 4
+    """The maximum number of background queries to wait for at a time."""
+    PREFETCH_TIMEOUT = 10
+    """The number of seconds after which a background query that did not
+        give any suggestions is no longer waited for."""
+    PREFETCH_INTERVAL = 200
+    """The number of milliseconds between sending background queries (and
+        checking for ones that timed out), so that prefetching does not get
+        in the way of the current unit's query."""
+    CACHE_COMMIT_DELAY = 1000
+    """The number of milliseconds to collect changes to the suggestion cache
+        for, before they are written to disk together."""
 
     # INITIALIZERS #
     def __init__(self, main_controller, config={}):
@@ -55,6 +72,19 @@ class TMController(BaseController):
         self.min_quality = self.config.get('min_quality', 75)
 
         self._signal_ids = {}
+        self._prefetch_queue = []
+        self._prefetching = {}
+        self._prefetch_id = 0
+        self._pretranslator = None
+        self.tmcache = None
+        try:
+            from virtaal.support.tmcache import TMCache
+            self.tmcache = TMCache(
+                os.path.join(pan_app.get_config_dir(), 'tmcache.db'),
+                schedule=lambda commit: gobject.timeout_add(self.CACHE_COMMIT_DELAY, commit)
+            )
+        except Exception, exc:
+            logging.warning('Unable to open the TM suggestion cache: %s' % (exc))
         self.view = TMView(self, self.max_matches)
         self._load_models()
 
@@ -98,6 +128,7 @@ class TMController(BaseController):
         """Accept a query-response from the model.
             (This method is used as Model-Controller communications)"""
         query_str = forceunicode(query_str)
+        self._prefetching.pop((tmmodel, query_str), None)
         if query_str != self.current_query or not matches:
             return
         # Perform some sanity checks on matches first
@@ -136,6 +167,8 @@ class TMController(BaseController):
             self.view.display_matches(self.matches)
 
     def destroy(self):
+        self._cancel_prefetch()
+        self._cancel_pretranslation()
         # Destroy TMView
         self.view.hide()
         self.view.destroy()
@@ -150,6 +183,28 @@ class TMController(BaseController):
             self.main_controller.unit_controller.view.disconnect(self._target_focused_id)
 
         self.plugin_controller.shutdown()
+        if self.tmcache is not None:
+            self.tmcache.close()
+            self.tmcache = None
+
+    def pretranslate(self):
+        """Fill the untranslated units of the current file with the best
+            suggestions of all TM back-ends, marked as fuzzy. The back-ends
+            are queried in the background, and all units are changed at once
+            (and can be restored with a single undo) when they answered."""
+        store = self.main_controller.store_controller.get_store()
+        if store is None or self._pretranslator is not None:
+            return
+        units = [store.get_unit(index) for index in store.stats['untranslated']]
+        units = [unit for unit in units if unit.source and not unit.hasplural()]
+        if not units:
+            return
+        logging.debug('Pre-translating %d units' % (len(units)))
+        self._pretranslator = Pretranslator(
+            self.plugin_controller.plugins.values(), units, self.min_quality, self._on_pretranslated
+        )
+        self.view.set_pretranslating(True)
+        self._pretranslator.start()
 
     def select_match(self, match_data):
         """Handle a match-selection event.
@@ -188,11 +243,69 @@ class TMController(BaseController):
 
         def start_query():
             self.send_tm_query()
+            self._start_prefetch()
             return False
+        self._cancel_prefetch()
         if getattr(self, '_delay_id', 0):
             gobject.source_remove(self._delay_id)
         self._delay_id = gobject.timeout_add(self.QUERY_DELAY, start_query)
 
+    def _cancel_pretranslation(self):
+        if self._pretranslator is not None:
+            self._pretranslator.cancel()
+            self._pretranslator = None
+            self.view.set_pretranslating(False)
+
+    def _get_leverage_report(self, matched, total):
+        """Describe how many of C{total} units got a suggestion of what
+            quality."""
+        counts, machine = count_by_band([match for unit, match in matched], self.min_quality)
+        lines = []
+        for (lowest, highest), count in counts:
+            if lowest == highest:
+                quality = u'%d%%' % (lowest)
+            else:
+                quality = u'%d%%-%d%%' % (lowest, highest)
+            #l10n: A line in the pre-translation report, like "95%-99%: 13 units"
+            lines.append(_('%(quality)s: %(count)d units') % {'quality': quality, 'count': count})
+        lines.append(_('Machine translation: %d units') % (machine))
+        lines.append(_('No suggestion: %d units') % (total - len(matched)))
+        return u'\n'.join(lines)
+
+    def _cancel_prefetch(self):
+        """Forget the units that were still to be prefetched. Queries that
+            were already sent are not cancelled, but are not waited for."""
+        if self._prefetch_id:
+            gobject.source_remove(self._prefetch_id)
+            self._prefetch_id = 0
+        self._prefetch_queue = []
+        self._prefetching = {}
+
+    def _start_prefetch(self):
+        """Query all back-ends in the background for the units that follow
+            the current one, so that their suggestions are in the cache when
+            they are reached. The current unit's query is always sent first,
+            since this is only called after it was."""
+        cursor = getattr(self, 'storecursor', None)
+        if cursor is None or self.tmcache is None or cursor.pos < 0:
+            return
+        indices = cursor.indices
+        models = self.plugin_controller.plugins.values()
+        units = []
+        for pos in xrange(cursor.pos + 1, min(cursor.pos + 1 + self.PREFETCH_COUNT, len(indices))):
+            unit = cursor.model[indices[pos]]
+            if unit is not None and not unit.istranslated():
+                units.append(unit)
+        # Models with batch lookups get all units in one go, the others one
+        # unit at a time (for all models), starting with the closest unit
+        self._prefetch_queue = [(model, units) for model in models if model.batch_lookups]
+        for unit in units:
+            self._prefetch_queue.extend([(model, [unit]) for model in models if not model.batch_lookups])
+        # The queue is used from the end
+        self._prefetch_queue.reverse()
+        if self._prefetch_queue and not self._prefetch_id:
+            self._prefetch_id = gobject.timeout_add(self.PREFETCH_INTERVAL, self._on_prefetch_timer)
+
 
     # EVENT HANDLERS #
     def _on_cursor_changed(self, cursor):
@@ -209,10 +322,60 @@ class TMController(BaseController):
 
         return self.start_query()
 
+    def _on_pretranslated(self, pretranslator):
+        self._pretranslator = None
+        self.view.set_pretranslating(False)
+        store_controller = self.main_controller.store_controller
+        undo_controller = self.main_controller.undo_controller
+        current_unit = getattr(self, 'storecursor', None) and self.storecursor.deref()
+        # Units that were translated (or selected) in the mean time are left
+        # alone
+        matched = [
+            (unit, match) for unit, match in pretranslator.get_matched_units()
+            if unit is not current_unit and not unit.istranslated() and not unit.target
+        ]
+        if matched:
+            targets = [(unit, forceunicode(match['target']), True) for unit, match in matched]
+            undo_controller.record_start()
+            old_targets = store_controller.set_unit_targets(targets)
+            def undo_pretranslate(unit):
+                store_controller.set_unit_targets(old_targets)
+            undo_controller.model.push({
+                'action': undo_pretranslate,
+                'cursorpos': 0,
+                'desc': 'Pre-translate %d units' % (len(old_targets)),
+                'targetn': 0,
+                'unit': targets[0][0],
+            })
+            undo_controller.record_stop()
+        self.main_controller.show_info(
+            _('Pre-translation'), self._get_leverage_report(matched, pretranslator.unit_count)
+        )
+
+    def _on_prefetch_timer(self):
+        now = time.time()
+        for key, started in self._prefetching.items():
+            if now - started > self.PREFETCH_TIMEOUT:
+                # Models don't say when a query gave nothing
+                del self._prefetching[key]
+        while self._prefetch_queue and len(self._prefetching) < self.MAX_PREFETCHES:
+            model, units = self._prefetch_queue.pop()
+            try:
+                for source in model.prefetch(units):
+                    self._prefetching[(model, forceunicode(source))] = now
+            except Exception, exc:
+                logging.debug('Prefetching for %s failed: %s' % (model.internal_name, exc))
+        if self._prefetch_queue or self._prefetching:
+            return True
+        self._prefetch_id = 0
+        return False
+
     def _on_mode_selected(self, modecontroller, mode):
         self.view.update_geometry()
 
     def _on_store_closed(self, storecontroller):
+        self._cancel_prefetch()
+        self._cancel_pretranslation()
         if hasattr(self, '_cursor_changed_id') and self.storecursor:
             self.storecursor.disconnect(self._cursor_changed_id)
         self.storecursor = None
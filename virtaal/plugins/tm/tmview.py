@@ -123,6 +123,16 @@ class TMView(BaseView, GObjectWrapper):
         self.mnu_suggestions.connect('toggled', self._on_toggle_show_tm)
         self.mnu_suggestions.set_active(True)
 
+        self.mnui_edit = mainview.gui.get_widget('menuitem_edit')
+        #l10n: Menu item that fills all untranslated units with suggestions
+        self.mnu_pretranslate = mainview.append_menu_item(
+            _('Pre-_translate File'), self.mnui_edit, after=mainview.gui.get_widget('mnu_transfer')
+        )
+        self.mnu_pretranslate.connect('activate', self._on_pretranslate)
+        self.mnu_pretranslate.set_sensitive(
+            self.controller.main_controller.store_controller.get_store() is not None
+        )
+
 
     # ACCESSORS #
     def _get_active(self):
@@ -139,6 +149,7 @@ class TMView(BaseView, GObjectWrapper):
     def destroy(self):
         for gobj, signal_id in self._signal_ids:
             gobj.disconnect(signal_id)
+        self.mnui_edit.get_submenu().remove(self.mnu_pretranslate)
 
         self.menu.remove(self.mnu_suggestions)
 
@@ -243,6 +254,12 @@ class TMView(BaseView, GObjectWrapper):
         self.tmwindow.treeview.get_selection().select_iter(itr)
         self.tmwindow.treeview.row_activated(path, self.tmwindow.tvc_match)
 
+    def set_pretranslating(self, active):
+        """Disable the pre-translation menu item while pre-translation is
+            running."""
+        has_store = self.controller.main_controller.store_controller.get_store() is not None
+        self.mnu_pretranslate.set_sensitive(has_store and not active)
+
     def show(self, force=False):
         """Show the TM window."""
         if not self.active or (self.isvisible and not force) or not self._may_show_tmwindow:
@@ -310,12 +327,17 @@ class TMView(BaseView, GObjectWrapper):
     def _on_select_match(self, accel_group, acceleratable, keyval, modifier):
         self.select_match_index(int(keyval - gtk.keysyms._0))
 
+    def _on_pretranslate(self, menuitem):
+        self.controller.pretranslate()
+
     def _on_store_closed(self, storecontroller):
         self.hide()
         self.mnu_suggestions.set_sensitive(False)
+        self.mnu_pretranslate.set_sensitive(False)
 
     def _on_store_loaded(self, storecontroller):
         self.mnu_suggestions.set_sensitive(True)
+        self.mnu_pretranslate.set_sensitive(True)
 
     def _on_store_view_scroll(self, *args):
         if self.isvisible:
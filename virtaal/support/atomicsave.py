@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Replace files without ever leaving a half-written file behind."""
+
+import os
+import shutil
+import tempfile
+
+__all__ = ['save_atomically']
+
+
+def _get_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+def save_atomically(filename, data, mode='wb'):
+    """Write C{data} to a temporary file next to C{filename} and rename it
+        to C{filename} once it is safely on disk. If anything goes wrong, the
+        original file is left untouched.
+
+        Symbolic links are followed, and the permissions of an existing file
+        are kept."""
+    filename = os.path.realpath(filename)
+    dirname, basename = os.path.split(filename)
+    fd, tempname = tempfile.mkstemp(prefix='.%s.' % (basename), suffix='.tmp', dir=dirname)
+    try:
+        outfile = os.fdopen(fd, mode)
+        try:
+            outfile.write(data)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        finally:
+            outfile.close()
+
+        if os.path.exists(filename):
+            shutil.copymode(filename, tempname)
+        else:
+            # mkstemp() only gives the owner access
+            os.chmod(tempname, 0666 & ~_get_umask())
+
+        try:
+            os.rename(tempname, filename)
+        except OSError:
+            if os.name != 'nt' or not os.path.exists(filename):
+                raise
+            # Windows does not replace existing files when renaming
+            os.remove(filename)
+            os.rename(tempname, filename)
+    except:
+        if os.path.exists(tempname):
+            os.remove(tempname)
+        raise
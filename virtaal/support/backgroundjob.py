@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Run slow functions on a worker thread while the main loop keeps going."""
+
+import logging
+import threading
+from Queue import Queue, Empty
+
+import gobject
+
+from virtaal.common.gobjectwrapper import GObjectWrapper
+
+__all__ = ['BackgroundJob', 'JobCancelled']
+
+
+class JobCancelled(Exception):
+    """Raised in the worker thread when the job was cancelled."""
+
+
+class BackgroundJob(GObjectWrapper):
+    """Runs a function on a worker thread.
+
+        The function is called with the job as its only argument, and may call
+        L{report_progress()} and L{check_cancelled()} on it. The worker thread
+        must not touch GTK or emit signals: everything it reports is passed on
+        with signals from the main loop.
+
+        Python threads can not be interrupted, so L{cancel()} only asks the
+        function to stop at its next call to L{check_cancelled()}. Once
+        cancelled, no more signals are emitted, and C{cleanup} (if given) is
+        called on the main loop with the result of the function (or C{None}
+        if it did not finish)."""
+
+    __gtype_name__ = 'BackgroundJob'
+    __gsignals__ = {
+        'progress': (gobject.SIGNAL_RUN_FIRST, None, (float, object)),
+        'finished': (gobject.SIGNAL_RUN_FIRST, None, (object,)),
+        'failed':   (gobject.SIGNAL_RUN_FIRST, None, (object,)),
+    }
+
+    POLL_INTERVAL = 50
+    """How often (in milliseconds) to pass on messages from the worker."""
+
+    # INITIALIZERS #
+    def __init__(self, func, cleanup=None):
+        GObjectWrapper.__init__(self)
+        self.func = func
+        self.cleanup = cleanup
+        self.cancelled = False
+        self._messages = Queue()
+        self._thread = None
+        self._timer_id = None
+
+
+    # METHODS #
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='BackgroundJob')
+        self._thread.setDaemon(True)
+        self._thread.start()
+        self._timer_id = gobject.timeout_add(self.POLL_INTERVAL, self._poll)
+
+    def cancel(self):
+        """Ask the function to stop and stop emitting signals."""
+        self.cancelled = True
+
+    def check_cancelled(self):
+        """Called by the function to stop if the job was cancelled.
+            @raises JobCancelled: If the job was cancelled."""
+        if self.cancelled:
+            raise JobCancelled()
+
+    def is_running(self):
+        return self._timer_id is not None and not self.cancelled
+
+    def report_progress(self, fraction, message=''):
+        """Called by the function to report its progress.
+            @type  fraction: float
+            @param fraction: How much of the work is done, from 0 to 1."""
+        self._messages.put(('progress', (fraction, message)))
+
+    def _run(self):
+        try:
+            result = self.func(self)
+        except JobCancelled:
+            self._messages.put(('cancelled', None))
+        except Exception, exc:
+            logging.exception('Background job failed')
+            self._messages.put(('failed', exc))
+        else:
+            self._messages.put(('finished', result))
+
+    def _poll(self):
+        while True:
+            try:
+                kind, value = self._messages.get_nowait()
+            except Empty:
+                return True
+            if kind == 'progress':
+                if not self.cancelled:
+                    self.emit('progress', *value)
+                continue
+
+            self._timer_id = None
+            if self.cancelled or kind == 'cancelled':
+                if kind == 'failed':
+                    logging.debug('Cancelled job failed: %s' % (value))
+                if self.cleanup is not None:
+                    self.cleanup(kind == 'finished' and value or None)
+            else:
+                self.emit(kind, value)
+            return False
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""A BK-tree of unit strings, to find the units with strings similar to a
+search string without comparing it to every string in the store.
+
+A BK-tree (Burkhard-Keller tree) stores a string in every node, with the
+children of a node grouped by their edit distance to it. Because the edit
+distance is a metric, a search for strings within distance C{k} of a query at
+distance C{d} from a node only has to look at the children at distance
+C{d-k} to C{d+k}."""
+
+from translate.lang import data
+from translate.search import lshtein
+
+from virtaal.support.indexset import IndexSet
+
+__all__ = ['BKTree', 'SimilarityIndex', 'find_similar', 'get_max_distance', 'get_similarity', 'levenshtein_distance']
+
+MAX_LEN = 200
+"""Only this many characters of a string are compared, like
+    C{LevenshteinComparer} does."""
+
+
+def _bitparallel_distance(a, b):
+    """Return the Levenshtein distance between C{a} and C{b}.
+
+        This is the bit-parallel algorithm of Myers (as described by Hyyrö),
+        which keeps a column of the distance matrix in the bits of two
+        integers. It takes time in proportion to C{len(b)} (for strings
+        shorter than a machine word) instead of C{len(a) * len(b)}."""
+    if not a:
+        return len(b)
+    if not b:
+        return len(a)
+    peq = {}
+    bit = 1
+    for char in a:
+        peq[char] = peq.get(char, 0) | bit
+        bit <<= 1
+    mask = bit - 1
+    last = bit >> 1
+    pv = mask
+    mv = 0
+    score = len(a)
+    for char in b:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & mask
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+    return score
+
+if lshtein.distance is lshtein.python_distance:
+    levenshtein_distance = _bitparallel_distance
+else:
+    # python-Levenshtein is available
+    levenshtein_distance = lshtein.distance
+
+def get_max_distance(length, min_similarity):
+    """Return the largest edit distance that a string can have from a string
+        of C{length} characters and still be C{min_similarity} percent similar
+        to it (as scored by C{LevenshteinComparer}).
+
+        The similarity is C{100 * (1 - distance / l)}, where C{l} is the length
+        of the longer string. The distance is at least the difference in
+        length, which limits how long a similar string can be."""
+    if min_similarity <= 0:
+        return MAX_LEN
+    return int((100.0 - min_similarity) * min(length, MAX_LEN) / min_similarity)
+
+def _prepare(string):
+    return data.normalize(unicode(string)).lower()[:MAX_LEN]
+
+def get_similarity(query, string, ignorecase=True):
+    """Return how similar (in percent) C{string} is to C{query}, as scored by
+        C{LevenshteinComparer}. This is used to rank the results of
+        L{find_similar()}."""
+    query = data.normalize(unicode(query))
+    string = data.normalize(unicode(string))
+    if ignorecase:
+        query, string = query.lower(), string.lower()
+    return lshtein.LevenshteinComparer(MAX_LEN).similarity(query, string)
+
+def find_similar(query, texts, min_similarity, ignorecase=True):
+    """Find the strings in C{texts} that are at least C{min_similarity}
+        percent similar to C{query}, scored with C{LevenshteinComparer}.
+        @param texts: A list of C{(targets, sources)} tuples for the units to
+            search, as returned by
+            L{virtaal.support.regexsearch.get_unit_strings()}.
+        @returns: A list of C{(i, part, part_n, start, end)} tuples, like
+            L{virtaal.support.regexsearch.find_matches()}, where every match
+            spans the whole similar string."""
+    comparer = lshtein.LevenshteinComparer(MAX_LEN)
+    query = data.normalize(unicode(query))
+    if ignorecase:
+        query = query.lower()
+    results = []
+    for i, (targets, sources) in enumerate(texts):
+        for part, strings in (('target', targets), ('source', sources)):
+            for part_n, string in enumerate(strings):
+                if not string:
+                    continue
+                text = data.normalize(string)
+                if ignorecase:
+                    text = text.lower()
+                if comparer.similarity(query, text, min_similarity) >= min_similarity:
+                    results.append((i, part, part_n, 0, len(string)))
+    return results
+
+
+class BKTree(object):
+    """A BK-tree of strings, each with the set of indexes of the units that
+        contain it."""
+
+    def __init__(self, distance=levenshtein_distance):
+        self._distance = distance
+        self._root = None
+
+
+    # METHODS #
+    def add(self, string, index):
+        """Record that the unit at C{index} contains C{string}."""
+        if self._root is None:
+            self._root = (string, IndexSet([index]), {})
+            return
+        distance = self._distance
+        node = self._root
+        while True:
+            node_string, indexes, children = node
+            d = distance(string, node_string)
+            if d == 0:
+                indexes.add(index)
+                return
+            child = children.get(d)
+            if child is None:
+                children[d] = (string, IndexSet([index]), {})
+                return
+            node = child
+
+    def search(self, string, max_distance):
+        """Find the strings within C{max_distance} edits of C{string}.
+            @returns: A list of C{(distance, string, indexes)} tuples, in no
+                particular order."""
+        results = []
+        if self._root is None:
+            return results
+        distance = self._distance
+        stack = [self._root]
+        while stack:
+            node_string, indexes, children = stack.pop()
+            d = distance(string, node_string)
+            if d <= max_distance:
+                results.append((d, node_string, indexes))
+            if len(children) <= 2 * max_distance + 1:
+                stack.extend([
+                    child for child_d, child in children.iteritems()
+                    if d - max_distance <= child_d <= d + max_distance
+                ])
+            else:
+                for child_d in xrange(max(d - max_distance, 1), d + max_distance + 1):
+                    if child_d in children:
+                        stack.append(children[child_d])
+        return results
+
+
+class SimilarityIndex(object):
+    """L{BKTree}s of the (normalized, lower case) source and target strings
+        of a store's units, one for every string length.
+
+        The similarity of two strings depends on the length of the longer
+        one, so grouping the strings by length allows searching every group
+        with the smallest edit distance that its strings can be similar
+        within, and skipping groups that are too short or too long. The
+        smaller the distance, the fewer nodes of a tree are visited.
+
+        Like C{TrigramIndex}, this only gives candidates, and
+        L{update_unit()} only adds the new strings of a changed unit."""
+
+    def __init__(self, units=()):
+        """Constructor.
+            @param units: The units to index. Their position in the sequence
+                is used as their index. More units can be added later with
+                L{add_units()}."""
+        self._trees = {}
+        self.add_units(0, units)
+
+
+    # METHODS #
+    def add_units(self, start, units):
+        """Add C{units}, the first of which has index C{start}."""
+        for index, unit in enumerate(units):
+            self.update_unit(start + index, unit)
+
+    def get_candidates(self, string, min_similarity):
+        """Return the indexes of the units that can have a string that is at
+            least C{min_similarity} percent similar to C{string}, ignoring
+            case.
+            @rtype: L{IndexSet}"""
+        string = _prepare(string)
+        length = len(string)
+        max_length = length + get_max_distance(length, min_similarity)
+        results = []
+        for tree_length, tree in self._trees.iteritems():
+            if tree_length > max_length:
+                continue
+            # The distance that a string of this length can be similar within
+            max_distance = int((100 - min_similarity) * max(length, tree_length) / 100.0)
+            if abs(tree_length - length) > max_distance:
+                continue
+            results.extend(tree.search(string, max_distance))
+        if not results:
+            return IndexSet()
+        return results[0][2].union(*[indexes for _d, _s, indexes in results[1:]])
+
+    def update_unit(self, index, unit):
+        """Add the strings of the (changed) unit at C{index}."""
+        if unit.hasplural():
+            strings = unit.source.strings + unit.target.strings
+        else:
+            strings = [unit.source, unit.target]
+        for string in strings:
+            if string:
+                string = _prepare(string)
+                tree = self._trees.get(len(string))
+                if tree is None:
+                    tree = self._trees[len(string)] = BKTree()
+                tree.add(string, index)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Quality checks of many units on a pool of worker processes."""
+
+import logging
+import multiprocessing
+
+import gobject
+
+from virtaal.common.gobjectwrapper import GObjectWrapper
+from virtaal.support.storechecks import get_failures
+
+__all__ = ['CheckJob', 'CheckUnit', 'check_units']
+
+
+class CheckUnit(object):
+    """A picklable copy of everything in a translation unit that the
+        checkers look at. Units from stores like XLIFF can not be sent to
+        other processes themselves."""
+
+    def __init__(self, unit):
+        hasplural = unit.hasplural()
+        if hasplural:
+            from translate.misc.multistring import multistring
+            self.source = multistring(list(unit.source.strings))
+            self.target = multistring(list(unit.target.strings))
+        else:
+            self.source = unit.source
+            self.target = unit.target
+        self._hasplural = hasplural
+        self._locations = unit.getlocations()
+        self._notes = unit.getnotes()
+        self._context = unit.getcontext()
+        self._fuzzy = unit.isfuzzy()
+        self._review = unit.isreview()
+
+    def hasplural(self):
+        return self._hasplural
+
+    def getlocations(self):
+        return self._locations
+
+    def getnotes(self, origin=None):
+        return self._notes
+
+    def getcontext(self):
+        return self._context
+
+    def isfuzzy(self):
+        return self._fuzzy
+
+    def isreview(self):
+        return self._review
+
+    def getalttrans(self):
+        return []
+
+
+_checkers = {}
+
+def _get_checker(checker_class, targetlang):
+    """Create a checker once per worker process."""
+    key = (checker_class, targetlang)
+    if key not in _checkers:
+        checker = checker_class()
+        checker.config.updatetargetlanguage(targetlang)
+        _checkers[key] = checker
+    return _checkers[key]
+
+def check_units(checker_class, targetlang, units):
+    """Check the given units in a worker process.
+        @type  units: list
+        @param units: C{(index, unit_key, unit)} tuples, with C{unit} a
+            L{CheckUnit}.
+        @returns: A list of C{(index, unit_key, failures)} tuples as expected
+            by L{virtaal.support.storechecks.StoreChecks.set_results()}."""
+    checker = _get_checker(checker_class, targetlang)
+    return [(index, unit_key, get_failures(checker, unit)) for index, unit_key, unit in units]
+
+
+class CheckJob(GObjectWrapper):
+    """Checks a list of units in chunks on a pool of worker processes
+        without blocking the main loop.
+
+        Every worker builds its own checker from the checker class and target
+        language, since checkers can not be pickled. The results of every
+        chunk are passed on with the "chunk-checked" signal as soon as the
+        chunk is done."""
+
+    __gtype_name__ = 'CheckJob'
+    __gsignals__ = {
+        'chunk-checked': (gobject.SIGNAL_RUN_FIRST, None, (object,)),
+        'progress':      (gobject.SIGNAL_RUN_FIRST, None, (int, int)),
+        'finished':      (gobject.SIGNAL_RUN_FIRST, None, ()),
+    }
+
+    POLL_INTERVAL = 50
+    """How often (in milliseconds) to collect results from the workers."""
+    CHUNK_SIZE = 500
+    """The maximum number of units sent to a worker at a time."""
+
+    # INITIALIZERS #
+    def __init__(self, checker_class, targetlang, units, processes=None):
+        """Constructor.
+            @type  units: list
+            @param units: C{(index, unit_key, unit)} tuples of the units to
+                check.
+            @raises OSError: If the worker processes can not be started."""
+        GObjectWrapper.__init__(self)
+        self.total = len(units)
+        self.done = 0
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+
+        # Several chunks per process keep all of them busy until the end
+        chunk_size = max(1, min(self.CHUNK_SIZE, self.total // (processes * 4)))
+        self._pool = multiprocessing.Pool(processes)
+        self._results = []
+        for start in xrange(0, self.total, chunk_size):
+            chunk = [(index, unit_key, CheckUnit(unit)) for index, unit_key, unit in units[start:start+chunk_size]]
+            self._results.append((
+                len(chunk),
+                self._pool.apply_async(check_units, (checker_class, targetlang, chunk))
+            ))
+        self._pool.close()
+        self._timer_id = gobject.timeout_add(self.POLL_INTERVAL, self._poll)
+
+
+    # METHODS #
+    def cancel(self):
+        """Stop checking and kill the worker processes. No more signals are
+            emitted."""
+        if self._timer_id is None:
+            return
+        gobject.source_remove(self._timer_id)
+        self._timer_id = None
+        self._results = []
+        self._pool.terminate()
+
+    def is_running(self):
+        return self._timer_id is not None
+
+    def _poll(self):
+        if self._timer_id is None:
+            return False
+        remaining = []
+        checked = []
+        for nunits, result in self._results:
+            if not result.ready():
+                remaining.append((nunits, result))
+                continue
+            try:
+                checked.extend(result.get())
+            except Exception, exc:
+                logging.exception('Checking %d units failed: %s' % (nunits, exc))
+            self.done += nunits
+        self._results = remaining
+
+        if checked:
+            self.emit('chunk-checked', checked)
+            self.emit('progress', self.done, self.total)
+        if remaining:
+            return True
+
+        self._timer_id = None
+        self._pool.join()
+        self.emit('finished')
+        return False
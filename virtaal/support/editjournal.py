@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""An append-only journal of unit edits, to recover unsaved work after a
+crash without having to save the whole file all the time.
+
+The journal is a text file next to the translation file with one JSON object
+per line. The first line describes the translation file as it was when the
+journal was started, and every following line records the target text and
+state of a unit after it was edited. Entries for the same unit simply follow
+each other: the last one wins when the journal is replayed."""
+
+import logging
+import os
+import zlib
+try:
+    import simplejson as json #should be a bit faster; needed for Python < 2.6
+except ImportError:
+    import json #available since Python 2.6
+
+__all__ = ['EditJournal', 'get_journal_filename']
+
+JOURNAL_VERSION = 1
+
+
+def get_journal_filename(filename):
+    """Return the name of the journal file for the translation file
+        C{filename}."""
+    dirname, basename = os.path.split(os.path.abspath(filename))
+    return os.path.join(dirname, '.%s.virtaal-journal' % (basename))
+
+def _source_crc(unit):
+    source = unit.source
+    if unit.hasplural():
+        source = u'\0'.join(source.strings)
+    return zlib.crc32(unicode(source).encode('utf-8')) & 0xffffffff
+
+def _describe_file(filename):
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+
+class EditJournal(object):
+    """The edit journal of a single translation file."""
+
+    def __init__(self, filename):
+        """Constructor.
+            @param filename: The translation file to keep a journal for."""
+        self.filename = filename
+        self.journal_filename = get_journal_filename(filename)
+        self._file = None
+
+
+    # METHODS #
+    def close(self, discard=False):
+        """Stop writing to the journal.
+            @param discard: Also delete the journal, for example if the
+                changes in it were saved or deliberately thrown away."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if discard and os.path.exists(self.journal_filename):
+            try:
+                os.unlink(self.journal_filename)
+            except OSError, exc:
+                logging.warning('Unable to delete %s: %s' % (self.journal_filename, exc))
+
+    def record(self, index, unit):
+        """Append the current target text and state of the unit at C{index}
+            (in the list of translatable units) to the journal. The entry is
+            flushed to the operating system, but not synced to disk."""
+        if self._file is None:
+            self._start()
+        target = unit.target
+        if unit.hasplural():
+            target = list(target.strings)
+        else:
+            target = unicode(target)
+        entry = {'i': index, 'src': _source_crc(unit), 't': target, 's': unit.get_state_n()}
+        self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._file.flush()
+
+    def replay(self, units):
+        """Apply the edits of a journal left behind by a previous session.
+
+            Nothing is done if the translation file changed since the journal
+            was started, or if the journal does not match the units.
+            @type  units: sequence
+            @param units: The translatable units of the file.
+            @returns: The indexes of the units that were changed."""
+        if not os.path.exists(self.journal_filename):
+            return []
+
+        entries = {}
+        journal = open(self.journal_filename, 'r')
+        try:
+            try:
+                header = json.loads(journal.readline())
+                if header.get('version') != JOURNAL_VERSION or \
+                        header.get('file') != _describe_file(self.filename):
+                    logging.info('Ignoring out of date journal %s' % (self.journal_filename))
+                    return []
+                for line in journal:
+                    if not line.endswith('\n'):
+                        # The last entry was not completely written
+                        break
+                    entry = json.loads(line)
+                    entries[entry['i']] = entry
+            except (ValueError, KeyError), exc:
+                logging.warning('Unable to read journal %s: %s' % (self.journal_filename, exc))
+                return []
+        finally:
+            journal.close()
+
+        for index, entry in entries.iteritems():
+            if not 0 <= index < len(units) or _source_crc(units[index]) != entry['src']:
+                logging.warning('Journal %s does not match %s' % (self.journal_filename, self.filename))
+                return []
+
+        indexes = sorted(entries)
+        for index in indexes:
+            unit, entry = units[index], entries[index]
+            unit.target = entry['t']
+            unit.set_state_n(entry['s'])
+        # Start a new journal with only the replayed edits, so that they are
+        # kept until they are saved
+        self._start()
+        for index in indexes:
+            self.record(index, units[index])
+        return indexes
+
+    def _start(self):
+        self._file = open(self.journal_filename, 'w')
+        header = {'version': JOURNAL_VERSION, 'file': _describe_file(self.filename)}
+        self._file.write(json.dumps(header) + '\n')
+        self._file.flush()
@@ -28,7 +28,63 @@ import urllib
 
 from virtaal.common.gobjectwrapper import GObjectWrapper
 
-__all__ = ['HTTPClient', 'HTTPRequest', 'RESTRequest']
+__all__ = ['CurlPool', 'HTTPClient', 'HTTPRequest', 'RESTRequest', 'curl_pool']
+
+
+class CurlPool(object):
+    """Keeps the curl handles of finished requests for reuse, so that the
+        next request to the same host can use the connection that is still
+        open, instead of looking up the host and connecting again.
+
+        All handles also share their DNS cache (and their connection cache,
+        if libcurl supports it) through a C{CurlShare} object, so that
+        connections can be reused between different L{HTTPClient}s."""
+
+    MAX_IDLE_PER_HOST = 4
+    """The maximum number of unused handles to keep for every host."""
+
+    def __init__(self):
+        self._idle = {}
+        self.share = pycurl.CurlShare()
+        self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+        if hasattr(pycurl, 'LOCK_DATA_CONNECT'):
+            self.share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_CONNECT)
+        # Curl.reset() keeps the connections of a handle, but clears all the
+        # options of the previous request
+        self.reusable = hasattr(pycurl.Curl(), 'reset')
+
+
+    # METHODS #
+    def get_handle(self, url):
+        """Return an unused curl handle for a request to C{url}."""
+        idle = self._idle.get(self._get_host(url))
+        if idle:
+            return idle.pop()
+        curl = pycurl.Curl()
+        curl.setopt(pycurl.SHARE, self.share)
+        return curl
+
+    def release_handle(self, curl, url):
+        """Keep C{curl}, which was used for a request to C{url}, for the next
+            request to the same host."""
+        curl.request = None
+        if not self.reusable:
+            return
+        idle = self._idle.setdefault(self._get_host(url), [])
+        if len(idle) >= self.MAX_IDLE_PER_HOST:
+            return
+        curl.reset()
+        curl.setopt(pycurl.SHARE, self.share)
+        idle.append(curl)
+
+    def _get_host(self, url):
+        """Return the scheme and host (with port) of C{url}, which is what
+            libcurl uses to find a connection to reuse."""
+        scheme, rest = urllib.splittype(url)
+        host, path = urllib.splithost(rest or '')
+        return (scheme, host)
+
+curl_pool = CurlPool()
 
 
 class HTTPRequest(GObjectWrapper):
@@ -40,6 +96,7 @@ class HTTPRequest(GObjectWrapper):
         "http-redirect":     (gobject.SIGNAL_RUN_LAST, None, (object,)),
         "http-client-error": (gobject.SIGNAL_RUN_LAST, None, (object,)),
         "http-server-error": (gobject.SIGNAL_RUN_LAST, None, (object,)),
+        "http-failed":       (gobject.SIGNAL_RUN_LAST, None, (object,)),
     }
 
     def __init__(self, url, method='GET', data=None, headers=None,
@@ -59,7 +116,7 @@ class HTTPRequest(GObjectWrapper):
         self.status = None
 
         # the actual curl request object
-        self.curl = pycurl.Curl()
+        self.curl = curl_pool.get_handle(self.url)
         if (logging.root.level == logging.DEBUG and not force_quiet):
             self.curl.setopt(pycurl.VERBOSE, 1)
 
@@ -161,9 +218,22 @@ class RESTRequest(HTTPRequest):
 
 
 class HTTPClient(object):
-    """Non-blocking client that can handle multiple (asynchronous) HTTP requests."""
-
-    def __init__(self):
+    """Non-blocking client that can handle multiple (asynchronous) HTTP requests.
+
+        Transfers are driven by the GTK main loop: libcurl tells us which
+        sockets to watch and when it next needs to time out, so that a
+        transfer continues as soon as its socket is ready. With versions of
+        pycurl that can not do that, the requests are polled instead."""
+
+    POLL_INTERVAL = 100
+    """The number of milliseconds between polls, if the socket interface of
+        libcurl can not be used."""
+
+    def __init__(self, event_driven=None):
+        """Constructor.
+            @param event_driven: Whether to use the socket interface of
+                libcurl (C{True}) or to poll (C{False}). By default the
+                socket interface is used if pycurl supports it."""
         # state variable used to add and remove dispatcher to gtk event loop
         self.running = False
 
@@ -174,6 +244,16 @@ class HTTPClient(object):
         self.curl = pycurl.CurlMulti()
         self.user_agent = None
 
+        self._watches = {}
+        """The GTK event source watching every socket that libcurl uses."""
+        self._timer_id = 0
+        if event_driven is None:
+            event_driven = self.has_socket_api()
+        self.event_driven = event_driven
+        if self.event_driven:
+            self.curl.setopt(pycurl.M_SOCKETFUNCTION, self._on_socket_change)
+            self.curl.setopt(pycurl.M_TIMERFUNCTION, self._on_timeout_change)
+
     def add(self,request):
         """add a request to the queue"""
         self.curl.add_handle(request.curl)
@@ -182,15 +262,40 @@ class HTTPClient(object):
 
     def run(self):
         """client should not be running when request queue is empty"""
+        if self.event_driven:
+            # libcurl normally asks for a timeout when a handle is added, but
+            # older versions only start the transfer when they are called
+            self.running = True
+            if not self._timer_id:
+                self._timer_id = gobject.timeout_add(0, self._on_timeout)
+            return
         if self.running: return
-        gobject.timeout_add(100, self.perform)
+        gobject.timeout_add(self.POLL_INTERVAL, self.perform)
         self.running = True
 
+    @staticmethod
+    def has_socket_api():
+        """Return whether pycurl can tell us which sockets to watch."""
+        return hasattr(pycurl, 'M_SOCKETFUNCTION') and hasattr(pycurl, 'M_TIMERFUNCTION')
+
     def close_request(self, handle):
         """finalize a successful request"""
         self.curl.remove_handle(handle)
-        handle.request.handle_result()
-        self.requests.remove(handle.request)
+        request = handle.request
+        request.handle_result()
+        self.requests.remove(request)
+        curl_pool.release_handle(handle, request.url)
+
+    def fail_request(self, handle, message):
+        """finalize a request that got no answer (because the host could
+            not be found or the connection failed, for example)"""
+        self.curl.remove_handle(handle)
+        request = handle.request
+        logging.debug('HTTP request to %s failed: %s' % (request.url, message))
+        request.status = 0
+        request.emit("http-failed", message)
+        self.requests.discard(request)
+        curl_pool.release_handle(handle, request.url)
 
     def perform(self):
         """main event loop function, non blocking execution of all queued requests"""
@@ -199,12 +304,30 @@ class HTTPClient(object):
             self.running = False
         num, completed, failed = self.curl.info_read()
         [self.close_request(com) for com in completed]
-        #TODO: handle failed requests
+        [self.fail_request(handle, errmsg) for handle, errno, errmsg in failed]
         if not self.running:
             #we are done with this batch what do we do?
             return False
         return True
 
+    def _socket_action(self, fd, events):
+        """Let libcurl continue the transfers on socket C{fd} (or the ones
+            that timed out), and finish the requests that are done."""
+        while True:
+            ret, num_handles = self.curl.socket_action(fd, events)
+            if ret != pycurl.E_CALL_MULTI_PERFORM:
+                break
+        if num_handles == 0:
+            self.running = False
+        while True:
+            num_queued, completed, failed = self.curl.info_read()
+            for handle in completed:
+                self.close_request(handle)
+            for handle, errno, errmsg in failed:
+                self.fail_request(handle, errmsg)
+            if not num_queued:
+                break
+
     def get(self, url, callback, etag=None, error_callback=None):
         headers = None
         if etag:
@@ -219,6 +342,7 @@ class HTTPClient(object):
         if error_callback:
             request.connect('http-client-error', error_callback)
             request.connect('http-server-error', error_callback)
+            request.connect('http-failed', error_callback)
 
     def set_virtaal_useragent(self):
         """Set a nice user agent indicating Virtaal and its version."""
@@ -263,3 +387,48 @@ class HTTPClient(object):
             if name:
                 platform = '%s; %s' % (platform, name)
         self.user_agent = 'Virtaal/%s (%s)' % (version, platform)
+
+
+    # EVENT HANDLERS #
+    def _on_socket_change(self, event, fd, multi, data):
+        """Called by libcurl when it wants us to watch socket C{fd} for
+            other C{event}s, or to stop watching it."""
+        if fd in self._watches:
+            gobject.source_remove(self._watches.pop(fd))
+        if event == pycurl.POLL_REMOVE:
+            return
+        condition = gobject.IO_ERR | gobject.IO_HUP
+        if event & pycurl.POLL_IN:
+            condition |= gobject.IO_IN
+        if event & pycurl.POLL_OUT:
+            condition |= gobject.IO_OUT
+        self._watches[fd] = gobject.io_add_watch(fd, condition, self._on_socket_ready)
+
+    def _on_socket_ready(self, fd, condition):
+        events = 0
+        if condition & gobject.IO_IN:
+            events |= pycurl.CSELECT_IN
+        if condition & gobject.IO_OUT:
+            events |= pycurl.CSELECT_OUT
+        if condition & (gobject.IO_ERR | gobject.IO_HUP):
+            events |= pycurl.CSELECT_ERR
+        watch_id = self._watches.get(fd)
+        self._socket_action(fd, events)
+        # libcurl might have replaced or removed this watch in the meantime
+        return self._watches.get(fd) == watch_id
+
+    def _on_timeout(self):
+        self._timer_id = 0
+        self._socket_action(pycurl.SOCKET_TIMEOUT, 0)
+        return False
+
+    def _on_timeout_change(self, timeout_ms):
+        """Called by libcurl when it wants L{_on_timeout()} to be called
+            after C{timeout_ms} milliseconds (or not at all, if it is
+            negative)."""
+        # libcurl may not be called from here, so this only sets a timer
+        if self._timer_id:
+            gobject.source_remove(self._timer_id)
+            self._timer_id = 0
+        if timeout_ms >= 0:
+            self._timer_id = gobject.timeout_add(timeout_ms, self._on_timeout)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Compact sorted sets of unit indexes."""
+
+import binascii
+import string
+from array import array
+from bisect import bisect_left
+from itertools import compress
+from operator import itemgetter
+
+__all__ = ['IndexSet', 'remap_indexes']
+
+_bits_to_bytes = string.maketrans('01', '\x00\x01')
+
+
+class IndexSet(object):
+    """A sorted set of non-negative integers, stored in an C{array('i')}.
+
+        This takes 4 bytes per index instead of the 8 (pointer) to 32 (pointer
+        and int object) bytes per index of a list. An C{IndexSet} can be
+        used wherever a sorted list of indexes is expected: it supports
+        C{len()}, indexing, iteration, C{in} and C{bisect}.
+
+        Copies share their array with the original until either of them is
+        changed, so handing a copy of a big set to someone else is cheap.
+
+        Set operations are done on bitmaps (Python longs with bit C{i} set for
+        every index C{i}), so combining filters does not depend on the number
+        of indexes in them. A set's bitmap is made the first time it is needed
+        and then kept up to date by L{add()} and L{discard()}."""
+
+    __slots__ = ['_data', '_shared', '_bitmap']
+
+    def __init__(self, indexes=()):
+        """Constructor.
+            @param indexes: Indexes in any order, possibly with duplicates."""
+        if isinstance(indexes, IndexSet):
+            self._data = indexes._share()
+            self._shared = True
+            self._bitmap = indexes._bitmap
+        else:
+            self._data = array('i', sorted(set(indexes)))
+            self._shared = False
+            self._bitmap = None
+
+    def from_sorted(cls, indexes):
+        """Create a set from indexes that are known to be sorted and unique,
+            without checking that they are."""
+        indexset = cls.__new__(cls)
+        if isinstance(indexes, array) and indexes.typecode == 'i':
+            indexset._data = indexes
+        else:
+            indexset._data = array('i', indexes)
+        indexset._shared = False
+        indexset._bitmap = None
+        return indexset
+    from_sorted = classmethod(from_sorted)
+
+    def from_bitmap(cls, bitmap):
+        """Create a set of the indexes of the bits set in C{bitmap}."""
+        if bitmap:
+            # One byte (0 or 1) per bit, least significant bit first
+            bits = bytearray(bin(bitmap)[:1:-1].translate(_bits_to_bytes))
+            data = array('i', compress(xrange(len(bits)), bits))
+        else:
+            data = array('i')
+        indexset = cls.from_sorted(data)
+        indexset._bitmap = bitmap
+        return indexset
+    from_bitmap = classmethod(from_bitmap)
+
+    def range(cls, stop):
+        """Create a set of all indexes from 0 up to (but excluding) C{stop}."""
+        return cls.from_sorted(xrange(stop))
+    range = classmethod(range)
+
+
+    # SPECIAL METHODS #
+    def __len__(self):
+        return len(self._data)
+
+    def __nonzero__(self):
+        return len(self._data) > 0
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return IndexSet.from_sorted(self._data[i])
+        return self._data[i]
+
+    def __contains__(self, index):
+        data = self._data
+        i = bisect_left(data, index)
+        return i < len(data) and data[i] == index
+
+    def __eq__(self, other):
+        if isinstance(other, IndexSet):
+            return self._data == other._data
+        try:
+            return len(self._data) == len(other) and list(self._data) == list(other)
+        except TypeError:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None # Mutable
+
+    def __repr__(self):
+        return 'IndexSet(%r)' % (list(self._data),)
+
+    def __or__(self, other):
+        return self.union(other)
+
+    def __and__(self, other):
+        return self.intersection(other)
+
+    def __sub__(self, other):
+        return self.difference(other)
+
+    def __getstate__(self):
+        return self._data
+
+    def __setstate__(self, state):
+        self._data = state
+        self._shared = False
+        self._bitmap = None
+
+
+    # METHODS #
+    def add(self, index):
+        """Add C{index} to the set.
+            @returns: Whether the index was not in the set yet."""
+        data = self._data
+        i = bisect_left(data, index)
+        if i < len(data) and data[i] == index:
+            return False
+        self._unshare().insert(i, index)
+        if self._bitmap is not None:
+            self._bitmap |= 1 << index
+        return True
+
+    def discard(self, index):
+        """Remove C{index} from the set if it is in it.
+            @returns: Whether the index was in the set."""
+        data = self._data
+        i = bisect_left(data, index)
+        if i < len(data) and data[i] == index:
+            del self._unshare()[i]
+            if self._bitmap is not None:
+                self._bitmap &= ~(1 << index)
+            return True
+        return False
+
+    def bitmap(self):
+        """Return the set as a bitmap: a long with bit C{i} set for every
+            index C{i} in the set."""
+        if self._bitmap is None:
+            self._bitmap = _make_bitmap(self._data)
+        return self._bitmap
+
+    def copy(self):
+        return IndexSet(self)
+
+    def index(self, index):
+        """Return the position of C{index} in the set.
+            @raises ValueError: If C{index} is not in the set."""
+        data = self._data
+        i = bisect_left(data, index)
+        if i < len(data) and data[i] == index:
+            return i
+        raise ValueError('%d is not in the set' % (index))
+
+    def union(self, *others):
+        """Return a new set with the indexes in this set or any of
+            C{others}."""
+        bitmap = self.bitmap()
+        for other in others:
+            bitmap |= _getbitmap(other)
+        return IndexSet.from_bitmap(bitmap)
+
+    def intersection(self, *others):
+        """Return a new set with the indexes in this set and all C{others}."""
+        bitmap = self.bitmap()
+        for other in others:
+            bitmap &= _getbitmap(other)
+        return IndexSet.from_bitmap(bitmap)
+
+    def difference(self, *others):
+        """Return a new set with the indexes in this set but not in any of
+            C{others}."""
+        bitmap = self.bitmap()
+        for other in others:
+            bitmap &= ~_getbitmap(other)
+        return IndexSet.from_bitmap(bitmap)
+
+    def remap(self, table):
+        """Return a new set in which every index C{i} is replaced by
+            C{table[i]}. See L{remap_indexes()}."""
+        return remap_indexes(self._data, table)
+
+    def tolist(self):
+        return self._data.tolist()
+
+    def _share(self):
+        """Return the array to share with a copy of this set."""
+        self._shared = True
+        return self._data
+
+    def _unshare(self):
+        """Return the array to change, after making a private copy of it if
+            it is shared with other sets."""
+        if self._shared:
+            self._data = array('i', self._data)
+            self._shared = False
+        return self._data
+
+
+def remap_indexes(indexes, table):
+    """Return an L{IndexSet} of C{table[i]} for every C{i} in the sorted
+        sequence C{indexes}. Indexes mapped to a negative value are dropped.
+
+        The table must preserve the order of the indexes, like the mapping of
+        positions in a list to positions in a sublist does. All lookups are
+        done in a single call to C{itemgetter}, so a list is the fastest type
+        of table.
+        @type  table: sequence of int"""
+    if len(indexes) == 0:
+        return IndexSet()
+    if len(indexes) == 1:
+        mapped = (table[indexes[0]],)
+    else:
+        mapped = itemgetter(*indexes)(table)
+    if min(mapped) < 0:
+        mapped = [j for j in mapped if j >= 0]
+    return IndexSet.from_sorted(mapped)
+
+def _make_bitmap(indexes):
+    """Return the bitmap of the sorted, non-negative C{indexes}."""
+    if len(indexes) == 0:
+        return 0L
+    buf = bytearray((indexes[-1] >> 3) + 1)
+    for i in indexes:
+        buf[i >> 3] |= 1 << (i & 7)
+    buf.reverse()
+    return long(binascii.hexlify(buf), 16)
+
+def _getbitmap(indexes):
+    if isinstance(indexes, IndexSet):
+        return indexes.bitmap()
+    return _make_bitmap(sorted(set(indexes)))
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Index-first, lazily parsed Gettext PO files.
+
+A L{LazyPOFile} only does a single fast pass over the file when it is opened,
+recording the byte offsets of every unit and the state of the unit (header,
+obsolete, fuzzy, translated). Full unit objects are only built when they are
+accessed through C{store.units[i]}. Anything that needs the full list of
+units (iteration, list manipulation) transparently parses the rest of the
+file first, so the store can be used anywhere a normal C{pofile} can.
+
+When saved, units that did not change are copied from the original file
+instead of being serialized again."""
+
+import re
+import logging
+
+from translate.storage import pypo
+from translate.storage.statsdb import UNTRANSLATED, FUZZY, TRANSLATED
+
+
+__all__ = ['LazyPOFile', 'LazyUnitList', 'index_po']
+
+_block_sep_re = re.compile(r'\n(?:[ \t\r]*\n)+')
+_msgid_re = re.compile(r'^(#~\s*)?msgid ', re.MULTILINE)
+_empty_msgstr_re = re.compile(r'msgstr(?:\[0\])?[ \t]*""[ \t\r]*$', re.MULTILINE)
+_fuzzy_re = re.compile(r'^#,.*\bfuzzy\b', re.MULTILINE)
+
+U_HEADER, U_OBSOLETE = -1, -2
+"""Pseudo states for units that are not translatable."""
+
+PROGRESS_INTERVAL = 1000
+"""Progress is reported after this many units."""
+
+_unit_fields = (
+    'msgctxt', 'msgid', 'msgid_plural', 'msgstr', 'msgidcomments', 'msgid_pluralcomments',
+    'othercomments', 'automaticcomments', 'sourcecomments', 'typecomments',
+    'prev_msgctxt', 'prev_msgid', 'prev_msgid_plural', 'obsolete',
+)
+
+
+def _is_empty_msgstr(data, pos, end):
+    """Test whether the C{msgstr} (or C{msgstr[0]}) starting at C{pos} has
+        an empty value."""
+    match = _empty_msgstr_re.match(data, pos, end)
+    if not match:
+        return False
+    # Continuation lines contain the rest of the string
+    return not data.startswith('"', match.end() + 1)
+
+def _get_unit_key(unit):
+    """Return a hash of everything that is written to the file for C{unit}.
+        This is a lot faster than serializing the unit."""
+    values = []
+    for name in _unit_fields:
+        value = getattr(unit, name, None)
+        if isinstance(value, dict):
+            value = sorted(value.items())
+        values.append(value)
+    return hash(repr(values))
+
+def index_po(data, progress=None):
+    """Build an index of the units in the PO source C{data}.
+
+        @param progress: A function that is called now and then with the
+            fraction (from 0 to 1) of C{data} that is indexed.
+
+        @returns: A list of C{(start, end, state)} tuples, where C{state} is
+            one of the statsdb unit states, or C{U_HEADER}/C{U_OBSOLETE}.
+        @raises ValueError: If the data contains anything that we do not
+            expect in a PO file, or units that are not separated by blank
+            lines, so that the caller can fall back to normal parsing."""
+    spans = []
+    start = 0
+    length = len(data)
+    while start < length and data[start] in '\r\n \t':
+        start += 1
+    while start < length:
+        match = _block_sep_re.search(data, start)
+        if match:
+            end = match.start() + 1
+            nextstart = match.end()
+        else:
+            end = nextstart = length
+        spans.append((start, end))
+        start = nextstart
+        if progress is not None and not len(spans) % PROGRESS_INTERVAL:
+            progress(0.5 * start / length)
+
+    index = []
+    for span_n, (start, end) in enumerate(spans):
+        if progress is not None and span_n and not span_n % PROGRESS_INTERVAL:
+            progress(0.5 + 0.5 * span_n / len(spans))
+        match = _msgid_re.search(data, start, end)
+        if not match:
+            raise ValueError('No msgid in unit at offset %d' % (start))
+        if _msgid_re.search(data, match.end(), end):
+            raise ValueError('More than one unit in the block at offset %d' % (start))
+        if match.group(1):
+            index.append((start, end, U_OBSOLETE))
+            continue
+        msgid_pos = match.start()
+        msgstr_pos = data.find('\nmsgstr', msgid_pos, end)
+        if msgstr_pos < 0:
+            raise ValueError('No msgstr in unit at offset %d' % (start))
+        if not index and data.startswith('msgid ""', msgid_pos) and \
+                data.find('msgctxt', start, end) < 0:
+            index.append((start, end, U_HEADER))
+            continue
+        if _is_empty_msgstr(data, msgstr_pos+1, end):
+            state = UNTRANSLATED
+        elif _fuzzy_re.search(data, start, msgid_pos):
+            state = FUZZY
+        else:
+            state = TRANSLATED
+        index.append((start, end, state))
+    return index
+
+
+class LazyUnitList(object):
+    """A list of units that only parses units when they are accessed.
+
+        Any operation that changes the list, or iterates over all of its
+        items, first parses all remaining units and replaces itself in the
+        store with a normal list."""
+
+    def __init__(self, store, data, index):
+        self._store = store
+        self._data = data
+        self._index = index
+        self._units = [None] * len(index)
+        self._keys = [None] * len(index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in xrange(*i.indices(len(self)))]
+        unit = self._units[i]
+        if unit is None:
+            unit = self._units[i] = self._store._parse_unit(self._index[i])
+            self._keys[i] = _get_unit_key(unit)
+        return unit
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+    def __contains__(self, unit):
+        return unit in self._units
+
+    def index(self, unit):
+        """Find an already parsed unit. Units that have not been parsed yet
+            can not be in the list."""
+        for i, parsed in enumerate(self._units):
+            if parsed is unit:
+                return i
+        raise ValueError('Unit not in list')
+
+    def is_parsed(self, i):
+        return self._units[i] is not None
+
+    def get_state(self, i):
+        """Return the state of the unit at C{i} as recorded by the index.
+            Parsed units might have been changed, so use the unit instead."""
+        return self._index[i][2]
+
+    def get_raw(self, i):
+        start, end, _state = self._index[i]
+        return self._data[start:end]
+
+    def is_changed(self, i):
+        """Whether the unit at C{i} differs from the original file."""
+        unit = self._units[i]
+        if unit is None:
+            return False
+        return self._keys[i] is None or _get_unit_key(unit) != self._keys[i]
+
+    def mark_changed(self, i):
+        """Never copy the unit at C{i} from the original file again, even
+            if it looks unchanged."""
+        self[i]
+        self._keys[i] = None
+
+    def materialize(self):
+        """Parse all units and replace this object in the store with a plain
+            list."""
+        units = list(self)
+        self._store.units = units
+        self._data = None
+        return units
+
+    # Operations that change the list need all units to be parsed
+    def __setitem__(self, i, unit):
+        self.materialize()[i] = unit
+
+    def __delitem__(self, i):
+        del self.materialize()[i]
+
+    def append(self, unit):
+        self.materialize().append(unit)
+
+    def extend(self, units):
+        self.materialize().extend(units)
+
+    def insert(self, i, unit):
+        self.materialize().insert(i, unit)
+
+    def pop(self, i=-1):
+        return self.materialize().pop(i)
+
+    def remove(self, unit):
+        self.materialize().remove(unit)
+
+
+class LazyPOFile(pypo.pofile):
+    """A PO file that is indexed when opened, and of which the units are only
+        parsed when needed."""
+
+    def parse(self, input, progress=None):
+        """Index the PO source in C{input} (a file or byte string).
+            @param progress: See L{index_po()}."""
+        if hasattr(input, 'name'):
+            self.filename = input.name
+        elif not getattr(self, 'filename', ''):
+            self.filename = ''
+        if hasattr(input, 'read'):
+            data = input.read()
+            input.close()
+        else:
+            data = input
+        if isinstance(data, unicode):
+            raise ValueError('LazyPOFile can only index byte strings')
+
+        index = index_po(data, progress)
+        if not index or index[0][2] != U_HEADER:
+            raise ValueError('LazyPOFile needs a PO header to parse units individually')
+
+        # Parse the header to get the encoding used for the other units
+        headerstart, headerend, _state = index[0]
+        self._header_src = data[headerstart:headerend]
+        header = pypo.pofile(self._header_src).units[0]
+        self._encoding = header._encoding
+        self.units = LazyUnitList(self, data, index)
+        self.units._units[0] = header
+        header._store = self
+        self.units._keys[0] = _get_unit_key(header)
+        # Blank lines after the last unit
+        self._trailer = data[index[-1][1]:]
+
+    def _parse_unit(self, span):
+        start, end, _state = span
+        units = pypo.pofile(self._header_src + '\n' + self.units._data[start:end]).units
+        if len(units) != 2:
+            logging.warning('Unexpected number of units (%d) at offset %d' % (len(units) - 1, start))
+        unit = units[-1]
+        unit._store = self
+        return unit
+
+    def is_lazy(self):
+        """Whether some units are still unparsed."""
+        return isinstance(self.units, LazyUnitList)
+
+    def materialize(self):
+        if self.is_lazy():
+            self.units.materialize()
+
+    def unit_states(self):
+        """Yield C{(state, state_id)} for every unit in the store, where
+            C{state} is the statsdb state and C{state_id} the extended
+            (workflow) state of the unit. C{None} is yielded for units that
+            are not translatable. Units are not parsed for this."""
+        from translate.storage.statsdb import statefordb
+        units = self.units
+        lazy = self.is_lazy()
+        for i in xrange(len(units)):
+            if lazy and not units.is_parsed(i):
+                state = units.get_state(i)
+                if state < 0:
+                    yield None
+                else:
+                    # The PO state IDs are the same as the statsdb states
+                    yield state, state
+            else:
+                unit = units[i]
+                if unit.istranslatable():
+                    yield statefordb(unit), unit.get_state_id()
+                else:
+                    yield None
+
+    def mark_changed(self, index):
+        """Make sure that the unit at C{index} is written out again the
+            next time the store is saved. Changes to the text and comments of
+            units are noticed anyway, but not all changes are."""
+        if self.is_lazy():
+            self.units.mark_changed(index)
+
+    def __str__(self):
+        if not self.is_lazy():
+            return super(LazyPOFile, self).__str__()
+
+        units = self.units
+        output = []
+        try:
+            for i in xrange(len(units)):
+                if units.is_changed(i):
+                    unitsrc = str(units[i])
+                else:
+                    unitsrc = units.get_raw(i)
+                if not unitsrc.endswith('\n'):
+                    unitsrc += '\n'
+                output.append(unitsrc)
+        except UnicodeEncodeError:
+            # pofile knows how to switch to UTF-8
+            self.materialize()
+            return super(LazyPOFile, self).__str__()
+        return '\n'.join(output) + self._trailer
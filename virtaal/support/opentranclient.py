@@ -92,6 +92,7 @@ class OpenTranClient(gobject.GObject, HTTPClient):
 
         if callback:
             request.connect("http-success", call_callback)
+        return request
 
     def set_source_lang(self, language):
         language = language.lower().replace('-', '_').replace('@', '_')
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Search units with regular expressions in a separate process, so that an
+expression that takes forever (like C{'(a+)+$'} on a long string of a's)
+can be stopped without stopping Virtaal."""
+
+import re
+import multiprocessing
+
+from translate.lang import data
+from translate.tools.pogrep import real_index
+
+__all__ = ['RegexSearcher', 'find_matches', 'get_search_flags', 'get_unit_strings']
+
+MAX_CACHED_PATTERNS = 50
+
+_patterns = {}
+
+
+def get_search_flags(ignorecase):
+    """Return the flags that C{GrepFilter} compiles its expressions with."""
+    flags = re.LOCALE | re.MULTILINE | re.UNICODE
+    if ignorecase:
+        flags |= re.IGNORECASE
+    return flags
+
+def get_unit_strings(unit):
+    """Return the target and source strings of C{unit} in the form that
+        L{find_matches()} expects: a tuple of two lists of plain unicode
+        strings (or C{None})."""
+    if unit.hasplural():
+        targets, sources = unit.target.strings, unit.source.strings
+    else:
+        targets, sources = [unit.target], [unit.source]
+    return (
+        [s is not None and unicode(s) or None for s in targets],
+        [s is not None and unicode(s) or None for s in sources],
+    )
+
+def _compile(pattern, flags):
+    key = (pattern, flags)
+    if key not in _patterns:
+        if len(_patterns) >= MAX_CACHED_PATTERNS:
+            _patterns.clear()
+        _patterns[key] = re.compile(u'(%s)' % (pattern), flags)
+    return _patterns[key]
+
+def find_matches(pattern, flags, texts):
+    """Find the matches of C{pattern} in C{texts}, like
+        C{GrepFilter.getmatches()} does for units.
+        @param texts: A list with the result of L{get_unit_strings()} for
+            every unit to search.
+        @returns: A list of C{(i, part, part_n, start, end)} tuples, where
+            C{i} is the position of the unit in C{texts}."""
+    regex = _compile(pattern, flags)
+    results = []
+    for i, (targets, sources) in enumerate(texts):
+        for part, strings in (('target', targets), ('source', sources)):
+            for part_n, string in enumerate(strings):
+                if not string:
+                    continue
+                normalized = data.normalize(string)
+                for matchobj in regex.finditer(normalized):
+                    start = real_index(string, matchobj.start())
+                    end = real_index(string, matchobj.end())
+                    results.append((i, part, part_n, start, end))
+    return results
+
+
+class RegexSearcher(object):
+    """Runs L{find_matches()} in a worker process that can be killed if a
+        search takes too long."""
+
+    def __init__(self):
+        self._pool = None
+
+
+    # METHODS #
+    def kill(self):
+        """Stop the worker process, and with it any search that is still
+            running. A new process is started for the next search."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def search(self, pattern, flags, texts):
+        """Start searching C{texts} (see L{find_matches()}) in the worker
+            process.
+            @returns: A C{multiprocessing} C{AsyncResult}."""
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(1)
+        return self._pool.apply_async(find_matches, (pattern, flags, texts))
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""Quality check results of translation units, cached per unit."""
+
+from virtaal.support.indexset import IndexSet
+
+
+__all__ = ['StoreChecks', 'get_checker_key', 'get_failures', 'get_unit_key']
+
+
+def get_checker_key(checker):
+    """Identify the checker style and target language of C{checker}."""
+    return checker.__class__.__name__, checker.config.targetlanguage
+
+def get_unit_key(unit):
+    """Return a hash of everything in C{unit} that the checks look at."""
+    if unit.hasplural():
+        return hash((tuple(unit.source.strings), tuple(unit.target.strings), unit.isfuzzy()))
+    return hash((unit.source, unit.target, unit.isfuzzy()))
+
+def get_failures(checker, unit):
+    """Return the names of the checks that C{unit} fails, each prefixed with
+        "check-", in a tuple."""
+    return tuple(['check-' + name for name in checker.run_filters(unit)])
+
+
+class _CheckerResults(object):
+    """The check results of all units for a single checker."""
+
+    def __init__(self, nunits):
+        self.unit_keys = [None] * nunits
+        self.failures = [()] * nunits
+        self.checks = {}
+        """Maps "check-" + check name to the L{IndexSet} of failing units."""
+        self.dirty = set(xrange(nunits))
+        """Indexes of units that changed since they were last checked."""
+        self.pending = {}
+        """Maps the indexes of units that are being checked to their keys."""
+
+    def set_failures(self, index, failures):
+        checks = self.checks
+        for name in self.failures[index]:
+            indexes = checks[name]
+            indexes.discard(index)
+            if not indexes:
+                del checks[name]
+        for name in failures:
+            if name not in checks:
+                checks[name] = IndexSet()
+            checks[name].add(index)
+        self.failures[index] = failures
+
+
+class StoreChecks(object):
+    """Check results of the units in a store, cached per unit and checker.
+
+        Units are only checked again once they were marked as changed with
+        L{invalidate_unit()} and their source, target or fuzzy state
+        actually differs from when they were last checked."""
+
+    def __init__(self, nunits):
+        self.nunits = nunits
+        self._results = {}
+
+
+    # METHODS #
+    def invalidate_unit(self, index):
+        """Mark the unit at C{index} as changed."""
+        for results in self._results.itervalues():
+            results.dirty.add(index)
+            results.pending.pop(index, None)
+
+    def get_checks(self, checker):
+        """Return the check failures found so far with C{checker}, in the
+            same format as the result of L{update()}."""
+        key = get_checker_key(checker)
+        if key not in self._results:
+            return {}
+        return self._results[key].checks
+
+    def take_pending(self, units, checker):
+        """Find the units that need to be checked with C{checker}.
+
+            The caller is responsible for checking the units and reporting
+            the failures with L{set_results()}, possibly some time later.
+            @type  units: sequence
+            @param units: All the units (the same ones every time).
+            @returns: A list of C{(index, unit_key)} tuples."""
+        key = get_checker_key(checker)
+        if key not in self._results:
+            self._results[key] = _CheckerResults(self.nunits)
+        results = self._results[key]
+
+        # Units of which the results never arrived are checked again
+        pending = []
+        for index in sorted(results.dirty.union(results.pending)):
+            unit_key = get_unit_key(units[index])
+            if unit_key == results.unit_keys[index]:
+                results.pending.pop(index, None)
+                continue
+            results.pending[index] = unit_key
+            pending.append((index, unit_key))
+        results.dirty.clear()
+        return pending
+
+    def set_results(self, checker, failures):
+        """Record the results of checking units returned by
+            L{take_pending()}. Results for units that were invalidated in the
+            mean time are ignored.
+            @type  failures: iterable
+            @param failures: C{(index, unit_key, failures)} tuples, where
+                C{failures} is the result of L{get_failures()}."""
+        results = self._results.get(get_checker_key(checker), None)
+        if results is None:
+            return
+        for index, unit_key, unit_failures in failures:
+            if results.pending.get(index, None) != unit_key:
+                continue
+            del results.pending[index]
+            results.unit_keys[index] = unit_key
+            if unit_failures != results.failures[index]:
+                results.set_failures(index, unit_failures)
+
+    def update(self, units, checker):
+        """Check all units that changed since the previous update with the
+            same checker.
+            @type  units: sequence
+            @param units: All the units (the same ones every time).
+            @returns: A dictionary mapping "check-" + check name to an
+                L{IndexSet} of the units failing that check."""
+        pending = self.take_pending(units, checker)
+        self.set_results(checker, [
+            (index, unit_key, get_failures(checker, units[index]))
+            for index, unit_key in pending
+        ])
+        return self.get_checks(checker)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""In-memory unit statistics of translation stores."""
+
+from translate.storage.statsdb import emptyfilestats, statefordb, state_strings
+
+from virtaal.support.indexset import IndexSet
+
+
+__all__ = ['StoreStats', 'get_unit_state']
+
+
+def get_unit_state(unit):
+    """Return C{(state, state_id)} for the given unit, where C{state} is the
+        statsdb state and C{state_id} the extended (workflow) state. C{None}
+        is returned for units that are not translatable."""
+    if not unit.istranslatable():
+        return None
+    return statefordb(unit), unit.get_state_id()
+
+def _unit_states(store):
+    """Yield the result of L{get_unit_state} for every unit in C{store}.
+        Stores that can do this without parsing units (like
+        L{virtaal.support.lazypo.LazyPOFile}) are asked to do it."""
+    if hasattr(store, 'unit_states'):
+        return store.unit_states()
+    return (get_unit_state(unit) for unit in store.units)
+
+
+class StoreStats(object):
+    """Unit statistics of a translation store, calculated in one pass over its
+        units and updated one unit at a time afterwards.
+
+        C{stats} has the same format as the result of
+        C{StatsCache.filestatestats(extended=True)}, but contains
+        L{IndexSet}s of indexes into the list of translatable units
+        (C{valid_units}) instead of lists of indexes into C{store.units}."""
+
+    PROGRESS_INTERVAL = 1000
+    """Progress is reported after this many units."""
+
+    def __init__(self, store, progress=None):
+        """Constructor.
+            @param progress: See L{compute()}."""
+        self.stats = None
+        self.valid_units = IndexSet()
+        """The indexes in C{store.units} of all translatable units."""
+        self._states = []
+        self.compute(store, progress)
+
+
+    # METHODS #
+    def compute(self, store, progress=None):
+        """Calculate the statistics of all units in C{store}.
+            @param progress: A function that is called now and then with the
+                fraction (from 0 to 1) of units that are done."""
+        stats = emptyfilestats()
+        stats['extended'] = extended = {}
+        valid_units = []
+        states = []
+        total = stats['total']
+        unit_count = len(store.units)
+        for store_index, unit_state in enumerate(_unit_states(store)):
+            if progress is not None and store_index and not store_index % self.PROGRESS_INTERVAL:
+                progress(float(store_index) / unit_count)
+            if unit_state is None:
+                continue
+            index = len(valid_units)
+            valid_units.append(store_index)
+            states.append(unit_state)
+            state, state_id = unit_state
+            stats[state_strings[state]].append(index)
+            if state_id not in extended:
+                extended[state_id] = []
+            extended[state_id].append(index)
+            total.append(index)
+
+        for key, indexes in stats.items():
+            if isinstance(indexes, list):
+                stats[key] = IndexSet.from_sorted(indexes)
+        for state_id, indexes in extended.items():
+            extended[state_id] = IndexSet.from_sorted(indexes)
+
+        self.stats = stats
+        self.valid_units = IndexSet.from_sorted(valid_units)
+        self._states = states
+        return stats
+
+    def update_unit(self, index, unit):
+        """Update the statistics after the unit at C{index} (in the list of
+            translatable units) changed.
+            @returns: Whether the state of the unit changed."""
+        old_state = self._states[index]
+        new_state = get_unit_state(unit)
+        if new_state is None or new_state == old_state:
+            return False
+        self._states[index] = new_state
+
+        if old_state[0] != new_state[0]:
+            self.stats[state_strings[old_state[0]]].discard(index)
+            self.stats[state_strings[new_state[0]]].add(index)
+        if old_state[1] != new_state[1]:
+            extended = self.stats['extended']
+            if new_state[1] not in extended:
+                extended[new_state[1]] = IndexSet()
+            extended[old_state[1]].discard(index)
+            extended[new_state[1]].add(index)
+            if not extended[old_state[1]]:
+                del extended[old_state[1]]
+        return True
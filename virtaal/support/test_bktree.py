@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import random
+
+from translate.search.lshtein import python_distance
+from translate.storage import pypo
+
+from bktree import BKTree, SimilarityIndex, _bitparallel_distance, find_similar, get_similarity
+from regexsearch import get_unit_strings
+
+po_source = r'''
+msgid "Open the file"
+msgstr "Maak die lêer oop"
+
+msgid "Open the files"
+msgstr "Maak die lêers oop"
+
+msgid "Close the window"
+msgstr "Maak die venster toe"
+'''
+
+
+def test_distance():
+    rand = random.Random(1)
+    for _i in xrange(500):
+        a = u''.join([rand.choice(u'abc') for _j in xrange(rand.randint(0, 10))])
+        b = u''.join([rand.choice(u'abc') for _j in xrange(rand.randint(0, 10))])
+        assert _bitparallel_distance(a, b) == python_distance(a, b)
+
+def test_search():
+    tree = BKTree()
+    for index, word in enumerate([u'book', u'books', u'cake', u'boo', u'cape', u'book']):
+        tree.add(word, index)
+    results = sorted([(d, s, list(indexes)) for d, s, indexes in tree.search(u'book', 1)])
+    assert results == [(0, u'book', [0, 5]), (1, u'boo', [3]), (1, u'books', [1])]
+    assert tree.search(u'xyz', 1) == []
+
+def test_similar():
+    store = pypo.pofile(po_source)
+    index = SimilarityIndex(store.units)
+    assert index.get_candidates(u'OPEN THE FILE', 75) == [0, 1]
+    texts = [get_unit_strings(unit) for unit in store.units]
+    assert find_similar(u'open the file', texts, 75) == [(0, 'source', 0, 0, 13), (1, 'source', 0, 0, 14)]
+    assert find_similar(u'OPEN THE FILE', texts, 75, ignorecase=False) == []
+    assert get_similarity(u'open the file', u'Open the files') > get_similarity(u'open the file', u'Close the window')
+
+def test_add_units():
+    store = pypo.pofile(po_source)
+    index = SimilarityIndex()
+    index.add_units(0, store.units[:1])
+    assert index.get_candidates(u'open the files', 75) == [0]
+    index.add_units(1, store.units[1:])
+    assert index.get_candidates(u'open the files', 75) == [0, 1]
+
+def test_candidates():
+    """The candidates include every unit with a similar string."""
+    rand = random.Random(2)
+    store = pypo.pofile()
+    for _i in xrange(300):
+        words = [rand.choice([u'open', u'the', u'file', u'close', u'a', u'window']) for _j in xrange(rand.randint(1, 6))]
+        store.addsourceunit(u' '.join(words))
+    index = SimilarityIndex(store.units)
+    texts = [get_unit_strings(unit) for unit in store.units]
+    for query in (u'open the file', u'a window', u'close the file window', u'the'):
+        for min_similarity in (50, 75, 90):
+            found = set([result[0] for result in find_similar(query, texts, min_similarity)])
+            assert found <= set(index.get_candidates(query, min_similarity))
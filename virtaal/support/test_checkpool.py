@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import multiprocessing
+
+from translate.filters import checks
+from translate.storage import pypo
+
+from checkpool import CheckUnit, check_units
+from storechecks import get_failures
+
+
+def make_units():
+    units = []
+    for source, target in [(u'Open %s', u'Maak oop'), (u'File', u'Lêer'), (u'Save.', u'Stoor')]:
+        unit = pypo.pounit(source)
+        unit.target = target
+        units.append(unit)
+    unit = pypo.pounit([u'%d file', u'%d files'])
+    unit.target = [u'%d lêer', u'lêers']
+    units.append(unit)
+    return units
+
+def test_check_units():
+    units = make_units()
+    checker = checks.StandardChecker()
+    checker.config.updatetargetlanguage('af')
+    expected = [(index, 0, get_failures(checker, unit)) for index, unit in enumerate(units)]
+
+    chunk = [(index, 0, CheckUnit(unit)) for index, unit in enumerate(units)]
+    pool = multiprocessing.Pool(2)
+    try:
+        results = pool.apply(check_units, (checks.StandardChecker, 'af', chunk))
+    finally:
+        pool.terminate()
+    assert results == expected
+    assert 'check-printf' in results[0][2]
+    assert 'check-printf' in results[3][2]
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+
+from translate.storage import factory
+
+from editjournal import EditJournal
+
+
+po_source = r'''msgid "File"
+msgstr ""
+
+msgid "%d file"
+msgid_plural "%d files"
+msgstr[0] ""
+msgstr[1] ""
+'''
+
+
+class TestEditJournal(object):
+    def setup_method(self, method):
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, 'test.po')
+        open(self.filename, 'w').write(po_source)
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.tempdir)
+
+    def test_replay(self):
+        units = factory.getobject(self.filename).units
+        journal = EditJournal(self.filename)
+        units[0].target = u'Lêer'
+        journal.record(0, units[0])
+        units[1].target = [u'%d lêer', u'%d lêers']
+        units[1].markfuzzy()
+        journal.record(1, units[1])
+        # Nothing is closed, as if Virtaal crashed
+
+        units = factory.getobject(self.filename).units
+        assert EditJournal(self.filename).replay(units) == [0, 1]
+        assert units[0].target == u'Lêer'
+        assert units[1].target.strings == [u'%d lêer', u'%d lêers']
+        assert units[1].isfuzzy()
+
+        # The recovered edits are kept until they are saved
+        units = factory.getobject(self.filename).units
+        journal = EditJournal(self.filename)
+        assert journal.replay(units) == [0, 1]
+        journal.close(discard=True)
+        assert EditJournal(self.filename).replay(units) == []
+
+    def test_incomplete_entry(self):
+        units = factory.getobject(self.filename).units
+        journal = EditJournal(self.filename)
+        units[0].target = u'Lêer'
+        journal.record(0, units[0])
+        journal.close()
+        open(journal.journal_filename, 'a').write('{"i":1,"src":')
+
+        units = factory.getobject(self.filename).units
+        assert EditJournal(self.filename).replay(units) == [0]
+
+    def test_changed_file(self):
+        units = factory.getobject(self.filename).units
+        journal = EditJournal(self.filename)
+        units[0].target = u'Lêer'
+        journal.record(0, units[0])
+        journal.close()
+        open(self.filename, 'w').write(po_source.replace('""\n\n', '"Lêer"\n\n', 1))
+
+        units = factory.getobject(self.filename).units
+        assert EditJournal(self.filename).replay(units) == []
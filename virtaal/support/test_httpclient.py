@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import socket
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+import gobject
+import pycurl
+import pytest
+
+from httpclient import CurlPool, HTTPClient
+
+REQUESTS = 20
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(object):
+    """An HTTP server that answers every request immediately."""
+
+    def __init__(self):
+        self.server = make_server('localhost', 0, self.application, handler_class=QuietHandler)
+        self.url = 'http://localhost:%d/' % (self.server.server_port)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+
+    def application(self, environ, start_response):
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return ['OK']
+
+    def shutdown(self):
+        self.server.shutdown()
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write('OK')
+
+    def log_message(self, *args):
+        pass
+
+
+class KeepAliveServer(ThreadingMixIn, HTTPServer):
+    """An HTTP/1.1 server that keeps connections open, and remembers the
+        address of every connection it got."""
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('localhost', 0), KeepAliveHandler)
+        self.connections = set()
+        self.url = 'http://localhost:%d/' % (self.server_port)
+        thread = threading.Thread(target=self.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+
+
+def fetch_one_by_one(client, url, count):
+    """Fetch C{url} C{count} times, starting every request when the previous
+        one is done, and return the number of answers and the time taken."""
+    loop = gobject.MainLoop()
+    answers = []
+    def callback(request, result):
+        answers.append(result)
+        if len(answers) < count:
+            client.get(url, callback)
+        else:
+            loop.quit()
+    client.get(url, callback)
+    gobject.timeout_add(10000, loop.quit)
+    start = time.time()
+    loop.run()
+    return len(answers), time.time() - start
+
+def test_event_driven():
+    if not HTTPClient.has_socket_api():
+        pytest.skip('pycurl does not support M_SOCKETFUNCTION')
+    server = StandInServer()
+    try:
+        client = HTTPClient()
+        ready = []
+        def on_socket_ready(fd, condition):
+            ready.append(fd)
+            return HTTPClient._on_socket_ready(client, fd, condition)
+        def perform():
+            raise AssertionError('An event driven client must not poll')
+        client._on_socket_ready = on_socket_ready
+        client.perform = perform
+        answers, duration = fetch_one_by_one(client, server.url, REQUESTS)
+        assert answers == REQUESTS
+        assert ready
+    finally:
+        server.shutdown()
+
+def test_polling():
+    server = StandInServer()
+    try:
+        client = HTTPClient(event_driven=False)
+        polls = []
+        def perform():
+            polls.append(True)
+            return HTTPClient.perform(client)
+        client.perform = perform
+        answers, duration = fetch_one_by_one(client, server.url, 3)
+        assert answers == 3
+        assert polls
+        assert not client._watches and not client._timer_id
+    finally:
+        server.shutdown()
+
+def test_failed():
+    # Find a port that nothing listens on
+    sock = socket.socket()
+    sock.bind(('localhost', 0))
+    url = 'http://localhost:%d/' % (sock.getsockname()[1])
+    sock.close()
+
+    client = HTTPClient()
+    loop = gobject.MainLoop()
+    errors = []
+    def error_callback(request, message):
+        errors.append(request.status)
+        loop.quit()
+    client.get(url, None, error_callback=error_callback)
+    gobject.timeout_add(10000, loop.quit)
+    loop.run()
+    assert errors == [0]
+    assert not client.requests
+
+def test_pool():
+    pool = CurlPool()
+    if not pool.reusable:
+        pytest.skip('pycurl can not reset curl handles')
+    curl = pool.get_handle('http://localhost:8080/a')
+    pool.release_handle(curl, 'http://localhost:8080/a')
+    assert pool.get_handle('http://localhost:8080/b') is curl
+    assert pool.get_handle('http://localhost:8080/c') is not curl
+    pool.release_handle(curl, 'http://localhost:8080/a')
+    assert pool.get_handle('http://example.com/') is not curl
+
+def test_keep_alive():
+    server = KeepAliveServer()
+    try:
+        answers, duration = fetch_one_by_one(HTTPClient(), server.url, 5)
+        assert answers == 5
+        assert len(server.connections) == 1
+    finally:
+        server.shutdown()
+
+def test_shared_connections():
+    if not hasattr(pycurl, 'LOCK_DATA_CONNECT'):
+        pytest.skip('libcurl can not share connections between handles')
+    server = KeepAliveServer()
+    try:
+        fetch_one_by_one(HTTPClient(), server.url, 2)
+        # Another client uses the same connection through CurlShare
+        answers, duration = fetch_one_by_one(HTTPClient(), server.url, 2)
+        assert answers == 2
+        assert len(server.connections) == 1
+    finally:
+        server.shutdown()
+
+
+def benchmark():
+    """Compare the time that event driven and polling clients take for
+        sequential requests to a local server."""
+    server = StandInServer()
+    try:
+        for event_driven in (False, True):
+            if event_driven and not HTTPClient.has_socket_api():
+                continue
+            answers, duration = fetch_one_by_one(HTTPClient(event_driven), server.url, REQUESTS)
+            print '%s: %d requests in %.3f seconds' % (
+                event_driven and 'event driven' or 'polling', answers, duration
+            )
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    benchmark()
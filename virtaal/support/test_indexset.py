@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+from bisect import bisect_left
+
+from indexset import IndexSet
+
+
+def test_construct():
+    indexes = IndexSet([5, 1, 3, 1])
+    assert indexes == [1, 3, 5]
+    assert len(indexes) == 3
+    assert indexes[1] == 3
+    assert indexes[-1] == 5
+    assert indexes[1:] == [3, 5]
+    assert IndexSet.range(3) == [0, 1, 2]
+    assert not IndexSet()
+    assert bisect_left(indexes, 4) == 2
+
+def test_add_discard():
+    indexes = IndexSet([1, 5])
+    assert indexes.add(3)
+    assert not indexes.add(3)
+    assert indexes == [1, 3, 5]
+    assert 3 in indexes and 4 not in indexes
+    assert indexes.index(5) == 2
+    assert indexes.discard(1)
+    assert not indexes.discard(1)
+    assert indexes == [3, 5]
+
+def test_copy():
+    indexes = IndexSet([1, 2])
+    copy = IndexSet(indexes)
+    indexes.add(3)
+    assert copy == [1, 2]
+    copy = indexes.copy()
+    copy.discard(1)
+    assert indexes == [1, 2, 3]
+
+def test_operations():
+    a = IndexSet([1, 2, 3])
+    b = IndexSet([3, 4])
+    assert a | b == [1, 2, 3, 4]
+    assert a & b == [3]
+    assert a - b == [1, 2]
+    assert IndexSet().union(a, b, [0]) == [0, 1, 2, 3, 4]
+    assert a.remap([-1, 0, -1, 1]) == [0, 1]
+
+def test_bitmap():
+    indexes = IndexSet([0, 3, 9])
+    assert indexes.bitmap() == 0x209
+    indexes.add(4)
+    indexes.discard(0)
+    assert indexes.bitmap() == 0x218
+    assert IndexSet.from_bitmap(0x218) == [3, 4, 9]
+    assert IndexSet.from_bitmap(0) == []
+    big = IndexSet.range(100000)
+    assert (big & [99999, 100000]) == [99999]
+    assert len(big - indexes) == 99997
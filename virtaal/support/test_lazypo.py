@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+from translate.storage import pypo
+
+from lazypo import LazyPOFile, U_HEADER, U_OBSOLETE, index_po
+
+po_source = r'''msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=UTF-8\n"
+"Plural-Forms: nplurals=2; plural=(n != 1);\n"
+
+#: foo.c:1
+msgid "Untranslated"
+msgstr ""
+
+#: foo.c:2
+#, fuzzy
+msgid "Fuzzy"
+msgstr "Wollerig"
+
+#: foo.c:3
+#| msgid "Old \"quoted\""
+msgid "Translated \"quoted\""
+msgstr "Vertaal \"aangehaal\""
+
+#, c-format
+msgid "%d file"
+msgid_plural "%d files"
+msgstr[0] "%d lêer"
+msgstr[1] "%d lêers"
+
+#~ msgid "Obsolete"
+#~ msgstr "Uitgedien"
+'''
+
+
+def test_index():
+    states = [state for start, end, state in index_po(po_source)]
+    assert states == [U_HEADER, 0, 30, 100, 100, U_OBSOLETE]
+
+def test_index_progress():
+    units = ''.join(['\nmsgid "Unit %d"\nmsgstr ""\n' % (i) for i in xrange(2500)])
+    fractions = []
+    index = index_po(po_source.split('\n\n')[0] + '\n' + units, fractions.append)
+    assert len(index) == 2501
+    assert fractions and fractions == sorted(fractions)
+    assert 0 < fractions[0] and fractions[-1] < 1
+
+def test_unseparated_units():
+    """Units that are not separated by blank lines can not be indexed."""
+    header = po_source.split('\n\n')[0] + '\n\n'
+    source = header + 'msgid "One"\nmsgstr "Een"\nmsgid "Two"\nmsgstr "Twee"\n'
+    assert len(pypo.pofile(source).units) == 3
+    pytest.raises(ValueError, index_po, source)
+    pytest.raises(ValueError, LazyPOFile, source)
+
+    source = header + 'msgid "One"\nmsgstr "Een"\n\n#~ msgid "Two"\n#~ msgstr "Twee"\n#~ msgid "Three"\n#~ msgstr "Drie"\n'
+    pytest.raises(ValueError, index_po, source)
+
+def test_lazy_units():
+    store = LazyPOFile(po_source)
+    assert len(store.units) == 6
+    assert not store.units.is_parsed(3)
+    assert store.units[3].source == u'Translated "quoted"'
+    assert store.units.is_parsed(3)
+    assert store.units[4].target.strings == [u'%d lêer', u'%d lêers']
+    assert not store.units.is_parsed(1)
+
+def test_unit_states():
+    store = LazyPOFile(po_source)
+    store.units[2].markfuzzy(False)
+    states = list(store.unit_states())
+    assert states == [None, (0, 0), (100, 100), (100, 100), (100, 100), None]
+    assert not store.units.is_parsed(1)
+
+def test_save():
+    store = LazyPOFile(po_source)
+    assert str(store) == po_source
+    store.units[1].target = u'Onvertaal'
+    assert str(store) == str(pypo.pofile(str(store)))
+    assert 'msgstr "Onvertaal"' in str(store)
+
+def test_save_trailer():
+    source = po_source + '\n\n'
+    store = LazyPOFile(source)
+    assert str(store) == source
+    store.units[1].target = u'Onvertaal'
+    assert str(store).endswith('#~ msgstr "Uitgedien"\n\n\n')
+
+def test_save_unchanged():
+    # Unchanged units are copied as they are, even if pofile would reformat them
+    source = po_source.replace('msgid "Untranslated"', 'msgid ""\n"Untranslated"')
+    store = LazyPOFile(source)
+    [unit for unit in store.units]
+    assert str(store) == source
+
+    store.units[3].addlocation('bar.c:4')
+    assert str(store) == source.replace('#: foo.c:3\n', '#: foo.c:3\n#: bar.c:4\n')
+
+    # Changes that can't be detected can be marked
+    assert not store.units.is_changed(1)
+    store.mark_changed(1)
+    assert store.units.is_changed(1)
+
+def test_materialize():
+    store = LazyPOFile(po_source)
+    unit = store.units[1]
+    store.units.append(pypo.pounit(u'New'))
+    assert isinstance(store.units, list)
+    assert store.units[1] is unit
+    assert len(store.units) == 7
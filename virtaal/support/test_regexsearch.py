@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+from translate.storage import pypo
+from translate.tools.pogrep import GrepFilter
+
+from regexsearch import RegexSearcher, find_matches, get_search_flags, get_unit_strings
+
+po_source = r'''
+msgid "Open file"
+msgstr "Maak lêer oop"
+
+msgid "One file"
+msgid_plural "%d files"
+msgstr[0] "Een lêer"
+msgstr[1] "%d lêers"
+'''
+
+
+def test_find_matches():
+    """Test that the results are the same as those of GrepFilter."""
+    store = pypo.pofile(po_source)
+    units = store.units[1:]
+    for pattern in (u'l.er', u'FILES?', u'^\\w'):
+        grepfilter = GrepFilter(pattern, ('source', 'target'), ignorecase=True, useregexp=True)
+        expected = [
+            (units.index(match.unit), match.part, match.part_n, match.start, match.end)
+            for match in grepfilter.getmatches(units)[0]
+        ]
+        texts = [get_unit_strings(unit) for unit in units]
+        assert find_matches(grepfilter.searchstring, get_search_flags(True), texts) == expected
+
+def test_kill():
+    searcher = RegexSearcher()
+    try:
+        pending = searcher.search(u'(a+)+$', get_search_flags(False), [([u'a' * 40 + u'b'], [])])
+        pending.wait(0.5)
+        assert not pending.ready()
+        searcher.kill()
+        pending = searcher.search(u'a+b', get_search_flags(False), [([u'a' * 40 + u'b'], [])])
+        assert pending.get(10) == [(0, 'target', 0, 0, 41)]
+    finally:
+        searcher.kill()
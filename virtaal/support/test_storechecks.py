@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+from translate.filters import checks
+from translate.storage import pypo
+
+from storechecks import StoreChecks, get_failures, get_unit_key
+
+
+class CountingChecker(checks.StandardChecker):
+    checked = 0
+
+    def run_filters(self, unit):
+        self.checked += 1
+        return super(CountingChecker, self).run_filters(unit)
+
+
+def make_units():
+    units = []
+    for source, target in [(u'Open %s', u'Maak oop'), (u'File', u'Lêer'), (u'Save.', u'Stoor')]:
+        unit = pypo.pounit(source)
+        unit.target = target
+        units.append(unit)
+    return units
+
+def test_update():
+    units = make_units()
+    cache = StoreChecks(len(units))
+    checker = CountingChecker()
+    failures = cache.update(units, checker)
+    assert checker.checked == 3
+    assert failures['check-printf'] == [0]
+    assert failures['check-endpunc'] == [2]
+
+    # Nothing changed, so nothing should be checked
+    assert cache.update(units, checker) == failures
+    assert checker.checked == 3
+
+def test_invalidate_unit():
+    units = make_units()
+    cache = StoreChecks(len(units))
+    checker = CountingChecker()
+    cache.update(units, checker)
+
+    units[0].target = u'Maak %s oop'
+    cache.invalidate_unit(0)
+    cache.invalidate_unit(1)
+    failures = cache.update(units, checker)
+    # Unit 1 was marked, but didn't really change
+    assert checker.checked == 4
+    assert 'check-printf' not in failures
+    assert failures['check-endpunc'] == [2]
+
+def test_set_results():
+    units = make_units()
+    cache = StoreChecks(len(units))
+    checker = CountingChecker()
+    pending = cache.take_pending(units, checker)
+    assert [index for index, unit_key in pending] == [0, 1, 2]
+
+    # The unit changes while the results are still on their way
+    units[2].target = u'Stoor.'
+    cache.invalidate_unit(2)
+    cache.set_results(checker, [
+        (index, unit_key, get_failures(checker, units[index]))
+        for index, unit_key in pending
+    ])
+    assert cache.get_checks(checker)['check-printf'] == [0]
+    assert 'check-endpunc' not in cache.get_checks(checker)
+
+    assert cache.take_pending(units, checker) == [(2, get_unit_key(units[2]))]
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+from translate.storage import pypo
+
+from storestats import StoreStats
+
+po_source = r'''msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=UTF-8\n"
+
+msgid "One"
+msgstr ""
+
+#, fuzzy
+msgid "Two"
+msgstr "Twee"
+
+msgid "Three"
+msgstr "Drie"
+
+#~ msgid "Four"
+#~ msgstr "Vier"
+'''
+
+
+def test_compute():
+    stats = StoreStats(pypo.pofile(po_source))
+    assert stats.valid_units == [1, 2, 3]
+    assert stats.stats['total'] == [0, 1, 2]
+    assert stats.stats['untranslated'] == [0]
+    assert stats.stats['fuzzy'] == [1]
+    assert stats.stats['translated'] == [2]
+    assert stats.stats['extended'] == {0: [0], 30: [1], 100: [2]}
+
+def test_progress():
+    # 2500 units, with the header
+    store = pypo.pofile()
+    for i in xrange(2499):
+        store.addsourceunit(u'Unit %d' % (i))
+    fractions = []
+    StoreStats(store, fractions.append)
+    assert fractions == [0.4, 0.8]
+
+def test_update_unit():
+    store = pypo.pofile(po_source)
+    stats = StoreStats(store)
+    assert not stats.update_unit(2, store.units[3])
+
+    store.units[1].target = u'Een'
+    assert stats.update_unit(0, store.units[1])
+    assert stats.stats['untranslated'] == []
+    assert stats.stats['translated'] == [0, 2]
+    assert stats.stats['extended'] == {30: [1], 100: [0, 2]}
+
+    store.units[2].markfuzzy(False)
+    assert stats.update_unit(1, store.units[2])
+    assert stats.stats['fuzzy'] == []
+    assert stats.stats['translated'] == [0, 1, 2]
+    assert stats.stats == StoreStats(store).stats
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+from translate.storage import pypo
+
+from textindex import TrigramIndex, get_literals
+
+po_source = r'''
+msgid "Open file"
+msgstr "Maak lêer oop"
+
+msgid "Print the file"
+msgstr "Druk die lêer"
+
+msgid "One file"
+msgid_plural "%d files"
+msgstr[0] "Een lêer"
+msgstr[1] "%d lêers"
+'''
+
+
+def test_get_literals():
+    assert get_literals(u'print') == [u'print']
+    assert get_literals(u'print(f|ln)') == [u'print']
+    assert get_literals(u'^file\\.c?pp') == [u'file.', u'pp']
+    assert get_literals(u'foo|bar') == []
+    assert get_literals(u'(') == []
+
+def test_candidates():
+    store = pypo.pofile(po_source)
+    index = TrigramIndex(store.units)
+    assert index.get_candidates([u'FILE']) == [0, 1, 2]
+    assert index.get_candidates([u'lêers']) == [2]
+    assert index.get_candidates([u'print', u'druk']) == [1]
+    assert index.get_candidates([u'missing']) == []
+    assert index.get_candidates([u'fi']) is None
+    # Trigrams do not span strings
+    assert index.get_candidates([u'fileMaak']) == []
+
+def test_update_unit():
+    store = pypo.pofile(po_source)
+    index = TrigramIndex(store.units)
+    store.units[0].target = u'Open die lêer'
+    index.update_unit(0, store.units[0])
+    assert index.get_candidates([u'die lêer']) == [0, 1]
+
+def test_add_units():
+    store = pypo.pofile(po_source)
+    index = TrigramIndex()
+    index.add_units(0, store.units[:2])
+    index.add_units(2, store.units[2:])
+    index.finish()
+    assert index.get_candidates([u'FILE']) == [0, 1, 2]
+    assert index.get_candidates([u'lêers']) == [2]
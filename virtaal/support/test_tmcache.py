@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+import time
+
+from tmcache import TMCache, dbapi2
+
+matches = [{'source': u'File', 'target': u'Lêer', 'quality': 100}]
+
+
+class TestTMCache(object):
+    def setup_method(self, method):
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, 'tmcache.db')
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.tempdir)
+
+    def test_persistence(self):
+        cache = TMCache(self.filename)
+        assert cache.get('amagama', 'en', 'af', u'File') is None
+        cache.put('amagama', 'en', 'af', u'File', matches)
+        cache.close()
+
+        cache = TMCache(self.filename)
+        assert cache.get('amagama', 'en', 'af', u'File') == matches
+        assert cache.get('amagama', 'en', 'de', u'File') is None
+        assert cache.get('google_translate', 'en', 'af', u'File') is None
+        assert cache.hits == {'amagama': 1}
+        assert cache.misses == {'amagama': 1, 'google_translate': 1}
+        cache.close()
+
+    def test_ttl(self):
+        cache = TMCache(self.filename)
+        cache.put('amagama', 'en', 'af', u'File', matches)
+        assert cache.get('amagama', 'en', 'af', u'File', ttl=60) == matches
+        assert cache.contains('amagama', 'en', 'af', u'File', ttl=60)
+        time.sleep(0.01)
+        assert not cache.contains('amagama', 'en', 'af', u'File', ttl=0)
+        assert cache.get('amagama', 'en', 'af', u'File', ttl=0) is None
+        assert cache.get('amagama', 'en', 'af', u'File') is None
+        cache.close()
+
+    def test_empty(self):
+        cache = TMCache(self.filename, empty_ttl=60)
+        cache.put('amagama', 'en', 'af', u'Nothing', [])
+        assert cache.contains('amagama', 'en', 'af', u'Nothing')
+        assert cache.get('amagama', 'en', 'af', u'Nothing', ttl=3600) == []
+        assert cache.hits == {'amagama': 1}
+        cache.empty_ttl = 0
+        time.sleep(0.01)
+        # Suggestions are kept longer than the lack of them
+        cache.put('amagama', 'en', 'af', u'File', matches)
+        assert not cache.contains('amagama', 'en', 'af', u'Nothing', ttl=3600)
+        assert cache.get('amagama', 'en', 'af', u'Nothing') is None
+        assert cache.get('amagama', 'en', 'af', u'File', ttl=3600) == matches
+        cache.close()
+
+    def test_eviction(self):
+        cache = TMCache(self.filename, max_entries=10)
+        for i in range(10):
+            cache.put('amagama', 'en', 'af', u'String %d' % (i), matches)
+        # Use the first string, so that the second is the least recently used
+        time.sleep(0.01)
+        assert cache.get('amagama', 'en', 'af', u'String 0') == matches
+        cache.put('amagama', 'en', 'af', u'String 10', matches)
+        assert cache.get('amagama', 'en', 'af', u'String 0') == matches
+        assert cache.get('amagama', 'en', 'af', u'String 1') is None
+        assert cache.get('amagama', 'en', 'af', u'String 10') == matches
+        cache.close()
+
+    def test_scheduled_commit(self):
+        scheduled = []
+        cache = TMCache(self.filename, schedule=scheduled.append)
+        other = dbapi2.connect(self.filename)
+        count = lambda: other.execute('SELECT COUNT(*) FROM suggestions').fetchone()[0]
+        for i in range(3):
+            cache.put('amagama', 'en', 'af', u'String %d' % (i), matches)
+        # One commit for all the changes, which is not done yet
+        assert len(scheduled) == 1
+        assert count() == 0
+        assert scheduled[0]() is False
+        assert count() == 3
+        cache.put('amagama', 'en', 'af', u'String 3', matches)
+        assert len(scheduled) == 2
+        other.close()
+        cache.close()
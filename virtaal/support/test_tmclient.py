@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import time
+import urllib
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from tmclient import TMClient
+
+TM = {
+    u'File': [{'source': u'File', 'target': u'Lêer', 'quality': 100}],
+    u'Edit': [{'source': u'Edit', 'target': u'Redigeer', 'quality': 100}],
+}
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class StandInTMServer(object):
+    """A TM server that answers single and (optionally) batch lookups from
+        C{TM}, and counts the requests it gets. With C{invalid}, batch
+        lookups get an answer that doesn't fit the request."""
+
+    def __init__(self, batch=True, invalid=False):
+        self.batch = batch
+        self.invalid = invalid
+        self.requests = []
+        self.server = make_server('localhost', 0, self.application, handler_class=QuietHandler)
+        self.url = 'http://localhost:%d/tmserver' % (self.server.server_port)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+
+    def application(self, environ, start_response):
+        path = environ['PATH_INFO'].split('/')
+        self.requests.append((environ['REQUEST_METHOD'], path[4]))
+        if path[4] == 'unit':
+            result = TM.get(urllib.unquote(path[5]).decode('utf-8'), [])
+        elif path[4] == 'units' and self.batch and environ['REQUEST_METHOD'] == 'POST':
+            body = environ['wsgi.input'].read(int(environ['CONTENT_LENGTH']))
+            result = [TM.get(source, []) for source in json.loads(body)]
+            if self.invalid:
+                result = result[1:]
+        else:
+            start_response('404 Not Found', [('Content-Type', 'text/plain')])
+            return ['Not found']
+        start_response('200 OK', [('Content-Type', 'application/json')])
+        return [json.dumps(result)]
+
+    def shutdown(self):
+        self.server.shutdown()
+
+
+def lookup(server, sources, client=None):
+    client = client or TMClient(server.url)
+    results = {}
+    def callback(widget, source, matches):
+        results[source] = [match['target'] for match in matches]
+    client.translate_units(sources, 'en', 'af', callback)
+    while client.requests:
+        assert len(client.requests) <= TMClient.MAX_UNIT_REQUESTS
+        client.perform()
+        time.sleep(0.01)
+    return client, results
+
+def test_batch():
+    server = StandInTMServer()
+    try:
+        client, results = lookup(server, [u'File', u'Edit', u'View'])
+        assert results == {u'File': [u'Lêer'], u'Edit': [u'Redigeer'], u'View': []}
+        assert server.requests == [('POST', 'units')]
+        assert client.batch_supported
+    finally:
+        server.shutdown()
+
+def test_fallback():
+    server = StandInTMServer(batch=False)
+    try:
+        client, results = lookup(server, [u'File', u'Edit', u'View'])
+        assert results == {u'File': [u'Lêer'], u'Edit': [u'Redigeer'], u'View': []}
+        assert server.requests[0] == ('POST', 'units')
+        assert sorted(server.requests[1:]) == [('GET', 'unit')] * 3
+        assert not client.batch_supported
+    finally:
+        server.shutdown()
+
+def test_invalid_batch():
+    server = StandInTMServer(invalid=True)
+    try:
+        sources = [u'File', u'Edit'] + [u'View %d' % i for i in range(10)]
+        client, results = lookup(server, sources)
+        assert results[u'File'] == [u'Lêer']
+        assert len(results) == len(sources)
+        assert not client.batch_supported
+        # Later lookups don't try the batch request again
+        lookup(server, sources, client)
+        assert [method for method, path in server.requests].count('POST') == 1
+    finally:
+        server.shutdown()
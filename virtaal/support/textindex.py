@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""An inverted index of the trigrams in unit sources and targets, to find the
+few units that can contain a search string without looking at all of them."""
+
+import sre_constants
+import sre_parse
+from collections import defaultdict
+
+from translate.lang import data
+
+from virtaal.support.indexset import IndexSet
+
+__all__ = ['TrigramIndex', 'get_literals']
+
+N = 3
+
+
+def _unit_text(unit):
+    """Return the searchable text of C{unit}: its source and target strings,
+        normalized and in lower case. The strings are separated by a
+        character that never occurs in a search string, so that no trigram
+        spans two of them."""
+    if unit.hasplural():
+        strings = unit.source.strings + unit.target.strings
+    else:
+        strings = [unit.source, unit.target]
+    return data.normalize(u'\0'.join([unicode(s or u'') for s in strings])).lower()
+
+def _trigrams(text):
+    return set([text[i:i+N] for i in xrange(len(text) - N + 1)])
+
+def get_literals(pattern):
+    """Return the literal strings that every match of the regular expression
+        C{pattern} must contain.
+
+        Only the top level of the expression is looked at: runs of literal
+        characters there must all occur in a match. Anything else (groups,
+        repeats, alternatives, character classes) ends a run. An expression
+        like C{'print(f|ln)'} therefore gives C{['print']}, and
+        C{'foo|bar'} gives nothing.
+        @returns: A list of strings, or an empty list if nothing is known
+            (including when C{pattern} is not a valid expression)."""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (sre_constants.error, OverflowError):
+        return []
+    literals = []
+    run = []
+    for op, av in parsed:
+        if op == sre_constants.LITERAL:
+            run.append(unichr(av))
+            continue
+        if run:
+            literals.append(u''.join(run))
+            run = []
+    if run:
+        literals.append(u''.join(run))
+    return literals
+
+
+class TrigramIndex(object):
+    """Maps every three-character string to the indexes of the units that
+        contain it, in their source or target text (ignoring case).
+
+        The index only gives candidates: units that I{might} match. Callers
+        must still test the candidates with the real search. This also means
+        that L{update_unit()} can simply add the trigrams of a changed unit
+        without removing the old ones, which would mean keeping a copy of
+        every unit's text."""
+
+    def __init__(self, units=None):
+        """Constructor.
+            @param units: The units to index. Their position in the sequence
+                is used as their index. If this is not given, the units must
+                be added with L{add_units()}, and L{finish()} called after
+                the last of them."""
+        self._postings = {}
+        self._new_postings = defaultdict(list)
+        if units is not None:
+            self.add_units(0, units)
+            self.finish()
+
+
+    # METHODS #
+    def add_units(self, start, units):
+        """Add C{units}, the first of which has index C{start}, to an index
+            that is being built. This allows building the index a chunk at
+            a time, but the chunks must be added in order."""
+        postings = self._new_postings
+        for index, unit in enumerate(units):
+            for trigram in _trigrams(_unit_text(unit)):
+                postings[trigram].append(start + index)
+
+    def finish(self):
+        """Make the units added with L{add_units()} searchable."""
+        postings = self._postings
+        for trigram, indexes in self._new_postings.iteritems():
+            if trigram in postings:
+                postings[trigram] = postings[trigram].union(indexes)
+            else:
+                postings[trigram] = IndexSet.from_sorted(indexes)
+        self._new_postings = defaultdict(list)
+
+    def get_candidates(self, strings):
+        """Return the indexes of the units that can contain all of the given
+            strings, ignoring case.
+            @param strings: Strings that must all occur in a matching unit,
+                like the search string or the result of L{get_literals()}.
+            @returns: An L{IndexSet}, or C{None} if the index can not narrow
+                down the search (if all strings are shorter than three
+                characters)."""
+        trigrams = set()
+        for string in strings:
+            trigrams.update(_trigrams(data.normalize(unicode(string)).lower()))
+        if not trigrams:
+            return None
+
+        postings = []
+        for trigram in trigrams:
+            if trigram not in self._postings:
+                return IndexSet()
+            postings.append(self._postings[trigram])
+        postings.sort(key=len)
+        # Filter the smallest list of candidates with the others, so that
+        # this takes time in proportion to the number of candidates instead
+        # of the number of units
+        candidates = postings[0]
+        for posting in postings[1:]:
+            candidates = [index for index in candidates if index in posting]
+            if not candidates:
+                break
+        return IndexSet.from_sorted(candidates)
+
+    def update_unit(self, index, unit):
+        """Add the trigrams of the (changed) unit at C{index}."""
+        postings = self._postings
+        for trigram in _trigrams(_unit_text(unit)):
+            if trigram in postings:
+                postings[trigram].add(index)
+            else:
+                postings[trigram] = IndexSet.from_sorted([index])
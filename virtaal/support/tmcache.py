@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright 2010 Zuza Software Foundation
+#
+# This file is part of Virtaal.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, see <http://www.gnu.org/licenses/>.
+
+"""A persistent cache of TM suggestions, so that suggestions from slow (web)
+services are only requested once, and not again in every session."""
+
+import logging
+import time
+try:
+    from sqlite3 import dbapi2
+except ImportError:
+    from pysqlite2 import dbapi2
+try:
+    import simplejson as json #should be a bit faster; needed for Python < 2.6
+except ImportError:
+    import json #available since Python 2.6
+
+from translate.lang import data
+
+__all__ = ['TMCache']
+
+MAX_ENTRIES = 20000
+EMPTY_TTL = 24 * 60 * 60
+"""How long (in seconds) it is remembered that a back-end had no suggestions,
+    at most. The TM behind it might be improved in the meantime."""
+
+
+def _make_key(backend, source_lang, target_lang, source):
+    # NULL is not equal to anything in SQL, so unknown languages are ''
+    return (backend, source_lang or u'', target_lang or u'', data.normalize(unicode(source)))
+
+
+class TMCache(object):
+    """TM suggestions in an SQLite database, keyed by back-end, source
+        language, target language and (normalized) source text.
+
+        When the cache holds more than C{max_entries} entries, the ones that
+        were used longest ago are removed. Every back-end can give its own
+        time to live (TTL) when looking up suggestions.
+
+        An empty list of suggestions is cached like any other answer, so
+        that units without suggestions are not looked up over and over, but
+        only for C{empty_ttl} seconds.
+
+        Committing syncs the database to disk, which is slow, so a cache can
+        be given a function to schedule a commit with. All the changes made
+        until the commit runs are then committed together."""
+
+    def __init__(self, filename, max_entries=MAX_ENTRIES, schedule=None, empty_ttl=EMPTY_TTL):
+        """Constructor.
+            @param filename: The SQLite database to use. It is created if it
+                does not exist yet.
+            @param schedule: Called as C{schedule(func)} when there are
+                changes to commit. It must call C{func()} later, like
+                C{gobject.idle_add()} does. Without it, every change is
+                committed right away."""
+        self.filename = filename
+        self.max_entries = max_entries
+        self.empty_ttl = empty_ttl
+        self._schedule = schedule
+        self._commit_scheduled = False
+        self.hits = {}
+        """The number of successful lookups for every back-end."""
+        self.misses = {}
+        """The number of lookups that found nothing for every back-end."""
+
+        self._db = dbapi2.connect(filename)
+        self._db.execute('''CREATE TABLE IF NOT EXISTS suggestions (
+            backend TEXT, source_lang TEXT, target_lang TEXT, source TEXT,
+            matches TEXT, created REAL, accessed REAL,
+            PRIMARY KEY (backend, source_lang, target_lang, source))''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS suggestions_accessed ON suggestions (accessed)')
+        self._db.commit()
+        self._count = self._db.execute('SELECT COUNT(*) FROM suggestions').fetchone()[0]
+
+
+    # METHODS #
+    def clear(self, backend=None):
+        """Forget the suggestions of C{backend}, or of all back-ends."""
+        if backend is None:
+            self._db.execute('DELETE FROM suggestions')
+        else:
+            self._db.execute('DELETE FROM suggestions WHERE backend=?', (backend,))
+        self._db.commit()
+        self._count = self._db.execute('SELECT COUNT(*) FROM suggestions').fetchone()[0]
+
+    def close(self):
+        if self._db is None:
+            return
+        self._commit_scheduled = False
+        self._db.commit()
+        self._db.close()
+        self._db = None
+        for backend in sorted(set(self.hits) | set(self.misses)):
+            logging.debug('TM cache for %s: %d hits, %d misses' % (
+                backend, self.hits.get(backend, 0), self.misses.get(backend, 0)
+            ))
+
+    def commit(self):
+        """Commit the changes made since the last commit."""
+        self._commit_scheduled = False
+        if self._db is not None:
+            self._db.commit()
+
+    def contains(self, backend, source_lang, target_lang, source, ttl=None):
+        """Return whether suggestions (or the lack of them) for C{source} are
+            cached, and not older than C{ttl} seconds. This does not count as
+            a hit or a miss."""
+        row = self._db.execute(
+            '''SELECT matches, created FROM suggestions
+               WHERE backend=? AND source_lang=? AND target_lang=? AND source=?''',
+            _make_key(backend, source_lang, target_lang, source)
+        ).fetchone()
+        return row is not None and not self._is_expired(row[0], row[1], ttl, time.time())
+
+    def get(self, backend, source_lang, target_lang, source, ttl=None):
+        """Return the cached suggestions for C{source}.
+            @param ttl: Ignore (and forget) suggestions that were cached more
+                than this many seconds ago.
+            @returns: A list of match dictionaries (which is empty if the
+                back-end had no suggestions), or C{None} if nothing is
+                cached."""
+        key = _make_key(backend, source_lang, target_lang, source)
+        row = self._db.execute(
+            '''SELECT matches, created FROM suggestions
+               WHERE backend=? AND source_lang=? AND target_lang=? AND source=?''',
+            key
+        ).fetchone()
+        now = time.time()
+        if row is not None and self._is_expired(row[0], row[1], ttl, now):
+            self._db.execute(
+                'DELETE FROM suggestions WHERE backend=? AND source_lang=? AND target_lang=? AND source=?',
+                key
+            )
+            self._count -= 1
+            row = None
+        if row is None:
+            self.misses[backend] = self.misses.get(backend, 0) + 1
+            return None
+
+        self.hits[backend] = self.hits.get(backend, 0) + 1
+        # The access time is committed with the next change
+        self._db.execute(
+            'UPDATE suggestions SET accessed=? WHERE backend=? AND source_lang=? AND target_lang=? AND source=?',
+            (now,) + key
+        )
+        return json.loads(row[0])
+
+    def put(self, backend, source_lang, target_lang, source, matches):
+        """Cache the suggestions C{matches} for C{source}. An empty list
+            records that the back-end has no suggestions."""
+        key = _make_key(backend, source_lang, target_lang, source)
+        now = time.time()
+        cursor = self._db.execute(
+            'UPDATE suggestions SET matches=?, created=?, accessed=? WHERE backend=? AND source_lang=? AND target_lang=? AND source=?',
+            (json.dumps(matches), now, now) + key
+        )
+        if cursor.rowcount == 0:
+            self._db.execute(
+                'INSERT INTO suggestions VALUES (?, ?, ?, ?, ?, ?, ?)',
+                key + (json.dumps(matches), now, now)
+            )
+            self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+        self._changed()
+
+    def _changed(self):
+        if self._schedule is None:
+            self._db.commit()
+        elif not self._commit_scheduled:
+            self._commit_scheduled = True
+            self._schedule(self._on_commit)
+
+    def _is_expired(self, matches, created, ttl, now):
+        """Whether an entry with the JSON C{matches}, cached at C{created},
+            is too old to use."""
+        if matches == '[]' and (ttl is None or ttl > self.empty_ttl):
+            ttl = self.empty_ttl
+        return ttl is not None and created + ttl < now
+
+    def _evict(self):
+        """Remove the least recently used entries, making room for a tenth
+            of the maximum number of entries, so that this does not have to
+            be done for every new entry."""
+        excess = self._count - self.max_entries * 9 / 10
+        self._db.execute(
+            'DELETE FROM suggestions WHERE rowid IN (SELECT rowid FROM suggestions ORDER BY accessed LIMIT ?)',
+            (excess,)
+        )
+        self._count -= excess
+
+
+    # EVENT HANDLERS #
+    def _on_commit(self):
+        self.commit()
+        return False
@@ -18,6 +18,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program; if not, see <http://www.gnu.org/licenses/>.
 
+import logging
+from collections import deque
 # These two json modules are API compatible
 try:
     import simplejson as json #should be a bit faster; needed for Python < 2.6
@@ -30,9 +32,20 @@ from virtaal.support.httpclient import HTTPClient, RESTRequest
 class TMClient(HTTPClient):
     """CRUD operations for TM units and stores"""
 
+    BATCH_SIZE = 100
+    """The maximum number of sources to look up in one request."""
+    MAX_UNIT_REQUESTS = 4
+    """The maximum number of single lookups that L{translate_units()} runs at
+        once if the server can't do batch lookups."""
+
     def __init__(self, base_url):
         HTTPClient.__init__(self)
         self.base_url = base_url
+        self.batch_supported = True
+        """Whether the server handles L{translate_units()} requests. This is
+            assumed until it answers one with an error that says otherwise."""
+        self._unit_queue = deque()
+        self._unit_requests = 0
 
     def translate_unit(self, unit_source, source_lang, target_lang, callback=None):
         """suggest translations from TM"""
@@ -46,6 +59,89 @@ class TMClient(HTTPClient):
                 "http-success",
                 lambda widget, response: callback(widget, widget.id, json.loads(response))
             )
+        return request
+
+    def translate_units(self, unit_sources, source_lang, target_lang, callback=None):
+        """suggest translations from TM for many sources at once
+
+            Up to C{BATCH_SIZE} sources are sent in one POST request to
+            C{<source_lang>/<target_lang>/units} as a JSON list, and the server
+            answers with a list of the matches for every source, in the same
+            order. If the server does not support this, every source is looked
+            up with L{translate_unit()} instead.
+            @param callback: Called as C{callback(request, source, matches)}
+                for every source, like the callback of L{translate_unit()}.
+                Sources that could not be looked up (because of an error)
+                are also passed to it, with C{None} instead of the list of
+                matches."""
+        unit_sources = list(unit_sources)
+        for start in xrange(0, len(unit_sources), self.BATCH_SIZE):
+            batch = unit_sources[start:start+self.BATCH_SIZE]
+            if self.batch_supported:
+                self._translate_batch(batch, source_lang, target_lang, callback)
+            else:
+                self._translate_separately(batch, source_lang, target_lang, callback)
+
+    def _translate_separately(self, unit_sources, source_lang, target_lang, callback):
+        """Look up C{unit_sources} with L{translate_unit()}, but with no more
+            than C{MAX_UNIT_REQUESTS} requests at a time, so that a batch does
+            not turn into a hundred requests at once."""
+        for unit_source in unit_sources:
+            self._unit_queue.append((unit_source, source_lang, target_lang, callback))
+        self._start_unit_requests()
+
+    def _start_unit_requests(self):
+        while self._unit_queue and self._unit_requests < self.MAX_UNIT_REQUESTS:
+            unit_source, source_lang, target_lang, callback = self._unit_queue.popleft()
+            request = self.translate_unit(unit_source, source_lang, target_lang, callback)
+            self._unit_requests += 1
+            if callback:
+                def on_error(request, result, callback=callback):
+                    callback(request, request.id, None)
+                for signal in ("http-client-error", "http-server-error", "http-failed"):
+                    request.connect(signal, on_error)
+            for signal in ("http-success", "http-redirect", "http-client-error", "http-server-error", "http-failed"):
+                request.connect(signal, self._on_unit_request_done)
+
+    def _translate_batch(self, unit_sources, source_lang, target_lang, callback):
+        request = RESTRequest(
+                self.base_url + "/%s/%s/units" % (source_lang, target_lang),
+                None, "POST", json.dumps(unit_sources),
+                headers=["Content-Type: application/json"],
+                user_agent=self.user_agent)
+        self.add(request)
+
+        def fall_back():
+            self._translate_separately(unit_sources, source_lang, target_lang, callback)
+
+        def on_success(widget, response):
+            try:
+                results = json.loads(response)
+            except ValueError:
+                results = None
+            if not isinstance(results, list) or len(results) != len(unit_sources):
+                logging.debug("Invalid answer to batch TM lookup; looking up units separately")
+                self.batch_supported = False
+                fall_back()
+                return
+            if callback:
+                for unit_source, matches in zip(unit_sources, results):
+                    callback(widget, unit_source, matches)
+
+        def on_error(widget, status):
+            if status in (404, 405, 501):
+                # The server doesn't know about batch lookups
+                logging.debug("TM server does not support batch lookups (HTTP %d)" % (status))
+                self.batch_supported = False
+                fall_back()
+            elif callback:
+                for unit_source in unit_sources:
+                    callback(widget, unit_source, None)
+
+        request.connect("http-success", on_success)
+        request.connect("http-client-error", on_error)
+        request.connect("http-server-error", on_error)
+        request.connect("http-failed", on_error)
 
     def add_unit(self, unit, source_lang, target_lang, callback=None):
         request = RESTRequest(
@@ -129,3 +225,9 @@ class TMClient(HTTPClient):
                 "http-success",
                 lambda widget, response: callback(widget, widget.id, json.loads(response))
             )
+
+
+    # EVENT HANDLERS #
+    def _on_unit_request_done(self, request, result):
+        self._unit_requests -= 1
+        self._start_unit_requests()
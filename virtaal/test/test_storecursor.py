@@ -32,9 +32,19 @@ class TestCursor(TestScaffolding):
         assert cursor.pos == len(cursor.indices) - 1
 
     def test_indices(self):
+        self.store_controller.open_file(self.testfile[1])
         cursor = self.store_controller.cursor
         cursor.pos = 0
         cursor.indices = [1, 2]
         assert cursor.pos == 0
         cursor.move(2)
         assert cursor.pos == 0
+
+    def test_force_index(self):
+        self.store_controller.open_file(self.testfile[1])
+        cursor = self.store_controller.cursor
+        cursor.indices = [0, 2]
+        cursor.force_index(1)
+        assert list(cursor.indices) == [0, 1, 2]
+        assert cursor.index == 1
+        assert cursor.pos == 1
@@ -29,3 +29,15 @@ class TestStoreModel(TestScaffolding):
         self.model.load_file(self.testfile[1])
         assert len(self.model) <= len(self.trans_store.units)
         assert self.model.get_filename() == self.testfile[1]
+
+    def test_unit_index(self):
+        self.model = StoreModel(self.testfile[1], None)
+        units = self.model.get_units()
+        assert self.model.get_units() is units
+        for index, unit in enumerate(units):
+            assert self.model.get_unit_index(unit) == index
+        try:
+            self.model.get_unit_index(self.trans_store.units[1])
+            assert False
+        except ValueError:
+            pass
@@ -170,6 +170,8 @@ class MainView(BaseView):
         self.status_bar = self.gui.get_widget("status_bar")
         self.status_bar.set_sensitive(False)
         self.statusbar_context_id = self.status_bar.get_context_id("statusbar")
+        # Only shown while a file is being opened, initialised as needed
+        self.btn_cancel_open = None
         #Only used in full screen, initialised as needed
         self.btn_app = None
         self.app_menu = None
@@ -501,6 +503,27 @@ class MainView(BaseView):
         pan_app.settings.write()
         gtk.main_quit()
 
+    def _set_busy(self, busy):
+        """Show a busy mouse cursor, and a button to cancel, while a file is
+            being opened."""
+        if busy and self.btn_cancel_open is None:
+            self.btn_cancel_open = gtk.Button(stock=gtk.STOCK_CANCEL)
+            self.btn_cancel_open.set_relief(gtk.RELIEF_NONE)
+            self.btn_cancel_open.connect('clicked', self._on_cancel_open)
+            self.status_bar.pack_end(self.btn_cancel_open, expand=False, fill=False)
+        if self.btn_cancel_open is not None:
+            self.btn_cancel_open.props.visible = busy
+        if busy:
+            # The status bar is insensitive while no file is open
+            self.status_bar.set_sensitive(True)
+
+        if self.main_window.window is None:
+            return
+        if busy:
+            self.main_window.window.set_cursor(gdk.Cursor(gdk.WATCH))
+        else:
+            self.main_window.window.set_cursor(None)
+
     def show(self):
         if pan_app.settings.general['maximized']:
             self.main_window.maximize()
@@ -666,6 +689,12 @@ class MainView(BaseView):
 
         self._store_closed_handler_id = new_controller.connect('store-closed', self._on_store_closed)
         self._store_loaded_handler_id = new_controller.connect('store-loaded', self._on_store_loaded)
+        new_controller.connect('store-load-progress', self._on_store_load_progress)
+        new_controller.connect('store-load-failed', self._on_store_load_failed)
+        new_controller.connect('store-load-cancelled', self._on_store_load_cancelled)
+
+    def _on_cancel_open(self, _widget):
+        self.controller.cancel_open()
 
     def _on_documentation(self, _widget=None):
         from virtaal.support import openmailto
@@ -736,12 +765,34 @@ class MainView(BaseView):
         openmailto.open("http://bugs.locamotion.org/enter_bug.cgi?product=Virtaal&version=%s" % __version__.ver)
 
     def _on_store_closed(self, store_controller):
+        self._set_busy(False)
         for widget_name in ('mnu_saveas', 'mnu_close', 'mnu_update'):
             self.gui.get_widget(widget_name).set_sensitive(False)
         self.status_bar.set_sensitive(False)
         self.main_window.set_title(_('Virtaal'))
 
+    def _on_store_load_cancelled(self, store_controller):
+        self._set_busy(False)
+        if store_controller.get_store() is None:
+            self.status_bar.set_sensitive(False)
+            self.main_window.set_title(_('Virtaal'))
+        else:
+            # Show the name of the file that is still open
+            self.set_saveable(self.modified)
+
+    def _on_store_load_failed(self, store_controller, exc):
+        self._set_busy(False)
+
+    def _on_store_load_progress(self, store_controller, fraction, message):
+        self._set_busy(True)
+        #l10n: This is shown in the window title while opening a file. %(message)s describes the current step
+        self.main_window.set_title(_('%(message)s (%(percentage)d%%) - Virtaal') % {
+            'message': message.rstrip('.'),
+            'percentage': int(fraction * 100),
+        })
+
     def _on_store_loaded(self, store_controller):
+        self._set_busy(False)
         self.gui.get_widget('mnu_saveas').set_sensitive(True)
         self.gui.get_widget('mnu_close').set_sensitive(True)
         self.gui.get_widget('mnu_update').set_sensitive(True)
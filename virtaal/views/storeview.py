@@ -108,6 +108,20 @@ class StoreView(BaseView):
             self._set_menu_items_sensitive(False)
             self._treeview.set_model(None)
 
+    def update_units(self, indexes):
+        """Redraw the rows of the units at C{indexes} after they changed."""
+        model = self._treeview.get_model()
+        if not hasattr(model, 'store_index_to_path'):
+            return # No store loaded
+        for index in indexes:
+            path = model.store_index_to_path(index)
+            model.row_changed(path, model.get_iter(path))
+
+    def set_sensitive(self, sensitive):
+        """Allow or prevent editing of and navigation in the store."""
+        self._treeview.set_sensitive(sensitive)
+        self._set_menu_items_sensitive(sensitive and self.controller.get_store() is not None)
+
     def show(self):
         child = self.parent_widget.get_child()
         if child and child is not self._treeview: